@@ -139,6 +139,9 @@ def choose_route(action_context, options: List[str], prompt: str):
 
 
 class WorkflowCapability(Capability):
+    # Each response executes the current workflow step
+    allows_parallel_tool_calls = False
+
     def __init__(self, workflow: Workflow):
         super().__init__(
             name="Workflow Capability",
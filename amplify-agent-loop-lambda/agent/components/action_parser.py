@@ -0,0 +1,272 @@
+import ast
+import json
+import re
+from typing import Optional
+
+from pycommon.logger import getLogger
+
+logger = getLogger("action_parser")
+
+# Fences the model uses for the action block, most specific first
+ACTION_MARKERS = ("```action", "```json")
+
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_JSON_LITERALS = {v: k for k, v in _PYTHON_LITERALS.items()}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+_LITERAL_RE = re.compile(r"[A-Za-z_]+")
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the formatting mistakes models commonly make in JSON: raw newlines and
+    tabs inside strings, trailing commas and Python literals. Truncated output
+    is left alone; guessing the rest of an action's arguments is not safe.
+    """
+    out = []
+    in_string = False
+    escape = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\r":
+                out.append("\\r")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(ch)
+        elif ch.isalpha() or ch == "_":
+            word = _LITERAL_RE.match(text, i).group()
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _to_python_literals(text: str) -> str:
+    """Rewrite JSON true/false/null as Python literals, leaving quoted strings alone."""
+    out = []
+    quote = None
+    escape = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = None
+            out.append(ch)
+            i += 1
+        elif ch in "\"'":
+            quote = ch
+            out.append(ch)
+            i += 1
+        elif ch.isalpha() or ch == "_":
+            word = _LITERAL_RE.match(text, i).group()
+            out.append(_JSON_LITERALS.get(word, word))
+            i += len(word)
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def parse_action_json(text: str):
+    """json.loads, falling back to local repairs and Python-literal syntax."""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError as original_error:
+        error = original_error
+
+    for candidate in (text, text.translate(_SMART_QUOTES)):
+        try:
+            return json.loads(repair_json(candidate))
+        except ValueError:
+            pass
+
+    # Single-quoted keys and strings
+    try:
+        value = ast.literal_eval(_to_python_literals(text))
+        if isinstance(value, (dict, list)):
+            return value
+    except (ValueError, SyntaxError):
+        pass
+    raise error
+
+
+def _object_end(text: str, start: int) -> int:
+    """Index just past the object opening at start, or -1 if it never closes."""
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def find_action_block(text: str) -> Optional[str]:
+    """
+    The JSON of the action block: the object after the first ```action (or
+    ```json) fence, else the first object in the text. A block cut off before
+    its end is returned as is and fails to parse.
+    """
+    start = -1
+    for marker in ACTION_MARKERS:
+        marker_index = text.find(marker)
+        if marker_index >= 0:
+            start = text.find("{", marker_index + len(marker))
+            break
+    if start < 0:
+        start = text.find("{")
+    if start < 0:
+        return None
+
+    end = _object_end(text, start)
+    if end < 0:
+        block = text[start:]
+        fence = block.rfind("```")
+        return block[:fence] if fence >= 0 else block
+    return text[start:end]
+
+
+def extract_action(text: str) -> dict:
+    """Parse the action block of a response, repairing it locally if needed."""
+    block = find_action_block(text)
+    if block is None:
+        raise ValueError("The response did not contain an action block")
+    action = parse_action_json(block)
+    if not isinstance(action, dict):
+        raise ValueError("The action block is not a JSON object")
+    return action
+
+
+def is_action(value) -> bool:
+    return isinstance(value, dict) and ("tool" in value or "tool_calls" in value)
+
+
+class IncrementalActionParser:
+    """
+    Watches streamed model output for the action block. feed() returns True
+    once the block's object has closed and parsed into an action, so the
+    caller can stop the stream instead of waiting for the rest of the output.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.action = None
+        self._start = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._search_from = 0
+        self._done = False
+
+    @property
+    def complete(self) -> bool:
+        return self.action is not None
+
+    def _find_start(self):
+        # Only an explicit ```action fence ends the stream early; a ```json
+        # block in the model's thoughts may just be an example
+        marker = ACTION_MARKERS[0]
+        marker_index = self.text.find(marker, self._search_from)
+        if marker_index < 0:
+            # A marker may be split across fragments
+            self._search_from = max(0, len(self.text) - len(marker))
+            return
+        self._search_from = marker_index
+        brace = self.text.find("{", marker_index + len(marker))
+        if brace >= 0:
+            self._start = self._pos = brace
+
+    def feed(self, delta: str) -> bool:
+        if self._done or not delta:
+            return self._done and self.complete
+        self.text += delta
+
+        if self._start is None:
+            self._find_start()
+            if self._start is None:
+                return False
+
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+                    try:
+                        action = parse_action_json(text[self._start : self._pos])
+                    except ValueError:
+                        return False
+                    if is_action(action):
+                        self.action = action
+                        return True
+                    return False
+        return False
+
+    def completed_text(self) -> str:
+        """The output up to the end of the action block, with its fence closed."""
+        if not self.complete:
+            return self.text
+        return self.text[: self._pos] + "\n```"
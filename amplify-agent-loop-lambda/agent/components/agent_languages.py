@@ -1,4 +1,5 @@
 import json
+import os
 from typing import List, Any
 
 from agent.core import (
@@ -10,6 +11,7 @@ from agent.core import (
     UnknownActionError,
 )
 from agent.prompt import Prompt
+from agent.components.action_parser import IncrementalActionParser, extract_action
 from pycommon.logger import getLogger
 logger = getLogger("agent_language")
 
@@ -37,9 +39,102 @@ def to_json_memory_messages_format(items):
     return mapped_items
 
 
+# Environment results in the prompt are compacted, oldest first, once the
+# estimated size of the memory messages passes this many tokens. The most
+# recent results are always kept whole.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("AGENT_PROMPT_TOKEN_BUDGET", "100000"))
+PROMPT_KEEP_RECENT_RESULTS = int(os.environ.get("AGENT_PROMPT_KEEP_RECENT_RESULTS", "3"))
+COMPACTED_RESULT_CHARS = int(os.environ.get("AGENT_COMPACTED_RESULT_CHARS", "500"))
+CHARS_PER_TOKEN = 4
+
+
+def _estimate_tokens(message: dict) -> int:
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    return len(content) // CHARS_PER_TOKEN + 1
+
+
+def _compact_result(message: dict) -> dict:
+    content = message.get("content")
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    if len(content) <= COMPACTED_RESULT_CHARS:
+        return message
+
+    result_id = None
+    try:
+        result_id = json.loads(content).get("id")
+    except Exception:
+        pass
+    reference = f" The full result is available by reference as {result_id}." if result_id else ""
+    return {
+        **message,
+        "content": f"{content[:COMPACTED_RESULT_CHARS]}... "
+        f"[Compacted: {len(content)} chars of an earlier tool result were omitted.{reference}]",
+    }
+
+
+class MemoryMessageFormatter:
+    """
+    Maps memories to prompt messages incrementally. Each memory is only mapped
+    once; later calls reuse the cached message as long as the memory (and its
+    content) is the same object, and map only the memories added since.
+    """
+
+    def __init__(self, token_budget: int = None, keep_recent_results: int = None):
+        self.token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+        self.keep_recent_results = (
+            PROMPT_KEEP_RECENT_RESULTS if keep_recent_results is None else keep_recent_results
+        )
+        # (memory item, its content, mapped messages, estimated tokens)
+        self._entries = []
+
+    def format(self, items: List[dict]) -> List[dict]:
+        reused = 0
+        for cached, item in zip(self._entries, items):
+            if cached[0] is not item or cached[1] is not item.get("content"):
+                break
+            reused += 1
+
+        del self._entries[reused:]
+        for item in items[reused:]:
+            messages = to_json_memory_messages_format([item])
+            tokens = sum(_estimate_tokens(m) for m in messages)
+            self._entries.append((item, item.get("content"), messages, tokens))
+
+        return self._compact()
+
+    def _compact(self) -> List[dict]:
+        total_tokens = sum(entry[3] for entry in self._entries)
+        if total_tokens <= self.token_budget:
+            return [m for entry in self._entries for m in entry[2]]
+
+        result_indexes = [
+            i for i, entry in enumerate(self._entries) if entry[0]["type"] == "environment"
+        ]
+        if self.keep_recent_results:
+            result_indexes = result_indexes[:-self.keep_recent_results]
+
+        compacted = {}
+        for i in result_indexes:
+            if total_tokens <= self.token_budget:
+                break
+            messages = [_compact_result(m) for m in self._entries[i][2]]
+            total_tokens -= self._entries[i][3] - sum(_estimate_tokens(m) for m in messages)
+            compacted[i] = messages
+
+        return [
+            m
+            for i, entry in enumerate(self._entries)
+            for m in compacted.get(i, entry[2])
+        ]
+
+
 class AgentNaturalLanguage(AgentLanguage):
     def __init__(self):
         super().__init__()
+        self.memory_formatter = MemoryMessageFormatter()
 
     def format_goals(self, goals: List[Goal]) -> List:
         # Map all goals to a single string that concatenates their description
@@ -52,10 +147,7 @@ class AgentNaturalLanguage(AgentLanguage):
         # Map all environment results to a role:user messages
         # Map all assistant messages to a role:assistant messages
         # Map all user messages to a role:user messages
-        items = memory.get_memories()
-        mapped_items = to_json_memory_messages_format(items)
-
-        return mapped_items
+        return self.memory_formatter.format(memory.get_memories())
 
     def construct_prompt(
         self,
@@ -100,6 +192,7 @@ class AgentJsonActionLanguage(AgentLanguage):
 
     def __init__(self):
         super().__init__()
+        self.memory_formatter = MemoryMessageFormatter()
 
     def format_goals(self, goals: List[Goal]) -> List:
         # Map all goals to a single string that concatenates their description
@@ -115,10 +208,7 @@ class AgentJsonActionLanguage(AgentLanguage):
         # Map all environment results to a role:user messages
         # Map all assistant messages to a role:assistant messages
         # Map all user messages to a role:user messages
-        items = memory.get_memories()
-        mapped_items = to_json_memory_messages_format(items)
-
-        return mapped_items
+        return self.memory_formatter.format(memory.get_memories())
 
     def format_actions(self, actions: List[Action]) -> List:
         """Generate response from language model"""
@@ -141,6 +231,9 @@ Available Tools: {json.dumps(action_descriptions, indent=4)}
 When you are done, terminate the conversation by using the "terminate" tool and I will 
 provide the results to the user.
 
+If you need several tools whose arguments do not depend on each other's results, you can 
+run them together by putting {{"tool_calls": [{{"tool": ..., "args": ...}}, ...]}} in the action block.
+
 Important!!! Every response MUST have an 'action' which is defined by outputting an  ```action block containing valid json.
 You must ALWAYS respond in this format:
 
@@ -189,29 +282,26 @@ You must ALWAYS respond in this format:
         return Prompt(messages=new_messages, tools=[])
 
     def parse_response(self, response: str) -> dict:
-        """Parse LLM response into structured format by extracting the ```json block"""
+        """Parse LLM response into structured format by extracting the ```action block"""
         try:
-            start_marker = "```action"
-            end_marker = "```"
-
-            # Extract the json block from the response looking for the first ```json and then the ``` starting from the end
-            stripped_response = response.strip()
-            start_index = stripped_response.find(start_marker)
-            end_index = stripped_response.rfind(end_marker)
-            stripped_response = stripped_response[
-                start_index + len(start_marker) : end_index
-            ].strip()
-            return json.loads(stripped_response)
+            # Common formatting mistakes are repaired locally instead of
+            # costing another round trip to the model
+            return extract_action(response)
         except Exception as e:
             logger.error("Agent language failed to parse response: %s", str(e))
             raise e
 
+    def incremental_parser(self):
+        return IncrementalActionParser()
+
 
 class AgentFunctionCallingActionLanguage(AgentLanguage):
 
     def __init__(self, allow_non_tool_output=True):
         super().__init__()
         self.allow_non_tool_output = allow_non_tool_output
+        self.memory_formatter = MemoryMessageFormatter()
+        self._tools_cache = (None, None)
 
     def format_goals(self, goals: List[Goal]) -> List:
         # Map all goals to a single string that concatenates their description
@@ -227,14 +317,16 @@ class AgentFunctionCallingActionLanguage(AgentLanguage):
         # Map all environment results to a role:user messages
         # Map all assistant messages to a role:assistant messages
         # Map all user messages to a role:user messages
-        items = memory.get_memories()
-        mapped_items = to_json_memory_messages_format(items)
-
-        return mapped_items
+        return self.memory_formatter.format(memory.get_memories())
 
     def format_actions(self, actions: List[Action]) -> List[List[Any]]:
         """Generate response from language model"""
 
+        # The tool list only changes when the registered actions change
+        key = tuple(id(action) for action in actions)
+        if self._tools_cache[0] == key:
+            return self._tools_cache[1]
+
         tools = [
             {
                 "type": "function",
@@ -248,6 +340,7 @@ class AgentFunctionCallingActionLanguage(AgentLanguage):
             for action in actions
         ]
 
+        self._tools_cache = (key, tools)
         return tools
 
     def construct_prompt(
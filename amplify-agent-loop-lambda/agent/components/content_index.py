@@ -0,0 +1,269 @@
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+from pycommon.logger import getLogger
+
+logger = getLogger("content_index")
+
+# Files larger than this are matched by streaming only, never indexed
+INDEX_MAX_FILE_BYTES = int(os.environ.get("AGENT_SEARCH_INDEX_MAX_FILE_BYTES", str(1024 * 1024)))
+# Files tracked per search root
+INDEX_MAX_FILES = int(os.environ.get("AGENT_SEARCH_INDEX_MAX_FILES", "5000"))
+# Search roots with an index kept in an agent session
+INDEX_MAX_ROOTS = int(os.environ.get("AGENT_SEARCH_INDEX_MAX_ROOTS", "8"))
+# (file, trigram) postings kept per agent session, roughly 200 bytes each;
+# the least recently indexed files are evicted past this
+INDEX_MAX_POSTINGS = int(os.environ.get("AGENT_SEARCH_INDEX_MAX_POSTINGS", "300000"))
+# A root is only indexed once it has been searched this many times in a session
+INDEX_BUILD_AFTER_SEARCHES = int(os.environ.get("AGENT_SEARCH_INDEX_BUILD_AFTER", "2"))
+
+_BINARY_SNIFF_BYTES = 8192
+_GRAM = 3
+
+
+def is_binary_file(file_path: str) -> bool:
+    """A file is treated as binary if its first block contains a NUL byte."""
+    try:
+        with open(file_path, "rb") as f:
+            return b"\0" in f.read(_BINARY_SNIFF_BYTES)
+    except OSError:
+        return True
+
+
+def stream_matches(file_path: str, pattern: str, regex: Optional[re.Pattern] = None) -> bool:
+    """
+    Whether the file contains pattern (or matches regex), reading line by line
+    and stopping at the first match. Patterns spanning several lines fall back
+    to reading the whole file.
+    """
+    multiline = "\n" in pattern if regex is None else _may_span_lines(regex)
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        if multiline:
+            content = f.read()
+            return bool(regex.search(content)) if regex is not None else pattern in content
+        for line in f:
+            if regex is not None:
+                if regex.search(line):
+                    return True
+            elif pattern in line:
+                return True
+    return False
+
+
+# Regex constructs that can match a newline or anchor to the whole file
+_CROSS_LINE_TOKENS = ("\\n", "\\s", "\\W", "\\D", "\\A", "\\Z", "^", "$", "\n")
+
+
+def _may_span_lines(regex: re.Pattern) -> bool:
+    source = regex.pattern if isinstance(regex.pattern, str) else ""
+    if regex.flags & re.DOTALL:
+        return True
+    if regex.flags & re.MULTILINE:
+        return any(t in source for t in _CROSS_LINE_TOKENS if t not in ("^", "$"))
+    return any(t in source for t in _CROSS_LINE_TOKENS)
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i : i + _GRAM] for i in range(len(text) - _GRAM + 1)}
+
+
+def _interned_trigrams(text: str) -> frozenset:
+    # One string object per distinct trigram across every indexed file
+    return frozenset(map(sys.intern, _trigrams(text)))
+
+
+def required_tokens(pattern: str) -> Set[str]:
+    """
+    Lowercased trigrams a file must contain to contain the literal pattern.
+    Empty for patterns shorter than three characters.
+    """
+    return _trigrams(pattern)
+
+
+class ContentIndex:
+    """
+    Inverted trigram index over the files under one directory, kept for an
+    agent session. Entries are keyed by path and validated against the file's
+    mtime and size on every lookup, so edited files are re-indexed and
+    unchanged files are never read again.
+    """
+
+    def __init__(self, root: str, max_files: int = INDEX_MAX_FILES, budget=None):
+        self.root = root
+        self.max_files = max_files
+        self.posting_count = 0
+        self._budget = budget
+        self._files = OrderedDict()  # path -> (mtime_ns, size, tokens), oldest first
+        self._postings = {}  # trigram -> set of paths
+        self._lock = threading.Lock()
+
+    def _remove(self, file_path: str):
+        entry = self._files.pop(file_path, None)
+        if entry is None:
+            return
+        self.posting_count -= len(entry[2])
+        for token in entry[2]:
+            paths = self._postings.get(token)
+            if paths is not None:
+                paths.discard(file_path)
+                if not paths:
+                    del self._postings[token]
+
+    def _index(self, file_path: str, stat: os.stat_result) -> bool:
+        if stat.st_size > INDEX_MAX_FILE_BYTES or is_binary_file(file_path):
+            self._remove(file_path)
+            return False
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            tokens = _interned_trigrams(f.read())
+
+        with self._lock:
+            self._remove(file_path)
+            if len(self._files) >= self.max_files:
+                return False
+            self._files[file_path] = (stat.st_mtime_ns, stat.st_size, tokens)
+            self.posting_count += len(tokens)
+            for token in tokens:
+                self._postings.setdefault(token, set()).add(file_path)
+        if self._budget is not None:
+            self._budget.trim()
+        return True
+
+    def evict_oldest(self) -> int:
+        """Forget the least recently indexed file. Returns the postings freed."""
+        with self._lock:
+            if not self._files:
+                return 0
+            file_path = next(iter(self._files))
+            freed = len(self._files[file_path][2])
+            self._remove(file_path)
+            return freed
+
+    def candidates(self, tokens: Iterable[str]) -> Optional[Set[str]]:
+        """Indexed paths containing every token, or None when there is nothing to filter on."""
+        tokens = list(tokens)
+        if not tokens:
+            return None
+        with self._lock:
+            postings = sorted(
+                (self._postings.get(token, set()) for token in tokens), key=len
+            )
+            return set.intersection(*postings) if postings[0] else set()
+
+    def might_contain(self, file_path: str, tokens: Set[str], candidates: Optional[Set[str]]) -> bool:
+        """
+        False only when the index proves the file lacks one of tokens. Stale or
+        unseen files are (re)indexed first.
+        """
+        if candidates is None:
+            return True
+        file_path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            with self._lock:
+                self._remove(file_path)
+            return False
+
+        with self._lock:
+            entry = self._files.get(file_path)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return file_path in candidates
+
+        try:
+            if not self._index(file_path, stat):
+                return True
+        except OSError:
+            return False
+        with self._lock:
+            entry = self._files.get(file_path)
+        return entry is None or tokens.issubset(entry[2])
+
+    def prune(self, seen: Set[str], under: str):
+        """Forget indexed files below `under` that a full walk did not see."""
+        prefix = os.path.abspath(under).rstrip(os.sep) + os.sep
+        with self._lock:
+            gone = [p for p in self._files if p.startswith(prefix) and p not in seen]
+            for file_path in gone:
+                self._remove(file_path)
+
+
+class SessionContentIndexes:
+    """
+    The content indexes of one agent session, sharing one postings budget.
+    A root gets an index only once it is searched again, so a one-off search
+    streams files and stops at the first match without indexing anything.
+    """
+
+    def __init__(
+        self,
+        max_roots: int = INDEX_MAX_ROOTS,
+        max_postings: int = INDEX_MAX_POSTINGS,
+        build_after: int = INDEX_BUILD_AFTER_SEARCHES,
+    ):
+        self.max_roots = max_roots
+        self.max_postings = max_postings
+        self.build_after = build_after
+        self._indexes = OrderedDict()  # root -> ContentIndex, least recently used first
+        self._searches = {}
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> Optional[ContentIndex]:
+        """The index for a search root, reusing the index of an enclosing root."""
+        root = os.path.abspath(directory)
+        with self._lock:
+            for indexed_root in list(self._indexes):
+                if root == indexed_root or root.startswith(indexed_root.rstrip(os.sep) + os.sep):
+                    self._indexes.move_to_end(indexed_root)
+                    return self._indexes[indexed_root]
+
+            self._searches[root] = self._searches.get(root, 0) + 1
+            if self._searches[root] < self.build_after:
+                return None
+
+            index = ContentIndex(root, budget=self)
+            self._indexes[root] = index
+            while len(self._indexes) > self.max_roots:
+                self._indexes.popitem(last=False)
+            return index
+
+    def posting_count(self) -> int:
+        with self._lock:
+            return sum(index.posting_count for index in self._indexes.values())
+
+    def trim(self):
+        """Evict files, least recently used root first, until within max_postings."""
+        excess = self.posting_count() - self.max_postings
+        while excess > 0:
+            with self._lock:
+                indexes = list(self._indexes.values())
+            freed = 0
+            for index in indexes:
+                freed = index.evict_oldest()
+                if freed:
+                    break
+            if not freed:
+                return
+            excess -= freed
+
+
+_session_indexes_lock = threading.Lock()
+
+
+def get_content_index(directory: str, action_context) -> Optional[ContentIndex]:
+    """
+    The agent session's index for a search root, or None when there is no
+    session or the root has not been searched often enough to index it.
+    """
+    if action_context is None:
+        return None
+    with _session_indexes_lock:
+        indexes = action_context.get("content_indexes")
+        if indexes is None:
+            indexes = SessionContentIndexes()
+            action_context.set("content_indexes", indexes)
+    return indexes.get(directory)
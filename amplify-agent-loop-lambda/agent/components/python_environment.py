@@ -1,9 +1,16 @@
 import inspect
+import os
 import time
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Any, List
 
 from agent.core import ActionContext, Action, Environment
 
+# Limits for tool calls that run concurrently within one agent iteration.
+# An action can override the timeout with a "timeout" entry in its metadata.
+PARALLEL_TOOL_WORKERS = int(os.environ.get("AGENT_PARALLEL_TOOL_WORKERS", "8"))
+TOOL_TIMEOUT_SECONDS = float(os.environ.get("AGENT_TOOL_TIMEOUT_SECONDS", "120"))
+
 
 def has_named_parameter(func, param_name):
     # Get the signature of the function
@@ -24,37 +31,102 @@ class PythonEnvironment(Environment):
     ) -> dict:
         """Execute action and track results"""
         try:
-
-            args_copy = args.copy()
-            # Check if the action has a named parameter "action_context"
-            if has_named_parameter(action.function, "action_context"):
-                # If the action has an "action_context" parameter, pass the environment as an argument
-                args_copy["action_context"] = action_context
-
-            if has_named_parameter(action.function, "action_agent"):
-                args_copy["action_agent"] = agent
-
-            # Iterate through the keys in the action_context.properties and add them to
-            # if the action.function has a matching named parameter and the parameter is not already in the args_copy
-            for key, value in action_context.properties.items():
-                if (
-                    has_named_parameter(action.function, "_" + key)
-                    and key not in args_copy
-                ):
-                    args_copy["_" + key] = value
-
-            result = action.execute(**args_copy)
-            metadata = None
-
-            if isinstance(result, dict):
-                metadata = result.get("__meta__", None)
-
-            formatted_result = self.format_result(action, result, metadata)
-
-            self.result_history.append(formatted_result)
-            return formatted_result
+            result = self._invoke(agent, action_context, action, args)
         except Exception as e:
             return {"tool": action.name, "tool_executed": False, "error": str(e)}
+        return self._record_result(action, result)
+
+    def execute_actions(
+        self, agent, action_context: ActionContext, calls: List[tuple]
+    ) -> List[dict]:
+        """
+        Execute independent (action, args) calls concurrently. Each call is
+        bounded by its timeout, and results get their ids in call order so the
+        history is the same regardless of which call finished first.
+        """
+        if len(calls) <= 1:
+            return super().execute_actions(agent, action_context, calls)
+
+        # Calls run in waves of at most PARALLEL_TOOL_WORKERS with one thread per
+        # call, so a call's timeout only starts once it is actually running
+        results = []
+        for start in range(0, len(calls), PARALLEL_TOOL_WORKERS):
+            results.extend(
+                self._execute_wave(agent, action_context, calls[start:start + PARALLEL_TOOL_WORKERS])
+            )
+        return results
+
+    def _execute_wave(self, agent, action_context: ActionContext, calls: List[tuple]) -> List[dict]:
+        # Not used as a context manager: a timed-out call cannot be interrupted
+        # and must not block the results of the others
+        executor = ThreadPoolExecutor(max_workers=len(calls))
+        try:
+            futures = [
+                executor.submit(self._invoke, agent, action_context, action, args)
+                for action, args in calls
+            ]
+            started = time.time()
+
+            results = []
+            for (action, _), future in zip(calls, futures):
+                timeout = self._timeout(action)
+                try:
+                    result = future.result(timeout=max(0.0, started + timeout - time.time()))
+                except TimeoutError:
+                    results.append({
+                        "tool": action.name,
+                        "tool_executed": False,
+                        "error": f"Tool call timed out after {timeout:g} seconds",
+                    })
+                    continue
+                except Exception as e:
+                    results.append({"tool": action.name, "tool_executed": False, "error": str(e)})
+                    continue
+                results.append(self._record_result(action, result))
+            return results
+        finally:
+            executor.shutdown(wait=False)
+
+    def _timeout(self, action: Action) -> float:
+        return float(action.metadata.get("timeout", TOOL_TIMEOUT_SECONDS))
+
+    def _invoke(self, agent, action_context: ActionContext, action: Action, args: dict):
+        """Run the action's function with context arguments injected."""
+        args_copy = args.copy()
+        # Check if the action has a named parameter "action_context"
+        if has_named_parameter(action.function, "action_context"):
+            # If the action has an "action_context" parameter, pass the environment as an argument
+            args_copy["action_context"] = action_context
+
+        if has_named_parameter(action.function, "action_agent"):
+            args_copy["action_agent"] = agent
+
+        # Iterate through the keys in the action_context.properties and add them to
+        # if the action.function has a matching named parameter and the parameter is not already in the args_copy
+        for key, value in action_context.properties.items():
+            if (
+                has_named_parameter(action.function, "_" + key)
+                and key not in args_copy
+            ):
+                args_copy["_" + key] = value
+
+        # Sessions restored lazily only download a file once a tool call references it
+        file_tracker = action_context.get("file_tracker")
+        if file_tracker is not None:
+            file_tracker.materialize_referenced_files(args)
+
+        return action.execute(**args_copy)
+
+    def _record_result(self, action: Action, result: Any) -> dict:
+        metadata = None
+
+        if isinstance(result, dict):
+            metadata = result.get("__meta__", None)
+
+        formatted_result = self.format_result(action, result, metadata)
+
+        self.result_history.append(formatted_result)
+        return formatted_result
 
     def format_result(self, action, result: Any, metadata: Any) -> dict:
         """Format and add metadata to result"""
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from pycommon.logger import getLogger
+
+logger = getLogger("run_profiler")
+
+# Profile every agent run; a run can also opt in with a "run_profiler" in its action context
+AGENT_RUN_PROFILING = os.environ.get("AGENT_RUN_PROFILING", "false").lower() == "true"
+
+
+class RunProfiler:
+    """
+    Phase timings for an agent run. Phases timed inside an iteration (prompt,
+    llm, tools, memory, ...) are reported per iteration as
+    agent/profile/iteration events; phases outside the loop (e.g.
+    save_conversation_state) are part of the run summary.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._iteration: Optional[Dict] = None
+        self.iterations: List[Dict] = []
+        self.run_phases: Dict[str, float] = {}
+
+    def start_iteration(self, number: int):
+        self._iteration = {"iteration": number, "start": time.perf_counter(), "phases_ms": {}}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, duration_ms: float):
+        with self._lock:
+            phases = self._iteration["phases_ms"] if self._iteration else self.run_phases
+            phases[name] = phases.get(name, 0.0) + duration_ms
+
+    def end_iteration(self, action_context=None) -> Optional[Dict]:
+        if self._iteration is None:
+            return None
+        iteration = self._iteration
+        self._iteration = None
+        entry = {
+            "iteration": iteration["iteration"],
+            "total_ms": round((time.perf_counter() - iteration["start"]) * 1000, 2),
+            "phases_ms": {k: round(v, 2) for k, v in iteration["phases_ms"].items()},
+        }
+        self.iterations.append(entry)
+        if action_context is not None:
+            action_context.send_event("agent/profile/iteration", dict(entry))
+        return entry
+
+    def summary(self) -> Dict:
+        totals: Dict[str, float] = {}
+        slowest: Dict[str, float] = {}
+        for entry in self.iterations:
+            for name, duration in entry["phases_ms"].items():
+                totals[name] = totals.get(name, 0.0) + duration
+                slowest[name] = max(slowest.get(name, 0.0), duration)
+        for name, duration in self.run_phases.items():
+            totals[name] = totals.get(name, 0.0) + duration
+
+        slowest_iteration = max(self.iterations, key=lambda e: e["total_ms"], default=None)
+        return {
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "iterations": len(self.iterations),
+            "phases_ms": {k: round(v, 2) for k, v in totals.items()},
+            "max_iteration_phase_ms": {k: round(v, 2) for k, v in slowest.items()},
+            "slowest_iteration": slowest_iteration["iteration"] if slowest_iteration else None,
+        }
+
+    def send_summary(self, action_context):
+        summary = self.summary()
+        logger.info("Agent run profile: %s", summary)
+        action_context.send_event("agent/profile/summary", summary)
+        return summary
+
+
+class _NoOpProfiler:
+    """Stands in when profiling is off so the agent loop needs no conditionals."""
+
+    iterations = []
+
+    def start_iteration(self, number: int):
+        pass
+
+    @contextmanager
+    def phase(self, name: str):
+        yield
+
+    def record(self, name: str, duration_ms: float):
+        pass
+
+    def end_iteration(self, action_context=None):
+        return None
+
+    def summary(self):
+        return {}
+
+    def send_summary(self, action_context):
+        return {}
+
+
+NO_OP_PROFILER = _NoOpProfiler()
@@ -113,6 +113,8 @@ def get_tool_metadata(
 import functools
 import inspect
 
+from agent.components.tool_cache import memoize_tool
+
 
 def register_tool(
     tool_name=None,
@@ -123,6 +125,9 @@ def register_tool(
     status=None,
     resultStatus=None,
     errorStatus=None,
+    cache_ttl=None,
+    cache_version="1",
+    cache_file_params=None,
 ):
     """
     A decorator to dynamically register a function in the tools dictionary with its parameters, schema, and docstring.
@@ -134,12 +139,23 @@ def register_tool(
         terminal (bool, optional): Whether the tool is terminal. Defaults to False.
         tags (List[str], optional): List of tags to associate with the tool.
         status (str, optional): If provided, adds `action_context` as a parameter.
+        cache_ttl (int, optional): Memoize results for this many seconds. Only for deterministic tools.
+        cache_version (str, optional): Bump to invalidate cached results when the tool's output changes.
+        cache_file_params (List[str], optional): Path arguments whose file content is part of the cache key.
 
     Returns:
         function: The wrapped function.
     """
 
     def decorator(func):
+        if cache_ttl:
+            func = memoize_tool(
+                cache_ttl,
+                tool_name=tool_name,
+                version=cache_version,
+                file_params=cache_file_params,
+            )(func)
+
         # Modify function signature to include action_context if status is provided
 
         # Get the original function signature
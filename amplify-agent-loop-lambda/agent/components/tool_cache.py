@@ -0,0 +1,284 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+from pycommon.logger import getLogger
+
+logger = getLogger("tool_cache")
+
+# Memoization is opt-in per tool (memoize_tool / register_tool(cache_ttl=...)).
+# AGENT_TOOL_CACHE_ENABLED switches every cached tool back to always executing.
+TOOL_CACHE_ENABLED = os.environ.get("AGENT_TOOL_CACHE_ENABLED", "true").lower() == "true"
+TOOL_CACHE_BUCKET = os.environ.get(
+    "AGENT_TOOL_CACHE_BUCKET", os.environ.get("S3_CONSOLIDATION_BUCKET_NAME")
+)
+# The consolidation bucket's lifecycle rule only expires objects under toolCache/
+TOOL_CACHE_PREFIX = os.environ.get("AGENT_TOOL_CACHE_PREFIX", "toolCache")
+TOOL_CACHE_MEMORY_ENTRIES = int(os.environ.get("AGENT_TOOL_CACHE_MEMORY_ENTRIES", "256"))
+TOOL_CACHE_DEFAULT_TTL = int(os.environ.get("AGENT_TOOL_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# Context arguments never take part in the key
+_CONTEXT_PARAMS = ("action_context", "action_agent")
+
+
+class ToolCache:
+    """
+    Two level store for memoized tool results: a per-container LRU in front of
+    S3 objects at {prefix}/{user}/{tool}/{key}.json. Entries carry their own
+    expiry; the ToolCacheCleanup lifecycle rule on the consolidation bucket's
+    toolCache/ prefix deletes the objects.
+    """
+
+    def __init__(self, bucket: Optional[str] = None, prefix: str = TOOL_CACHE_PREFIX,
+                 max_memory_entries: int = TOOL_CACHE_MEMORY_ENTRIES):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._s3 = None
+
+    def _s3_client(self):
+        if self._s3 is None:
+            self._s3 = boto3.client("s3")
+        return self._s3
+
+    def _s3_key(self, tool_name: str, key: str, user: Optional[str]) -> str:
+        return f"{self.prefix}/{user or 'shared'}/{tool_name}/{key}.json"
+
+    def _remember(self, tool_name: str, key: str, entry: dict):
+        with self._lock:
+            self._memory[(tool_name, key)] = entry
+            self._memory.move_to_end((tool_name, key))
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, tool_name: str, key: str, user: Optional[str] = None) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get((tool_name, key))
+            if entry is not None:
+                if entry["expires_at"] > now:
+                    self._memory.move_to_end((tool_name, key))
+                    return True, entry["result"]
+                del self._memory[(tool_name, key)]
+
+        if not self.bucket:
+            return False, None
+
+        try:
+            response = self._s3_client().get_object(
+                Bucket=self.bucket, Key=self._s3_key(tool_name, key, user)
+            )
+            entry = json.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning("Tool cache read failed for %s: %s", tool_name, e)
+            return False, None
+        except Exception as e:
+            logger.warning("Tool cache read failed for %s: %s", tool_name, e)
+            return False, None
+
+        if entry.get("expires_at", 0) <= now:
+            return False, None
+
+        self._remember(tool_name, key, entry)
+        return True, entry.get("result")
+
+    def put(self, tool_name: str, key: str, result: Any, ttl: int, user: Optional[str] = None):
+        entry = {"expires_at": time.time() + ttl, "result": result}
+        try:
+            body = json.dumps(entry, separators=(",", ":"))
+        except (TypeError, ValueError):
+            # Only JSON results are shared across containers
+            self._remember(tool_name, key, entry)
+            return
+
+        self._remember(tool_name, key, entry)
+
+        if not self.bucket:
+            return
+
+        try:
+            self._s3_client().put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(tool_name, key, user),
+                Body=body.encode("utf-8"),
+                ContentType="application/json",
+            )
+        except Exception as e:
+            logger.warning("Tool cache write failed for %s: %s", tool_name, e)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+tool_cache = ToolCache(bucket=TOOL_CACHE_BUCKET)
+
+
+def _hash_file(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def cache_key(tool_name: str, version: str, args: dict, scope: dict = None,
+              file_params: List[str] = None) -> str:
+    """
+    Content hash of a tool call. Arguments named in file_params are paths and
+    contribute the file's content rather than its name, so an edited file is a
+    different call.
+    """
+    keyed = {}
+    for name, value in args.items():
+        if name in _CONTEXT_PARAMS or name.startswith("_"):
+            continue
+        if file_params and name in file_params and isinstance(value, str):
+            keyed[name] = {"path": value, "sha256": _hash_file(value)}
+        else:
+            keyed[name] = value
+
+    payload = json.dumps(
+        {"tool": tool_name, "version": version, "scope": scope or {}, "args": keyed},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _cache_scope(action_context) -> dict:
+    """Results are kept per user and per model the tool would have prompted."""
+    if action_context is None:
+        return {}
+    return {
+        "user": action_context.get("current_user"),
+        "model": getattr(action_context.get("llm"), "model", None),
+    }
+
+
+def _default_cache_if(args: dict, result: Any) -> bool:
+    if result is None:
+        return False
+    if isinstance(result, dict) and (
+        result.get("success") is False or result.get("error")
+    ):
+        return False
+    return True
+
+
+def _record_cache_event(action_context, tool_name: str, hit: bool, key: str):
+    if action_context is None:
+        return
+    stats = action_context.get("tool_cache_stats")
+    if stats is None:
+        stats = {"hits": 0, "misses": 0}
+        action_context.set("tool_cache_stats", stats)
+    stats["hits" if hit else "misses"] += 1
+
+    action_context.send_event(
+        "tools/" + tool_name + "/cache",
+        {
+            "hit": hit,
+            "key": key[:16],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+        },
+    )
+
+
+def memoize_tool(
+    ttl: int = TOOL_CACHE_DEFAULT_TTL,
+    tool_name: str = None,
+    version: str = "1",
+    file_params: List[str] = None,
+    cache_if: Callable[[dict, Any], bool] = None,
+    skip_if: Callable[[dict], bool] = None,
+    cache: ToolCache = None,
+):
+    """
+    Memoize a deterministic tool on a content hash of its arguments.
+
+    Parameters:
+        ttl (int, optional): Seconds a cached result stays valid. Defaults to AGENT_TOOL_CACHE_TTL_SECONDS.
+        tool_name (str, optional): Name used in the key and events. Defaults to the function name.
+        version (str, optional): Bump when the tool's output changes for the same input.
+        file_params (List[str], optional): Arguments holding file paths whose content is part of the key.
+        cache_if (callable, optional): cache_if(args, result) decides if a result is stored.
+            Defaults to skipping None and {"success": False} / error results.
+        skip_if (callable, optional): skip_if(args) marks calls that are never cached; they
+            run without hashing their arguments or looking anything up.
+        cache (ToolCache, optional): Store to use. Defaults to the shared tool_cache.
+
+    Hits and misses are sent as tools/<name>/cache events with the running
+    counts for the agent session.
+    """
+    cache_if = cache_if or _default_cache_if
+
+    def decorator(func):
+        name = tool_name or func.__name__
+        sig = inspect.signature(func)
+        accepts_context = "action_context" in sig.parameters
+
+        parameters = list(sig.parameters.values())
+        if not accepts_context:
+            parameters.append(
+                inspect.Parameter(
+                    "action_context", inspect.Parameter.KEYWORD_ONLY, default=None
+                )
+            )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = cache or tool_cache
+            action_context = kwargs.get("action_context")
+            if not accepts_context:
+                kwargs.pop("action_context", None)
+
+            if not TOOL_CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            try:
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                call_args = dict(bound.arguments)
+                skip = skip_if is not None and skip_if(call_args)
+                action_context = call_args.get("action_context", action_context)
+                scope = _cache_scope(action_context)
+                key = None if skip else cache_key(name, version, call_args, scope, file_params)
+            except Exception as e:
+                logger.warning("Not caching %s, arguments could not be keyed: %s", name, e)
+                return func(*args, **kwargs)
+
+            if skip:
+                return func(*args, **kwargs)
+
+            hit, result = store.get(name, key, scope.get("user"))
+            _record_cache_event(action_context, name, hit, key)
+            if hit:
+                return result
+
+            result = func(*args, **kwargs)
+            if cache_if(call_args, result):
+                store.put(name, key, result, ttl, scope.get("user"))
+            return result
+
+        wrapper.__signature__ = sig.replace(parameters=parameters)
+        wrapper.cache_ttl = ttl
+        return wrapper
+
+    return decorator
@@ -1,4 +1,5 @@
 import json
+import os
 import time
 import traceback
 import uuid
@@ -6,10 +7,15 @@ from dataclasses import dataclass
 from functools import reduce
 from typing import List, Callable, Dict, Any
 from agent.prompt import Prompt
+from agent.components.run_profiler import AGENT_RUN_PROFILING, NO_OP_PROFILER, RunProfiler
 from pycommon.api.request_state import request_killed
 from pycommon.logger import getLogger
 logger = getLogger("agent_core")
 
+# When false, "prompt" memories record only the messages added since the
+# previous prompt instead of a full copy of every prompt sent to the LLM
+STORE_FULL_PROMPTS = os.environ.get("AGENT_STORE_FULL_PROMPTS", "false").lower() == "true"
+
 class UnknownActionError(Exception):
     pass
 
@@ -148,6 +154,19 @@ class Environment:
     ) -> dict:
         return {}
 
+    def execute_actions(
+        self, agent, action_context: ActionContext, calls: List[tuple]
+    ) -> List[dict]:
+        """
+        Execute several independent (action, args) calls and return their
+        results in call order. Environments that can run calls concurrently
+        override this; the default runs them one after another.
+        """
+        return [
+            self.execute_action(agent, action_context, action, args)
+            for action, args in calls
+        ]
+
 
 class AgentLanguage:
     def __init__(self):
@@ -200,8 +219,20 @@ class AgentLanguage:
         """
         raise NotImplementedError("Subclasses must implement this method")
 
+    def incremental_parser(self):
+        """
+        A parser fed the streamed response fragments whose feed() returns True
+        once a complete action has arrived, so the model call can be cut short.
+        None when this language's responses can't be parsed incrementally.
+        """
+        return None
+
 
 class Capability:
+    # Capabilities that drive actions step by step (e.g. workflows) set this to
+    # False so that only the first tool call of a response is executed
+    allows_parallel_tool_calls = True
+
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
@@ -312,24 +343,76 @@ class Agent:
         )
         return prompt
 
-    def get_action(self, response):
-        action = self.agent_language.parse_response(response)
-        action_name = action["tool"]
-        action_def = self.actions.get_action(action_name)
+    def prompt_memory_content(self, prompt: Prompt, previous_prompt: Prompt = None) -> dict:
+        """
+        The record of a prompt kept in memory. Unless AGENT_STORE_FULL_PROMPTS
+        is set, consecutive prompts are stored as deltas: the messages that
+        follow the previous prompt's messages, and the tools only when they
+        changed.
+        """
+        if STORE_FULL_PROMPTS or previous_prompt is None:
+            return {
+                "messages": prompt.messages,
+                "tools": prompt.tools,
+                "metadata": prompt.metadata,
+            }
+
+        previous = previous_prompt.messages
+        shared = 0
+        for old, new in zip(previous, prompt.messages):
+            if old is not new and old != new:
+                break
+            shared += 1
 
-        if not action_def:
-            raise UnknownActionError(
-                f"The specified tool '{action_name}' does not exist. Try something else."
+        content = {
+            "message_offset": shared,
+            "messages": prompt.messages[shared:],
+            "message_count": len(prompt.messages),
+            "metadata": prompt.metadata,
+        }
+        if prompt.tools is previous_prompt.tools or prompt.tools == previous_prompt.tools:
+            content["tools_unchanged"] = True
+        else:
+            content["tools"] = prompt.tools
+        return content
+
+    def get_actions(self, response) -> List[tuple]:
+        """
+        Parse a response into (action_def, action) pairs. A response holds a
+        single action, or several independent ones under "tool_calls".
+        """
+        parsed = self.agent_language.parse_response(response)
+        actions = parsed["tool_calls"] if "tool_calls" in parsed else [parsed]
+        if not actions:
+            raise UnknownActionError("The response did not contain any tool calls.")
+
+        if len(actions) > 1 and not all(
+            c.allows_parallel_tool_calls for c in self.capabilities
+        ):
+            logger.warning(
+                "Response has %d tool calls but a capability requires one at a time; using the first",
+                len(actions),
             )
+            actions = actions[:1]
 
-        return action_def, action
+        resolved = []
+        for action in actions:
+            action_name = action["tool"]
+            action_def = self.actions.get_action(action_name)
 
-    def handle_agent_response(
-        self, action_context: ActionContext, response: str
-    ) -> dict:
-        """Handle action with memory updates"""
-        action_def, action = self.get_action(response)
+            if not action_def:
+                raise UnknownActionError(
+                    f"The specified tool '{action_name}' does not exist. Try something else."
+                )
+            resolved.append((action_def, action))
 
+        return resolved
+
+    def get_action(self, response):
+        return self.get_actions(response)[0]
+
+    def _prepare_action(self, action_context: ActionContext, action_def, action):
+        """Run the process_action and pre_execute_action hooks for one action."""
         action_context.send_event(
             "agent/execute_action", {"action": action, "action_def": action_def}
         )
@@ -347,13 +430,10 @@ class Agent:
             if early_result is not None:
                 break
 
-        if early_result is not None:
-            result = early_result
-        else:
-            result = self.environment.execute_action(
-                self, action_context, action_def, action["args"]
-            )
+        return action, early_result
 
+    def _finish_action(self, action_context: ActionContext, response, action_def, action, result):
+        """Run the process_result hooks for one action."""
         result = reduce(
             lambda r, c: c.process_result(
                 self, action_context, response, action_def, action, r
@@ -367,6 +447,51 @@ class Agent:
             result["error"] = error
         return result
 
+    def handle_agent_response(
+        self, action_context: ActionContext, response: str
+    ) -> dict:
+        """Handle action with memory updates"""
+        calls = self.get_actions(response)
+
+        if len(calls) == 1:
+            action_def, action = calls[0]
+            action, early_result = self._prepare_action(action_context, action_def, action)
+
+            if early_result is not None:
+                result = early_result
+            else:
+                result = self.environment.execute_action(
+                    self, action_context, action_def, action["args"]
+                )
+
+            return self._finish_action(action_context, response, action_def, action, result)
+
+        # Several independent tool calls: hooks run in call order, the actions
+        # themselves run concurrently, and results are recorded in call order
+        prepared = [
+            (action_def, *self._prepare_action(action_context, action_def, action))
+            for action_def, action in calls
+        ]
+        to_execute = [
+            (action_def, action["args"])
+            for action_def, action, early_result in prepared
+            if early_result is None
+        ]
+        executed = iter(self.environment.execute_actions(self, action_context, to_execute))
+
+        results = []
+        for action_def, action, early_result in prepared:
+            result = early_result if early_result is not None else next(executed)
+            results.append(
+                self._finish_action(action_context, response, action_def, action, result)
+            )
+
+        return {
+            "tool": "parallel_tool_calls",
+            "tool_executed": any(r.get("tool_executed", False) for r in results if isinstance(r, dict)),
+            "results": results,
+        }
+
     def should_terminate(self, action_context: ActionContext, response: str) -> bool:
         request_id = action_context.get("request_id")
         if request_id and request_killed(
@@ -377,13 +502,13 @@ class Agent:
         elif not request_id:
             logger.debug(f"Request {request_id} not provided, continuing...")
 
-        action_def, action = self.get_action(response)
+        calls = self.get_actions(response)
         capability_decision = reduce(
             lambda a, c: c.should_terminate(self, action_context, response),
             self.capabilities,
             False,
         )
-        return action_def.terminal or capability_decision
+        return any(action_def.terminal for action_def, _ in calls) or capability_decision
 
     def set_current_task(
         self, action_context: ActionContext, memory: Memory, task: str
@@ -452,13 +577,24 @@ class Agent:
         send_event = action_context.incremental_event()
         response = None
 
+        # Stream when the LLM supports it, stopping once the action is complete
+        can_stream = getattr(self.generate_response, "supports_streaming", False)
+
         max_tries = 3
         for i in range(max_tries):
             try:
 
                 send_event("agent/prompt/action/get", {"prompt": full_prompt})
 
-                response = self.generate_response(full_prompt)
+                parser = self.agent_language.incremental_parser() if can_stream else None
+                if parser is not None:
+                    response = self.generate_response(
+                        full_prompt, stop_streaming=parser.feed
+                    )
+                    if parser.complete:
+                        response = parser.completed_text()
+                else:
+                    response = self.generate_response(full_prompt)
 
                 send_event("agent/prompt/action/raw_result", {"response": response})
 
@@ -468,8 +604,9 @@ class Agent:
                     response,
                 )
 
-                # Parse into action
-                action_def, action = self.get_action(response)
+                # Parse into action(s)
+                calls = self.get_actions(response)
+                action_def, action = calls[0]
                 send_event(
                     "agent/prompt/action/result",
                     {"action": action, "action_def": action_def},
@@ -520,12 +657,22 @@ class Agent:
         # Record the initial task
         self.set_current_task(action_context, memory, user_input)
 
+        # A caller-supplied profiler also times the phases around the run
+        profiler = action_context.get("run_profiler")
+        owns_profiler = profiler is None and AGENT_RUN_PROFILING
+        if owns_profiler:
+            profiler = RunProfiler()
+            action_context.set("run_profiler", profiler)
+        profiler = profiler or NO_OP_PROFILER
+
         iterations = 0
         start_time = time.time()
+        previous_prompt = None
 
         # Call init on all capabilities
-        for capability in self.capabilities:
-            capability.init(self, action_context)
+        with profiler.phase("init"):
+            for capability in self.capabilities:
+                capability.init(self, action_context)
 
         # ========================
         # The Agent Loop
@@ -553,35 +700,41 @@ class Agent:
                 )
                 break
 
+            profiler.start_iteration(iterations)
+
             # 1. Construct the prompt for the LLM to generate a response
-            prompt = self.construct_prompt(action_context, self.goals, memory)
-            memory.add_memory(
-                {
-                    "type": "prompt",
-                    "content": {
-                        "messages": prompt.messages,
-                        "tools": prompt.tools,
-                        "metadata": prompt.metadata,
-                    },
-                }
-            )
+            with profiler.phase("prompt"):
+                prompt = self.construct_prompt(action_context, self.goals, memory)
+                memory.add_memory(
+                    {
+                        "type": "prompt",
+                        "content": self.prompt_memory_content(prompt, previous_prompt),
+                    }
+                )
+                previous_prompt = prompt
 
             # 2. Prompt the agent for its next action
-            response = self.prompt_llm_for_action(action_context, prompt)
+            with profiler.phase("llm"):
+                response = self.prompt_llm_for_action(action_context, prompt)
 
             # 3. Handle the agent's response and execute the action (if any)
-            result = self.handle_agent_response(
-                action_context=action_context, response=response
-            )
+            with profiler.phase("tools"):
+                result = self.handle_agent_response(
+                    action_context=action_context, response=response
+                )
 
             # 4. Update memory with knowledge of what the agent did and how the environment responded
-            self.update_memory(action_context, memory, response, result)
+            with profiler.phase("memory"):
+                self.update_memory(action_context, memory, response, result)
 
             # 5. Decide if the loop should continue of if the agent should terminate
-            terminate_loop = self.should_terminate(action_context, response)
+            with profiler.phase("terminate_check"):
+                terminate_loop = self.should_terminate(action_context, response)
 
-            for capability in self.capabilities:
-                capability.end_agent_loop(self, action_context)
+                for capability in self.capabilities:
+                    capability.end_agent_loop(self, action_context)
+
+            profiler.end_iteration(action_context)
 
             if terminate_loop:
                 break
@@ -589,4 +742,7 @@ class Agent:
         for capability in self.capabilities:
             capability.terminate(self, action_context)
 
+        if owns_profiler:
+            profiler.send_summary(action_context)
+
         return memory
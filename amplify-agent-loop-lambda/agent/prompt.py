@@ -3,7 +3,8 @@ import os
 import random
 import re
 import traceback
-from typing import List
+import uuid
+from typing import Callable, List, Optional
 
 import litellm
 from attr import dataclass
@@ -21,10 +22,80 @@ class Prompt:
     metadata: dict = {}
 
 
+def _stream_completion(
+    model, messages, stop_streaming: Callable[[str], bool], completion_params: dict = None
+):
+    """
+    Stream a completion, handing each text fragment to stop_streaming and
+    closing the stream as soon as it returns True. Returns the text, the
+    response id and the usage; usage is estimated when the stream was cut
+    short before the provider reported it.
+    """
+    stream = completion(
+        model=model,
+        messages=messages,
+        max_completion_tokens=32768,
+        stream=True,
+        stream_options={"include_usage": True},
+        **(completion_params or {}),
+    )
+    parts = []
+    response_id = None
+    usage = None
+    stopped = False
+    try:
+        for chunk in stream:
+            response_id = response_id or getattr(chunk, "id", None)
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = getattr(chunk.choices[0].delta, "content", None)
+            if delta:
+                parts.append(delta)
+                if stop_streaming(delta):
+                    stopped = True
+                    break
+    finally:
+        if stopped:
+            # Closing the connection stops the provider generating the rest
+            close = getattr(stream, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    text = "".join(parts)
+    if usage is None:
+        try:
+            input_tokens = litellm.token_counter(model=model, messages=messages)
+            output_tokens = litellm.token_counter(model=model, text=text)
+        except Exception:
+            input_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+            output_tokens = len(text) // 4
+        usage = {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}
+    if stopped:
+        logger.debug("Stopped streaming after %d characters", len(text))
+    return text, response_id or f"stream-{uuid.uuid4()}", usage
+
+
 def generate_response(
-    model, prompt: Prompt, account_details: dict, details: dict = {}
+    model,
+    prompt: Prompt,
+    account_details: dict,
+    details: dict = {},
+    stop_streaming: Optional[Callable[[str], bool]] = None,
+    completion_params: dict = None,
 ) -> str:
-    """Call LLM to get response"""
+    """
+    Call LLM to get response.
+
+    With stop_streaming (prompts without tools only), the response is streamed
+    and cut off as soon as stop_streaming returns True for a fragment.
+    completion_params carries the provider credentials from litellm_model_params.
+    """
+    completion_params = completion_params or {}
 
     rate_limit = account_details.get("rate_limit")
     if rate_limit and os.environ.get("COST_CALCULATIONS_DYNAMO_TABLE"):
@@ -40,12 +111,20 @@ def generate_response(
 
     try:
         response = None
-        if not tools:
+        response_id = None
+        usage = {}
+        if not tools and stop_streaming:
+            logger.debug("Prompting without tools, streaming.")
+            result, response_id, usage = _stream_completion(
+                model, messages, stop_streaming, completion_params
+            )
+        elif not tools:
             logger.debug("Prompting without tools.")
             response = completion(
                 model=model,
                 messages=messages,
                 max_completion_tokens=32768,
+                **completion_params,
             )
             result = response.choices[0].message.content
         else:
@@ -55,30 +134,38 @@ def generate_response(
                 messages=messages,
                 tools=tools,
                 max_completion_tokens=4096,
+                **completion_params,
             )
 
             if response.choices[0].message.tool_calls:
-                tool = response.choices[0].message.tool_calls[0]
-                tool_args = None
-                try:
-                    tool_args = json.loads(tool.function.arguments)
-                except:
-                    logger.error(
-                        f"Error parsing tool arguments coming from litellm: {tool.function.arguments}"
-                    )
-
-                result = {
-                    "tool": tool.function.name,
-                    "args": tool_args,
-                }
+                calls = []
+                for tool in response.choices[0].message.tool_calls:
+                    tool_args = None
+                    try:
+                        tool_args = json.loads(tool.function.arguments)
+                    except:
+                        logger.error(
+                            f"Error parsing tool arguments coming from litellm: {tool.function.arguments}"
+                        )
+
+                    calls.append({
+                        "tool": tool.function.name,
+                        "args": tool_args,
+                    })
+
+                # Independent tool calls emitted together are executed concurrently by the agent
+                result = calls[0] if len(calls) == 1 else {"tool_calls": calls}
                 result = json.dumps(result)
             else:
                 result = response.choices[0].message.content
 
-        logger.debug(f"Recording usage for litellm response id: {response.id}")
+        if response is not None:
+            response_id = response.id
+            usage = response.get("usage", {})
+
+        logger.debug(f"Recording usage for litellm response id: {response_id}")
         model_id = model.split("/")[1]
 
-        usage = response.get("usage", {})
         input_tokens = usage.get("prompt_tokens", 0)
         output_tokens = usage.get("completion_tokens", 0)
 
@@ -133,7 +220,7 @@ def generate_response(
             
             token_cost = record_usage(
                 account_details,
-                response.id,
+                response_id,
                 model_id,
                 input_tokens,
                 output_tokens,
@@ -265,7 +352,17 @@ def get_model_provider(model_id):
 
 
 def litellm_model_str(model):
+    return litellm_model_params(model)[0]
+
+
+def litellm_model_params(model):
+    """
+    The litellm model string for a model and the credentials to pass to each
+    completion() call. Credentials are not written to os.environ, so agent runs
+    sharing a process can use different providers and deployments.
+    """
     provider_prefix = ""
+    params = {}
     if is_openai_model(model):
         # Lookup the provider from the model rate table to determine if we should use OpenAI or Azure
         provider = get_model_provider(model)
@@ -277,7 +374,7 @@ def litellm_model_str(model):
             parsed_secret = json.loads(secret_data)
             openai_api_key = parsed_secret.get("OPENAI_API_KEY")
             if openai_api_key:
-                os.environ["OPENAI_API_KEY"] = openai_api_key
+                params["api_key"] = openai_api_key
                 provider_prefix = "openai"
             else:
                 raise ValueError("OPENAI_API_KEY not found in secrets for OpenAI provider")
@@ -290,9 +387,9 @@ def litellm_model_str(model):
 
             base = base.split("/openai")[0]
 
-            os.environ["AZURE_API_KEY"] = key
-            os.environ["AZURE_API_BASE"] = base
-            os.environ["AZURE_API_VERSION"] = version
+            params["api_key"] = key
+            params["api_base"] = base
+            params["api_version"] = version
             provider_prefix = "azure"
     elif is_bedrock_model(model):
         region = os.environ.get("AWS_REGION", "us-east-1")
@@ -306,12 +403,12 @@ def litellm_model_str(model):
         secret_data = get_secret_value(secret_name)
         parsed_secret = json.loads(secret_data)
         gemini_api_key = parsed_secret.get("GEMINI_API_KEY")
-        os.environ["GEMINI_API_KEY"] = gemini_api_key
+        params["api_key"] = gemini_api_key
         provider_prefix = "gemini"
 
     else:
         raise ValueError(f"Unsupported model: {model}")
-    return f"{provider_prefix}/{model}"
+    return f"{provider_prefix}/{model}", params
 
 
 def create_llm(
@@ -322,11 +419,11 @@ def create_llm(
     details: dict = {},
     advanced_model=None,
 ):
-    agent_model_str = litellm_model_str(model)
-    advanced_model_str = agent_model_str
+    agent_model_str, agent_model_params = litellm_model_params(model)
+    advanced_model_str, advanced_model_params = agent_model_str, agent_model_params
     try:
         if advanced_model:
-            advanced_model_str = litellm_model_str(advanced_model)
+            advanced_model_str, advanced_model_params = litellm_model_params(advanced_model)
     except Exception as e:
         logger.warning(
             f"Error creating advanced model: {e}, using agent model as advanced model..."
@@ -336,20 +433,27 @@ def create_llm(
 
     total_cost = 0.0
 
-    def llm(prompt):
+    def llm(prompt, stop_streaming=None):
         nonlocal total_cost
-        model_str = agent_model_str
+        model_str, model_params = agent_model_str, agent_model_params
         if isinstance(prompt.metadata, dict) and prompt.metadata.get(
             "advanced_reasoning", False
         ):
             logger.info(f"Prompting using advanced model: {advanced_model_str}")
-            model_str = advanced_model_str
+            model_str, model_params = advanced_model_str, advanced_model_params
 
         result, token_cost = generate_response(
-            model_str, prompt, account_details, details
+            model_str,
+            prompt,
+            account_details,
+            details,
+            stop_streaming=stop_streaming,
+            completion_params=model_params,
         )
         total_cost += token_cost
         return result
 
     llm.get_total_cost = lambda: total_cost
+    llm.model = agent_model_str
+    llm.supports_streaming = True
     return llm
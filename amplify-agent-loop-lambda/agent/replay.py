@@ -0,0 +1,257 @@
+"""
+Deterministic replay of a saved agent run.
+
+Re-runs the agent loop for an agentState/{user}/{session}/agent_state.json
+with the LLM replaced by the run's recorded assistant responses and every
+tool replaced by its recorded environment result, so a slow or misbehaving
+run can be profiled locally without model, AWS or network access:
+
+    python -m agent.replay agent_state.json --runs 5
+
+Only the agent loop itself does real work; the per-phase timings it reports
+are the numbers to compare when checking a change for regressions.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# The cost map is otherwise downloaded when litellm is imported
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from agent.agents import actions_agent
+from agent.components.action_parser import extract_action
+from agent.components.run_profiler import RunProfiler
+from agent.core import Action, ActionRegistry, Environment
+from pycommon.logger import getLogger
+
+logger = getLogger("agent_replay")
+
+PLAN_PREFIX = "You must follow these instructions carefully to complete the task:\n"
+
+
+def load_agent_state(path: str) -> List[Dict]:
+    """The saved memory entries of a run, from a plain or gzipped agent_state.json."""
+    with open(path, "rb") as f:
+        body = f.read()
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    state = json.loads(body.decode("utf-8"))
+    if isinstance(state, dict):
+        state = state.get("result") or state.get("data") or []
+    return state
+
+
+def _response_text(content) -> str:
+    # load_memory_content turned JSON responses back into objects
+    if isinstance(content, str):
+        return content
+    return json.dumps(content)
+
+
+def _tool_names(content) -> List[str]:
+    if isinstance(content, str):
+        try:
+            content = extract_action(content)
+        except ValueError:
+            return ["terminate"]
+    if not isinstance(content, dict):
+        return ["terminate"]
+    calls = content.get("tool_calls", [content])
+    return [call.get("tool", "terminate") for call in calls if isinstance(call, dict)]
+
+
+def _is_cost_entry(state: List[Dict]) -> bool:
+    last = state[-1] if state else None
+    return (
+        isinstance(last, dict)
+        and isinstance(last.get("content"), dict)
+        and "total_token_cost" in last["content"]
+    )
+
+
+class RecordedLLM:
+    """
+    Answers the agent's prompts from a saved run. Action prompts get the
+    recorded assistant responses in order; other prompts (the initial plan)
+    get the recorded plan. Once the recording runs out the agent is told to
+    terminate and the divergence is noted.
+    """
+
+    model = "replay"
+    supports_streaming = True
+
+    def __init__(self, state: List[Dict], latency: float = 0.0, chunk_size: int = 64):
+        self.responses = [
+            _response_text(e["content"]) for e in state if e.get("role") == "assistant"
+        ]
+        self.plans = [
+            e["content"][len(PLAN_PREFIX):]
+            for e in state
+            if e.get("role") == "system"
+            and isinstance(e.get("content"), str)
+            and e["content"].startswith(PLAN_PREFIX)
+        ]
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.divergences: List[str] = []
+        self._next_response = 0
+        self._next_plan = 0
+
+    def get_total_cost(self):
+        return 0.0
+
+    def __call__(self, prompt, stop_streaming: Optional[Callable[[str], bool]] = None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not prompt.tools and stop_streaming is None:
+            if self._next_plan >= len(self.plans):
+                return ""
+            self._next_plan += 1
+            return self.plans[self._next_plan - 1]
+
+        if self._next_response >= len(self.responses):
+            self.divergences.append("The agent asked for more actions than were recorded")
+            return json.dumps(
+                {"tool": "terminate", "args": {"message": "Replay recording exhausted"}}
+            )
+        response = self.responses[self._next_response]
+        self._next_response += 1
+
+        if stop_streaming is not None:
+            # Fed in fragments like a streamed completion
+            for i in range(0, len(response), self.chunk_size):
+                if stop_streaming(response[i : i + self.chunk_size]):
+                    break
+        return response
+
+
+class RecordedEnvironment(Environment):
+    """Returns the recorded result of each tool call instead of running it."""
+
+    def __init__(self, state: List[Dict], latency: float = 0.0):
+        super().__init__()
+        self.results = []
+        for entry in state[:-1] if _is_cost_entry(state) else state:
+            if entry.get("role") != "environment":
+                continue
+            content = entry["content"]
+            if isinstance(content, dict) and content.get("tool") == "parallel_tool_calls":
+                self.results.extend(content.get("results", []))
+            else:
+                self.results.append(content)
+        self.latency = latency
+        self.divergences: List[str] = []
+        self._next = 0
+
+    def execute_action(self, agent, action_context, action: Action, args: dict) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        if self._next >= len(self.results):
+            self.divergences.append(f"No recorded result for a call to {action.name}")
+            return {"tool": action.name, "tool_executed": False, "error": "No recorded result"}
+
+        result = self.results[self._next]
+        self._next += 1
+        recorded_tool = result.get("tool") if isinstance(result, dict) else None
+        if recorded_tool and recorded_tool != action.name:
+            self.divergences.append(
+                f"Call {self._next} went to {action.name}, the recording has {recorded_tool}"
+            )
+        return result
+
+
+def recorded_action_registry(state: List[Dict]) -> ActionRegistry:
+    """
+    Stub actions for every tool the recording calls. "terminate" and the
+    tools only called in the final response end the loop, as the original
+    run did.
+    """
+    calls = [
+        _tool_names(e["content"]) for e in state if e.get("role") == "assistant"
+    ]
+    earlier = {name for names in calls[:-1] for name in names}
+    terminal = {"terminate"} | {name for name in (calls[-1] if calls else []) if name not in earlier}
+
+    registry = ActionRegistry()
+    for name in sorted({"terminate", *(n for names in calls for n in names)}):
+        registry.register(
+            Action(
+                name=name,
+                function=lambda **args: None,
+                description=f"Replayed {name}",
+                parameters={"type": "object", "properties": {}},
+                output={},
+                terminal=name in terminal,
+            )
+        )
+    return registry
+
+
+def replay_agent_state(
+    state: List[Dict],
+    build: Callable = actions_agent.build,
+    llm_latency: float = 0.0,
+    tool_latency: float = 0.0,
+    action_context_props: Dict[str, Any] = None,
+) -> Dict:
+    """
+    Replay one saved run and return its profile, the events it sent and any
+    points where the agent no longer followed the recording.
+    """
+    user_input = next(
+        (e["content"] for e in state if e.get("role") == "user"), ""
+    )
+    llm = RecordedLLM(state, latency=llm_latency)
+    environment = RecordedEnvironment(state, latency=tool_latency)
+    agent = build(environment, recorded_action_registry(state), llm)
+
+    events = []
+    profiler = RunProfiler()
+    memory = agent.run(
+        user_input=user_input if isinstance(user_input, str) else json.dumps(user_input),
+        action_context_props={
+            "current_user": "replay",
+            "session_id": "replay",
+            "event_handler": lambda event_id, event: events.append((event_id, event)),
+            "run_profiler": profiler,
+            **(action_context_props or {}),
+        },
+    )
+
+    with profiler.phase("memory_serialization"):
+        json.dumps([{"role": m["type"], "content": m["content"]} for m in memory.items])
+
+    return {
+        "profile": profiler.summary(),
+        "iterations": profiler.iterations,
+        "events": events,
+        "divergences": llm.divergences + environment.divergences,
+        "memory": memory,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a saved agent run offline")
+    parser.add_argument("path", help="Path to agent_state.json")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per LLM call")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Seconds per tool call")
+    args = parser.parse_args(argv)
+
+    state = load_agent_state(args.path)
+    for run in range(args.runs):
+        replay = replay_agent_state(
+            state, llm_latency=args.llm_latency, tool_latency=args.tool_latency
+        )
+        print(json.dumps({"run": run + 1, **replay["profile"]}))
+        for divergence in replay["divergences"]:
+            print(f"  divergence: {divergence}")
+
+
+if __name__ == "__main__":
+    main()
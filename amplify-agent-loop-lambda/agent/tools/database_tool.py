@@ -3,11 +3,21 @@ import yaml
 import logging
 import re
 import boto3
+import csv
+import io
 import json
+import hashlib
+import uuid
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
 from typing import Dict, Optional, List, Union, Tuple
 from agent.components.tool import register_tool
 from agent.core import ActionContext
 from agent.prompt import Prompt
+from botocore.exceptions import ClientError
 
 """
 Database Configuration from DynamoDB
@@ -34,11 +44,60 @@ database connection configurations. Each item in the table should have the follo
 
 IMPORTANT: The "user" field is used to filter DB configurations stored in DynamoDB. 
 Only configurations matching the current_user parameter will be loaded from DynamoDB.
+They are read through the table's UserIndex GSI and cached per container for
+DB_CONFIG_CACHE_TTL_SECONDS.
 """
 
+DB_CONFIG_CACHE_TTL_SECONDS = int(os.environ.get("DB_CONFIG_CACHE_TTL_SECONDS", "300"))
 
-def load_config_from_dynamodb(current_user: str = None):
+# Per-container caches, shared by every query_database call in a warm Lambda:
+#   user -> (config, loaded_at)
+#   connection id -> (config fingerprint, attributes set on Vanna by connect_to_*)
+_config_cache: Dict[str, Tuple[Dict, float]] = {}
+_connection_cache: Dict[str, Tuple[str, Dict]] = {}
+_cache_lock = threading.Lock()
+
+# Attributes the Vanna connect_to_* methods set to bind an instance to a database
+_VANNA_CONNECTION_ATTRIBUTES = ("run_sql", "run_sql_is_set", "dialect", "static_documentation")
+
+
+def _query_user_connections(table, current_user: str) -> List[Dict]:
+    """All connection items for a user, read through the UserIndex GSI."""
+    items = []
+    query_args = {
+        "IndexName": "UserIndex",
+        "KeyConditionExpression": "#user = :user",
+        "ExpressionAttributeNames": {"#user": "user"},
+        "ExpressionAttributeValues": {":user": current_user},
+    }
+    while True:
+        response = table.query(**query_args)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        query_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _scan_all_connections(table) -> List[Dict]:
+    items = []
+    scan_args = {}
+    while True:
+        response = table.scan(**scan_args)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        scan_args["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def load_config_from_dynamodb(current_user: str = None, use_cache: bool = True):
     """Load configuration from AWS DynamoDB table filtered by current user"""
+    if current_user and use_cache:
+        with _cache_lock:
+            cached = _config_cache.get(current_user)
+        if cached and time.time() - cached[1] < DB_CONFIG_CACHE_TTL_SECONDS:
+            logging.info(f"Using cached database configuration for user: {current_user}")
+            return cached[0]
+
     try:
         logging.info(
             f"Loading database configuration from DynamoDB for user: {current_user}"
@@ -47,10 +106,12 @@ def load_config_from_dynamodb(current_user: str = None):
         dynamodb = boto3.resource("dynamodb")
         table = dynamodb.Table(os.environ.get("DB_CONNECTIONS_TABLE"))
 
-        # Scan the table to get all configurations
-        response = table.scan()
-        items = response.get("Items", [])
-        logging.info(f"Found {len(items)} total items in DynamoDB table")
+        # Query the user's configurations; only scan when no user is given
+        if current_user:
+            items = _query_user_connections(table, current_user)
+        else:
+            items = _scan_all_connections(table)
+        logging.info(f"Found {len(items)} items in DynamoDB table")
 
         # Process the items into a configuration structure
         config = {"db_config": {}}
@@ -99,6 +160,10 @@ def load_config_from_dynamodb(current_user: str = None):
             logging.error(error_msg)
             raise ValueError(error_msg)
 
+        if current_user:
+            with _cache_lock:
+                _config_cache[current_user] = (config, time.time())
+
         return config
 
     except Exception as e:
@@ -130,7 +195,10 @@ def get_db_config(connection_id: str = "default", current_user: str = None) -> D
             )
             return {}
 
-    # Otherwise, look for the specific connection ID
+    # Otherwise, look for the specific connection ID. A connection added since
+    # the user's configuration was cached is not in the map yet, so reload once.
+    if connection_id not in config["db_config"] and current_user:
+        config = load_config_from_dynamodb(current_user, use_cache=False)
     specific_config = config["db_config"].get(connection_id, {})
     logging.info(
         f"Returning specific config for connection_id {connection_id}: {specific_config}"
@@ -138,6 +206,391 @@ def get_db_config(connection_id: str = "default", current_user: str = None) -> D
     return specific_config
 
 
+def _config_fingerprint(db_config: Dict) -> str:
+    return hashlib.sha256(
+        json.dumps(db_config, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def connect_with_cache(vn, connection_id: str, db_config: Dict, connect) -> bool:
+    """
+    Bind a Vanna instance to the database for connection_id, reusing the
+    connection opened by an earlier call in this container when the
+    configuration is unchanged. connect(**db_config) opens a new connection.
+    Returns True when a cached connection was reused.
+    """
+    fingerprint = _config_fingerprint(db_config)
+    with _cache_lock:
+        cached = _connection_cache.get(connection_id)
+    if cached and cached[0] == fingerprint:
+        vn.__dict__.update(cached[1])
+        return True
+
+    connect(**db_config)
+    attributes = {
+        name: vn.__dict__[name]
+        for name in _VANNA_CONNECTION_ATTRIBUTES
+        if name in vn.__dict__
+    }
+    with _cache_lock:
+        _connection_cache[connection_id] = (fingerprint, attributes)
+    return False
+
+
+def evict_connection(connection_id: str):
+    """Drop a cached connection, e.g. after it failed."""
+    with _cache_lock:
+        _connection_cache.pop(connection_id, None)
+
+
+# Trained Vanna vector stores are persisted per connection, keyed by a fingerprint
+# of the connection's schema, so training only reruns when the schema changes.
+# Bump SCHEMA_INDEX_VERSION when the training steps change.
+SCHEMA_INDEX_VERSION = "1"
+SCHEMA_INDEX_BUCKET = os.environ.get(
+    "VANNA_SCHEMA_INDEX_BUCKET", os.environ.get("S3_CONSOLIDATION_BUCKET_NAME")
+)
+SCHEMA_INDEX_LOCAL_DIR = os.environ.get("VANNA_SCHEMA_INDEX_DIR", "/tmp/vanna_schema_index")
+
+
+def schema_fingerprint(df_information_schema, db_type: str, database: str, schema: str) -> str:
+    """Stable hash of a connection's information_schema rows."""
+    rows = df_information_schema.astype(str)
+    rows = rows.sort_values(list(rows.columns)).to_csv(index=False)
+    digest = hashlib.sha256()
+    digest.update(f"{SCHEMA_INDEX_VERSION}|{db_type}|{database}|{schema}\n".encode("utf-8"))
+    digest.update(rows.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SchemaIndex:
+    """
+    A Vanna ChromaDB directory for one connection and schema fingerprint.
+    The directory is kept in /tmp for warm invocations and archived to S3 so
+    that other containers can load it instead of retraining.
+    """
+
+    def __init__(self, current_user: str, connection_id: str, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.path = os.path.join(SCHEMA_INDEX_LOCAL_DIR, fingerprint)
+        self.s3_key = f"vannaSchemaIndex/{current_user}/{connection_id}/{fingerprint}.tar.gz"
+        self._ready_marker = os.path.join(self.path, ".ready")
+
+    def load(self) -> bool:
+        """Make the index available locally. Returns False when it must be built."""
+        if os.path.exists(self._ready_marker):
+            return True
+        if not SCHEMA_INDEX_BUCKET:
+            return False
+
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".tar.gz") as archive:
+                boto3.client("s3").download_fileobj(SCHEMA_INDEX_BUCKET, self.s3_key, archive)
+                archive.flush()
+                shutil.rmtree(self.path, ignore_errors=True)
+                os.makedirs(self.path, exist_ok=True)
+                with tarfile.open(archive.name, "r:gz") as tar:
+                    tar.extractall(self.path, filter="data")
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                logging.warning(f"Could not load schema index {self.s3_key}: {str(e)}")
+            shutil.rmtree(self.path, ignore_errors=True)
+            return False
+
+        open(self._ready_marker, "w").close()
+        return True
+
+    def prepare_build(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    def save(self):
+        """Mark the freshly trained index as ready and upload it to S3."""
+        open(self._ready_marker, "w").close()
+        if not SCHEMA_INDEX_BUCKET:
+            return
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".tar.gz") as archive:
+                with tarfile.open(archive.name, "w:gz") as tar:
+                    for entry in os.listdir(self.path):
+                        if entry != ".ready":
+                            tar.add(os.path.join(self.path, entry), arcname=entry)
+                boto3.client("s3").upload_file(archive.name, SCHEMA_INDEX_BUCKET, self.s3_key)
+            logging.info(f"Saved schema index to s3://{SCHEMA_INDEX_BUCKET}/{self.s3_key}")
+        except Exception as e:
+            logging.warning(f"Could not save schema index {self.s3_key}: {str(e)}")
+
+
+def use_schema_index(vn, path: str):
+    """
+    Point a connected Vanna instance's vector store at a persistent directory.
+    Re-running the ChromaDB_VectorStore initializer resets VannaBase state, so
+    the connection attributes are carried over.
+    """
+    from vanna.chromadb import ChromaDB_VectorStore
+
+    connection = {
+        name: vn.__dict__[name]
+        for name in _VANNA_CONNECTION_ATTRIBUTES
+        if name in vn.__dict__
+    }
+    try:
+        ChromaDB_VectorStore.__init__(
+            vn, config={**(vn.config or {}), "path": path, "client": "persistent"}
+        )
+    finally:
+        vn.__dict__.update(connection)
+
+
+# Query results are streamed into a CSV session file; only a sample of the rows
+# is returned to the agent. The file is capped by rows and bytes.
+DB_RESULT_SAMPLE_ROWS = int(os.environ.get("DB_RESULT_SAMPLE_ROWS", "20"))
+DB_RESULT_MAX_ROWS = int(os.environ.get("DB_RESULT_MAX_ROWS", "100000"))
+DB_RESULT_MAX_BYTES = int(os.environ.get("DB_RESULT_MAX_BYTES", str(50 * 1024 * 1024)))
+DB_RESULT_BATCH_ROWS = int(os.environ.get("DB_RESULT_BATCH_ROWS", "1000"))
+
+# DB-API connections used for streaming, keyed like _connection_cache
+_dbapi_connection_cache: Dict[str, Tuple[str, object]] = {}
+
+
+def _open_dbapi_connection(db_type: str, db_config: Dict):
+    """
+    Open a DB-API connection that supports incremental fetches, or None when
+    the backend is only reachable through Vanna's DataFrame-based run_sql.
+    """
+    # db_config["user"] is the Amplify owner of the connection, not a login
+    username = db_config.get("username")
+    if db_type == "postgres":
+        import psycopg2
+
+        return psycopg2.connect(
+            host=db_config.get("host"),
+            port=db_config.get("port"),
+            dbname=db_config.get("database"),
+            user=username,
+            password=db_config.get("password"),
+        )
+    if db_type == "mysql":
+        import pymysql
+
+        return pymysql.connect(
+            host=db_config.get("host"),
+            port=int(db_config.get("port") or 3306),
+            database=db_config.get("database"),
+            user=username,
+            password=db_config.get("password"),
+            cursorclass=pymysql.cursors.SSCursor,
+        )
+    if db_type == "snowflake":
+        import snowflake.connector
+
+        return snowflake.connector.connect(
+            account=db_config.get("account"),
+            user=username,
+            password=db_config.get("password"),
+            warehouse=db_config.get("warehouse"),
+            database=db_config.get("database"),
+            schema=db_config.get("schema"),
+        )
+    if db_type == "duckdb":
+        import duckdb
+
+        return duckdb.connect(db_config.get("database") or ":memory:", read_only=True)
+    if db_type == "sqlite":
+        import sqlite3
+
+        return sqlite3.connect(db_config["database"], check_same_thread=False)
+    return None
+
+
+def _streaming_cursor(connection_key: str, db_type: str, db_config: Dict):
+    """
+    A cursor that fetches rows incrementally, reusing this container's
+    connection. Returns (cursor, connection, reused), or (None, None, False)
+    when the backend has no DB-API driver.
+    """
+    fingerprint = _config_fingerprint(db_config)
+    with _cache_lock:
+        cached = _dbapi_connection_cache.get(connection_key)
+    connection = cached[1] if cached and cached[0] == fingerprint else None
+    reused = connection is not None
+    if connection is None:
+        connection = _open_dbapi_connection(db_type, db_config)
+        if connection is None:
+            return None, None, False
+        with _cache_lock:
+            _dbapi_connection_cache[connection_key] = (fingerprint, connection)
+
+    try:
+        if db_type == "postgres":
+            # A named cursor is a server-side cursor; rows arrive itersize at a time
+            cursor = connection.cursor(name=f"amplify_{uuid.uuid4().hex}")
+            cursor.itersize = DB_RESULT_BATCH_ROWS
+            return cursor, connection, reused
+        return connection.cursor(), connection, reused
+    except Exception:
+        _evict_dbapi_connection(connection_key, connection)
+        raise
+
+
+def _evict_dbapi_connection(connection_key: str, connection=None):
+    """Drop a cached DB-API connection and close it."""
+    with _cache_lock:
+        cached = _dbapi_connection_cache.get(connection_key)
+        if cached and (connection is None or cached[1] is connection):
+            del _dbapi_connection_cache[connection_key]
+            connection = cached[1]
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _end_read(connection_key: str, connection):
+    """
+    End the read transaction so a cached connection holds no snapshot or
+    locks between queries (pymysql and psycopg2 do not autocommit).
+    """
+    try:
+        connection.rollback()
+    except Exception as e:
+        logging.warning(f"Rollback failed, dropping cached connection: {str(e)}")
+        _evict_dbapi_connection(connection_key, connection)
+
+
+def _execute_streaming(connection_key: str, db_type: str, db_config: Dict, sql: str):
+    """
+    Execute sql on a streaming cursor. A cached connection that fails is
+    evicted and the query retried once on a new one; a dead connection often
+    still hands out cursors and only fails on execute. A statement a fresh
+    connection cannot stream (a Postgres named cursor only DECLAREs a SELECT,
+    so not SHOW or EXPLAIN) is left to run_sql.
+    Returns (cursor, connection), or (None, None) to fall back to run_sql.
+    """
+    for attempt in range(2):
+        try:
+            cursor, connection, reused = _streaming_cursor(connection_key, db_type, db_config)
+        except Exception as e:
+            logging.warning(f"Streaming cursor unavailable for {db_type}, using run_sql: {str(e)}")
+            return None, None
+        if cursor is None:
+            return None, None
+        try:
+            cursor.execute(sql)
+            return cursor, connection
+        except Exception as e:
+            if reused and not attempt:
+                _evict_dbapi_connection(connection_key, connection)
+                logging.warning(f"Cached {db_type} connection failed, reconnecting: {str(e)}")
+                continue
+            _end_read(connection_key, connection)
+            logging.warning(f"Streaming {db_type} query failed, using run_sql: {str(e)}")
+            return None, None
+    return None, None
+
+
+def _fetch_batches(cursor):
+    while True:
+        rows = cursor.fetchmany(DB_RESULT_BATCH_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def _dataframe_batches(df):
+    for start in range(0, len(df), DB_RESULT_BATCH_ROWS):
+        yield df.iloc[start:start + DB_RESULT_BATCH_ROWS].itertuples(index=False, name=None)
+
+
+def _json_safe(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def write_bounded_result(columns: List[str], batches, output) -> Dict:
+    """
+    Write result rows as CSV to output until DB_RESULT_MAX_ROWS or
+    DB_RESULT_MAX_BYTES is reached, keeping the first DB_RESULT_SAMPLE_ROWS
+    rows as JSON-safe dicts.
+    """
+    csv.writer(output).writerow(columns)
+    # Rows are formatted into a buffer first so their size can be counted
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    sample = []
+    row_count = 0
+    bytes_written = 0
+    truncated = False
+
+    for batch in batches:
+        for row in batch:
+            if row_count >= DB_RESULT_MAX_ROWS or bytes_written >= DB_RESULT_MAX_BYTES:
+                truncated = True
+                break
+            writer.writerow(row)
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            output.write(line)
+            bytes_written += len(line.encode("utf-8"))
+            if len(sample) < DB_RESULT_SAMPLE_ROWS:
+                sample.append({c: _json_safe(v) for c, v in zip(columns, row)})
+            row_count += 1
+        if truncated:
+            break
+
+    return {
+        "sample": sample,
+        "row_count": row_count,
+        "bytes_written": bytes_written,
+        "truncated": truncated,
+    }
+
+
+def run_sql_to_session_file(
+    vn, sql: str, connection_key: str, db_type: str, db_config: Dict, action_context
+) -> Dict:
+    """
+    Execute sql and stream the rows into a CSV file in the agent's session
+    working directory. Backends with a DB-API driver are read through an
+    incremental cursor; the rest fall back to Vanna's run_sql DataFrame.
+    """
+    file_tracker = action_context.get("file_tracker") if action_context else None
+    filename = os.path.join("query_results", f"query_{uuid.uuid4().hex[:8]}.csv")
+
+    cursor, connection = _execute_streaming(connection_key, db_type, db_config, sql)
+
+    if file_tracker is not None:
+        output = file_tracker.open_file(filename, "w", newline="", encoding="utf-8")
+    else:
+        work_directory = (action_context.get("work_directory") if action_context else None) or tempfile.gettempdir()
+        os.makedirs(os.path.join(work_directory, "query_results"), exist_ok=True)
+        output = open(os.path.join(work_directory, filename), "w", newline="", encoding="utf-8")
+
+    with output:
+        if cursor is not None:
+            summary = None
+            try:
+                columns = [d[0] for d in cursor.description] if cursor.description else []
+                summary = write_bounded_result(columns, _fetch_batches(cursor), output)
+            finally:
+                if summary is None or summary["truncated"]:
+                    # Closing an unbuffered cursor (e.g. pymysql SSCursor) reads
+                    # the rest of the result; drop the connection instead
+                    _evict_dbapi_connection(connection_key, connection)
+                else:
+                    cursor.close()
+                    _end_read(connection_key, connection)
+        else:
+            df = vn.run_sql(sql)
+            columns = [str(c) for c in df.columns]
+            summary = write_bounded_result(columns, _dataframe_batches(df), output)
+
+    return {**summary, "columns": columns, "result_file": filename}
+
+
 def load_config(current_user: str = None):
     """Load configuration - now uses DynamoDB instead of YAML file"""
     return load_config_from_dynamodb(current_user)
@@ -174,7 +627,11 @@ def query_database(
     Returns:
         Dict containing:
         - success (bool): Whether the query was successful
-        - data (List[Dict]): The query results as a list of dictionaries
+        - data (List[Dict]): A sample of the query results as a list of dictionaries
+        - row_count (int): Number of rows written to result_file
+        - truncated (bool): Whether the result hit the row or size limit
+        - columns (List[str]): The result column names
+        - result_file (str): Session file (relative to the work directory) with the full CSV result
         - error (str): Error message if the query failed
         - sql (str): The generated SQL query
         - explanation (str): Natural language explanation of the results
@@ -363,7 +820,8 @@ def query_database(
     class MyVanna(ChromaDB_VectorStore, AmplifyLLM):
         def __init__(self, config=None, action_context=None):
             config = config or {}
-            config["persist_directory"] = None  # Use in-memory storage
+            # In-memory until use_schema_index points it at a persisted index
+            config["client"] = "in-memory"
             ChromaDB_VectorStore.__init__(self, config=config)
             AmplifyLLM.__init__(self, config=config, action_context=action_context)
 
@@ -510,12 +968,19 @@ def query_database(
         db_config = {k: v for k, v in db_config_from_dynamo.items() if v is not None}
         logging.info(f"Cleaned database config: {db_config}")
 
-        # Connect to database using configuration from DynamoDB
+        # Connect to database using configuration from DynamoDB, reusing this
+        # container's connection for the same connection id when possible
+        connection_cache_key = f"{current_user}:{connection_id}"
         try:
             logging.info(f"Attempting to connect to {db_type} database")
-            db_connection_methods[db_type](**db_config)
-            logging.info("Successfully connected to database")
+            reused = connect_with_cache(
+                vn, connection_cache_key, db_config, db_connection_methods[db_type]
+            )
+            logging.info(
+                f"Successfully connected to database (reused cached connection: {reused})"
+            )
         except Exception as e:
+            evict_connection(connection_cache_key)
             logging.error(f"Failed to connect to database: {e}")
             return {
                 "success": False,
@@ -544,32 +1009,66 @@ def query_database(
                 "relevant_columns": [],
             }
 
-        df_information_schema = vn.run_sql(schema_query)
+        try:
+            df_information_schema = vn.run_sql(schema_query)
+        except Exception as e:
+            if not reused:
+                raise
+            # The cached connection may have been closed by the server; reconnect once
+            logging.warning(f"Cached database connection failed, reconnecting: {str(e)}")
+            evict_connection(connection_cache_key)
+            connect_with_cache(
+                vn, connection_cache_key, db_config, db_connection_methods[db_type]
+            )
+            reused = False
+            df_information_schema = vn.run_sql(schema_query)
 
         # Process schema information
         schema_info = process_schema_info(df_information_schema, db_type)
         vn.set_db_schema(schema_info)
 
-        # Train the model with schema information
+        # Load the trained index for this schema, or train and persist it
+        schema_index = None
         try:
-            # Generate and execute training plan
-            plan = vn.get_training_plan_generic(df_information_schema)
-            if plan:
-                vn.train(plan=plan)
+            schema_index = SchemaIndex(
+                current_user,
+                connection_id,
+                schema_fingerprint(df_information_schema, db_type, database, schema),
+            )
+            index_loaded = schema_index.load()
+            if not index_loaded:
+                schema_index.prepare_build()
+            use_schema_index(vn, schema_index.path)
+        except Exception as e:
+            logging.warning(f"Schema index unavailable, training in memory: {str(e)}")
+            schema_index, index_loaded = None, False
 
-            # Add DDL schema
-            add_ddl_schema(vn, database, schema, df_information_schema)
+        if index_loaded:
+            logging.info(f"Using persisted schema index {schema_index.fingerprint}")
+        else:
+            # Train the model with schema information
+            try:
+                # Generate and execute training plan
+                plan = vn.get_training_plan_generic(df_information_schema)
+                if plan:
+                    vn.train(plan=plan)
 
-            # Add documentation
-            add_documentation(vn, df_information_schema)
+                # Add DDL schema
+                add_ddl_schema(vn, database, schema, df_information_schema)
 
-            # Add example queries
-            add_example_queries(vn, database, schema, df_information_schema)
+                # Add documentation
+                add_documentation(vn, df_information_schema)
 
-        except Exception as e:
-            logging.warning(
-                f"Training step failed: {str(e)}. Continuing with query generation..."
-            )
+                # Add example queries
+                add_example_queries(vn, database, schema, df_information_schema)
+
+                if schema_index:
+                    schema_index.save()
+
+            except Exception as e:
+                logging.warning(
+                    f"Training step failed: {str(e)}. Continuing with query generation..."
+                )
 
         # Generate and execute SQL
         sql = vn.generate_sql(question)
@@ -592,23 +1091,36 @@ def query_database(
         # Clean and validate SQL
         clean_sql = clean_and_validate_sql(sql, database, schema)
 
-        # Execute the query
-        results = vn.run_sql(clean_sql)
+        # Execute the query, streaming the full result into a session file
+        result = run_sql_to_session_file(
+            vn, clean_sql, connection_cache_key, db_type, db_config, action_context
+        )
+        data = result["sample"]
+
+        # Generate explanation with context from the sample rows
+        import pandas as pd
 
-        # Generate explanation with context
         explanation = generate_explanation(
-            vn, question, clean_sql, results, relevant_tables, relevant_columns
+            vn,
+            question,
+            clean_sql,
+            pd.DataFrame(data, columns=result["columns"]),
+            relevant_tables,
+            relevant_columns,
+            total_rows=result["row_count"],
         )
 
-        # Convert results to list of dictionaries
-        data = results.to_dict("records")
-
         logging.info(
-            f"Database tool completed successfully. Returned {len(data)} rows of data."
+            f"Database tool completed successfully. Wrote {result['row_count']} rows to "
+            f"{result['result_file']}, returned {len(data)} sample rows."
         )
         return {
             "success": True,
             "data": data,
+            "row_count": result["row_count"],
+            "truncated": result["truncated"],
+            "columns": result["columns"],
+            "result_file": result["result_file"],
             "error": None,
             "sql": clean_sql,
             "explanation": explanation,
@@ -837,13 +1349,17 @@ def generate_explanation(
     results,
     relevant_tables: List[str],
     relevant_columns: List[str],
+    total_rows: int = None,
 ) -> str:
     """Generate a natural language explanation of the query results."""
     try:
+        row_note = ""
+        if total_rows is not None and total_rows > len(results):
+            row_note = f" (first {len(results)} of {total_rows} rows)"
         explanation_prompt = f"""
         Question: {question}
         SQL Query: {sql}
-        Results: {results.to_string()}
+        Results{row_note}: {results.to_string()}
         Tables Used: {', '.join(relevant_tables)}
         Columns Used: {', '.join(relevant_columns)}
         
@@ -6,6 +6,12 @@ import zipfile
 from typing import Dict, List, Optional, Union, Any
 
 from agent.components.tool import register_tool
+from agent.components.content_index import (
+    get_content_index,
+    is_binary_file,
+    required_tokens,
+    stream_matches,
+)
 
 
 # @register_tool(tags=["file_handling"])
@@ -187,18 +193,60 @@ def search_files_recursive(search_root: str, pattern: str, use_regex: bool = Fal
         ['/home/user/project/src/utils.py', '/home/user/project/src/main.py']
     """
     matches = []
+    matcher = _content_matcher(search_root, pattern, use_regex)
     for root, _, files in os.walk(search_root):
         for filename in files:
             file_path = os.path.join(root, filename)
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
-                    if (use_regex and re.search(pattern, content)) or (
-                        not use_regex and pattern in content
-                    ):
-                        matches.append(file_path)
-            except Exception as e:
-                continue  # skip unreadable files
+            if matcher(file_path):
+                matches.append(file_path)
+    matcher.prune(search_root)
+    return matches
+
+
+def _content_matcher(
+    directory: str, pattern: str, use_regex: bool, use_index: bool = True, action_context=None
+):
+    """
+    Returns a callable telling whether a file's content contains pattern.
+    Binary files never match. Text files are streamed line by line and, for a
+    directory searched before in the session, the session's content index rules
+    out unchanged files that lack a trigram of a literal pattern without
+    reading them.
+    """
+    regex = re.compile(pattern) if use_regex else None
+    index = tokens = candidates = None
+    if use_index and not use_regex:
+        tokens = required_tokens(pattern)
+        if tokens:
+            index = get_content_index(directory, action_context)
+            if index is not None:
+                candidates = index.candidates(tokens)
+    seen = set()
+
+    def matches(file_path: str) -> bool:
+        if index is not None:
+            seen.add(os.path.abspath(file_path))
+            if not index.might_contain(file_path, tokens, candidates):
+                return False
+        try:
+            if is_binary_file(file_path):
+                return False
+            return stream_matches(file_path, pattern, regex)
+        except Exception:
+            return False  # skip unreadable files
+
+    def saw(file_path: str):
+        # Files skipped by the name, extension or size filters still exist
+        if index is not None:
+            seen.add(os.path.abspath(file_path))
+
+    def prune(under: str):
+        # Only after a complete walk; drops index entries for deleted files
+        if index is not None:
+            index.prune(seen, under)
+
+    matches.saw = saw
+    matches.prune = prune
     return matches
 
 
@@ -663,6 +711,8 @@ def search_files(
     recursive: bool = True,
     use_regex: bool = False,
     max_results: int = 100,
+    use_index: bool = True,
+    action_context=None,
 ):
     """
     Advanced multi-criteria file search with powerful filtering capabilities.
@@ -684,6 +734,8 @@ def search_files(
         recursive: Whether to search recursively in subdirectories (defaults to True)
         use_regex: Whether to use regex for pattern matching (defaults to False)
         max_results: Maximum number of results to return (defaults to 100)
+        use_index: Whether to use the session's content index for literal content patterns (defaults to True)
+        action_context: System context (automatically provided)
 
     Returns:
         List of matching file paths, or error message string
@@ -726,7 +778,11 @@ def search_files(
 
     Notes:
         - All criteria are optional - provide only what you need for your search
-        - If content_pattern is provided, the tool will need to read each file's contents
+        - If content_pattern is provided, files are read line by line until the first match;
+          binary files are skipped; once a directory is searched again in the same session
+          its files are indexed and only re-read when they change
+        - Content patterns are matched within a line unless they contain a newline
+          (or, in regex mode, a construct that can match one)
         - For case-insensitive searches, use regex mode with the appropriate flags
         - The search will stop after finding max_results matching files
         - Files that can't be read or accessed are simply skipped
@@ -759,20 +815,26 @@ def search_files(
 
     # Compile regex patterns if needed
     name_regex = None
-    content_regex = None
     if use_regex:
         if name_pattern:
             name_regex = re.compile(name_pattern)
-        if content_pattern:
-            content_regex = re.compile(content_pattern)
+    content_matcher = None
+    if content_pattern:
+        content_matcher = _content_matcher(
+            directory, content_pattern, use_regex, use_index, action_context
+        )
 
-    # Walk through directories
+    # Walk through directories, stopping the walk itself once max_results is reached
     for root, _, files in walk_method:
+        if count >= max_results:
+            break
         for filename in files:
             if count >= max_results:
                 break
 
             file_path = os.path.join(root, filename)
+            if content_matcher:
+                content_matcher.saw(file_path)
 
             # Check file extension
             if extension and not filename.endswith(extension):
@@ -797,17 +859,8 @@ def search_files(
                 continue  # Skip if we can't get the file size
 
             # Check content pattern if specified
-            if content_pattern:
-                try:
-                    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                        if use_regex:
-                            if not content_regex.search(content):
-                                continue
-                        elif content_pattern not in content:
-                            continue
-                except:
-                    continue  # Skip if we can't read the file
+            if content_matcher and not content_matcher(file_path):
+                continue
 
             # If we got here, the file matches all criteria
             matches.append(file_path)
@@ -816,4 +869,7 @@ def search_files(
             if count >= max_results:
                 break
 
+    if content_matcher and recursive and count < max_results:
+        content_matcher.prune(directory)
+
     return matches
@@ -1,9 +1,51 @@
+import bisect
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List, Union
 
+from agent.components.tool_cache import memoize_tool
 from agent.components.util import extract_markdown_block
 from agent.tools.prompt_tools import prompt_llm_with_messages
 
-
+# Rough characters per token, for sizing prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+# Each split request sends at most this many (estimated) tokens of the document
+SPLIT_WINDOW_TOKENS = int(os.environ.get("AGENT_LLM_SPLIT_WINDOW_TOKENS", "25000"))
+MAP_REDUCE_WORKERS = int(os.environ.get("AGENT_MAP_REDUCE_WORKERS", "8"))
+# Budget for the combined map outputs handed to a single reduce prompt
+REDUCE_INPUT_TOKENS = int(os.environ.get("AGENT_REDUCE_INPUT_TOKENS", "50000"))
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def line_offsets(content: str) -> List[int]:
+    """Character offset of the start of every line; line n starts at offsets[n - 1]."""
+    offsets = [0]
+    index = content.find("\n")
+    while index != -1:
+        offsets.append(index + 1)
+        index = content.find("\n", index + 1)
+    return offsets
+
+
+def token_window(content: str, offsets: List[int], start: int, max_tokens: int) -> int:
+    """
+    End offset of a window of at most max_tokens starting at start, cut at a
+    line boundary when one exists inside the window.
+    """
+    end = min(len(content), start + max_tokens * CHARS_PER_TOKEN)
+    if end == len(content):
+        return end
+    # Last line start after the window start and not past the window end
+    line = bisect.bisect_right(offsets, end) - 1
+    if offsets[line] > start:
+        return offsets[line]
+    return end
+
+
+@memoize_tool()
 def llm_split(action_context, instructions: str, content: str) -> List[str]:
     split_prompt = """
 ### **Task: Generate Precise Split Points in a Large Document**
@@ -28,7 +70,7 @@ You will receive a **very long text document** and a set of **instructions descr
 
     def extract_split_points(response: str) -> Union[List[Tuple[int, int]], str]:
         splits = []
-        for line in response.split("\n"):
+        for line in (response or "").split("\n"):
             line = line.strip()
             if line == "END":
                 return splits
@@ -40,9 +82,15 @@ You will receive a **very long text document** and a set of **instructions descr
         return splits
 
     all_splits = []
-    max_token_limit = 100000
+    offsets = line_offsets(content)
+    start = 0
+
+    while start < len(content):
+        end = token_window(content, offsets, start, SPLIT_WINDOW_TOKENS)
+        window = content[start:end]
+        # Line numbers in the response are relative to the window
+        first_line = bisect.bisect_right(offsets, start) - 1
 
-    while content:
         response = prompt_llm_with_messages(
             action_context=action_context,
             prompt=[
@@ -50,7 +98,7 @@ You will receive a **very long text document** and a set of **instructions descr
                 {"role": "user", "content": "### INSTRUCTIONS\n" + instructions + "\n"},
                 {
                     "role": "user",
-                    "content": "```input\n" + content[:max_token_limit] + "\n```",
+                    "content": "```input\n" + window + "\n```",
                 },
             ],
         )
@@ -58,21 +106,121 @@ You will receive a **very long text document** and a set of **instructions descr
         split_points = extract_split_points(extract_markdown_block(response, "output"))
 
         if split_points == "NOSPLIT":
-            all_splits.append(content)
-            break
-
-        end_detected = any(line.strip() == "END" for line in response.split("\n"))
-        if not end_detected:
+            if end == len(content):
+                all_splits.append(content[start:])
+                break
+            # Nothing to split in this window; it carries on into the next one
+            split_points = []
+
+        end_detected = any(
+            line.strip() == "END" for line in (response or "").split("\n")
+        )
+        if not end_detected and end < len(content):
+            # The last point may have been cut off with the window
             split_points = split_points[:-1]
 
-        previous_split_index = 0
+        previous_split_index = start
         for line, char in split_points:
-            split_index = (
-                sum(len(line) + 1 for line in content.splitlines()[: line - 1]) + char
-            )
+            line_index = first_line + max(line, 1) - 1
+            if line_index >= len(offsets):
+                continue
+            # A window can start in the middle of a line; its line 1 starts at start
+            line_start = start if line_index == first_line else offsets[line_index]
+            split_index = min(line_start + char, end)
+            if split_index <= previous_split_index:
+                continue
             all_splits.append(content[previous_split_index:split_index])
             previous_split_index = split_index
 
-        content = content[previous_split_index:]
+        if end == len(content):
+            all_splits.append(content[previous_split_index:])
+            break
+
+        if previous_split_index == start:
+            # No usable split point: close the window as a segment so the
+            # loop always advances
+            all_splits.append(window)
+            previous_split_index = end
+
+        start = previous_split_index
+
+    return [segment for segment in all_splits if segment]
+
+
+def _run_parallel(fn, items: list) -> list:
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(MAP_REDUCE_WORKERS, len(items))) as executor:
+        return list(executor.map(fn, items))
+
+
+def llm_map(action_context, instructions: str, segments: List[str]) -> List[str]:
+    """Apply the instructions to every segment with concurrent LLM calls, keeping segment order."""
+
+    def map_segment(segment: str) -> str:
+        return prompt_llm_with_messages(
+            action_context=action_context,
+            prompt=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": "```input\n" + segment + "\n```"},
+            ],
+        )
+
+    return _run_parallel(map_segment, segments)
+
+
+def llm_reduce(action_context, instructions: str, results: List[str]) -> str:
+    """
+    Combine map results into one answer. Results are grouped to fit
+    REDUCE_INPUT_TOKENS and each level of groups is reduced concurrently
+    until a single result remains.
+    """
+    results = [r if isinstance(r, str) else str(r) for r in results if r]
+    if not results:
+        return ""
+
+    def reduce_group(group: List[str]) -> str:
+        parts = "\n\n".join(
+            f"### PART {i + 1}\n{part}" for i, part in enumerate(group)
+        )
+        return prompt_llm_with_messages(
+            action_context=action_context,
+            prompt=[
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": parts},
+            ],
+        )
 
-    return all_splits
+    while True:
+        groups, group, group_tokens = [], [], 0
+        for result in results:
+            tokens = _estimate_tokens(result)
+            if group and group_tokens + tokens > REDUCE_INPUT_TOKENS:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(result)
+            group_tokens += tokens
+        groups.append(group)
+
+        if len(groups) > 1 and all(len(g) == 1 for g in groups):
+            # Every result already fills a prompt; pair them up so the level shrinks
+            groups = [results[i : i + 2] for i in range(0, len(results), 2)]
+
+        results = _run_parallel(reduce_group, groups)
+        if len(results) == 1:
+            return results[0]
+
+
+def llm_map_reduce(
+    action_context,
+    split_instructions: str,
+    map_instructions: str,
+    reduce_instructions: str,
+    content: str,
+) -> str:
+    """Split a long document with llm_split, map each segment concurrently and reduce the results."""
+    segments = llm_split(
+        action_context=action_context, instructions=split_instructions, content=content
+    )
+    mapped = llm_map(action_context, map_instructions, segments)
+    return llm_reduce(action_context, reduce_instructions, mapped)
@@ -5,11 +5,30 @@ from typing import Dict, List, Optional, Union, Any
 import json
 import mimetypes
 import shutil
+import signal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 from agent.components.tool import register_tool
+from agent.components.tool_cache import memoize_tool
+
+
+def _has_side_effects(args):
+    # Conversions that write an output file or extract images have side effects
+    # a cached result would skip
+    return bool(args.get("output_path") or args.get("extract_images"))
+
+
+def _is_cacheable_conversion(args, result):
+    return isinstance(result, dict) and result.get("success") is True
 
 
 # @register_tool(tags=["file_handling", "markdown"])
+@memoize_tool(
+    file_params=["file_path"],
+    cache_if=_is_cacheable_conversion,
+    skip_if=_has_side_effects,
+)
 def convert_to_markdown(
     file_path: str,
     output_path: Optional[str] = None,
@@ -112,6 +131,7 @@ def convert_to_markdown(
     command.extend(["--metadata", metadata_path])
 
     # Execute the command
+    process = None
     try:
         # If no output path is specified, we'll capture stdout
         if not output_path:
@@ -121,6 +141,7 @@ def convert_to_markdown(
                 stderr=subprocess.PIPE,
                 text=True,
                 errors="replace",
+                start_new_session=True,
             )
 
             stdout, stderr = process.communicate(timeout=timeout)
@@ -132,7 +153,11 @@ def convert_to_markdown(
         else:
             # If output path is specified, we'll just check the return code
             process = subprocess.Popen(
-                command, stderr=subprocess.PIPE, text=True, errors="replace"
+                command,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                start_new_session=True,
             )
 
             _, stderr = process.communicate(timeout=timeout)
@@ -194,6 +219,12 @@ def convert_to_markdown(
         return result
 
     except subprocess.TimeoutExpired:
+        # Don't leave the converter running after we give up on it
+        _kill_process(process)
+        try:
+            os.unlink(metadata_path)
+        except OSError:
+            pass
         return {
             "success": False,
             "error": f"Conversion timed out after {timeout} seconds",
@@ -202,6 +233,30 @@ def convert_to_markdown(
         return {"success": False, "error": f"Error during conversion: {str(e)}"}
 
 
+def _kill_process(process):
+    if process is None:
+        return
+    try:
+        # The converter runs in its own session; take down anything it started
+        os.killpg(process.pid, signal.SIGKILL)
+    except Exception:
+        process.kill()
+    try:
+        process.communicate(timeout=5)
+    except Exception:
+        pass
+
+
+def _batch_workers(max_workers: Optional[int] = None) -> int:
+    if max_workers:
+        return max(1, max_workers)
+    configured = os.environ.get("AGENT_MARKDOWN_BATCH_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    # Lambda sizes vCPUs with memory; each conversion is its own process
+    return os.cpu_count() or 1
+
+
 # @register_tool(tags=["file_handling", "markdown"])
 def batch_convert_to_markdown(
     file_paths: List[str],
@@ -211,12 +266,15 @@ def batch_convert_to_markdown(
     extract_images: bool = False,
     language: str = "en",
     timeout: int = 300,
+    max_workers: Optional[int] = None,
+    per_file_timeout: Optional[int] = None,
 ):
     """
     Converts multiple documents to markdown format in a single batch operation.
 
     This tool processes a list of files, converting each to markdown and saving
-    the results in the specified output directory.
+    the results in the specified output directory. Files are converted in
+    parallel, each in its own markitdown process with its own timeout.
 
     Args:
         file_paths: List of paths to input files to convert
@@ -226,6 +284,8 @@ def batch_convert_to_markdown(
         extract_images: Whether to extract images from the documents (default: False)
         language: Document language code for OCR (default: "en")
         timeout: Maximum execution time for the entire batch in seconds (default: 300)
+        max_workers: Number of files converted at once (default: AGENT_MARKDOWN_BATCH_WORKERS or the vCPU count)
+        per_file_timeout: Maximum execution time for each file in seconds (default: derived from timeout)
 
     Returns:
         Dictionary containing:
@@ -284,7 +344,8 @@ def batch_convert_to_markdown(
     Notes:
         - Ensures the output directory exists before processing
         - Each file maintains its original name but with a .md extension
-        - Per-file timeout is calculated based on the number of files and total timeout
+        - Per-file timeout is calculated based on the number of files, workers and total timeout
+        - A file that exceeds its timeout is killed and reported as failed without holding up the others
         - The overall batch is considered successful if at least one file converts successfully
         - Tolerates individual file failures and continues processing the remaining files
         - The results dictionary provides detailed status for each input file
@@ -298,32 +359,21 @@ def batch_convert_to_markdown(
                 "error": f"Failed to create output directory: {str(e)}",
             }
 
-    # Calculate per-file timeout
-    per_file_timeout = max(
-        timeout // max(len(file_paths), 1), 30
-    )  # Minimum 30 seconds per file
+    workers = min(_batch_workers(max_workers), max(len(file_paths), 1))
+
+    # Calculate per-file timeout from the number of rounds the pool needs
+    if not per_file_timeout:
+        rounds = -(-len(file_paths) // workers)
+        per_file_timeout = max(
+            timeout // max(rounds, 1), 30
+        )  # Minimum 30 seconds per file
 
     results = {}
     successful_count = 0
     failed_count = 0
 
-    for file_path in file_paths:
-        # Skip if file doesn't exist
-        if not os.path.exists(file_path):
-            results[file_path] = {
-                "success": False,
-                "error": f"Input file does not exist: {file_path}",
-            }
-            failed_count += 1
-            continue
-
-        # Generate output path
-        file_name = os.path.basename(file_path)
-        base_name = os.path.splitext(file_name)[0]
-        output_path = os.path.join(output_dir, f"{base_name}.md")
-
-        # Convert the file
-        result = convert_to_markdown(
+    def convert(file_path, output_path):
+        return convert_to_markdown(
             file_path=file_path,
             output_path=output_path,
             ocr=ocr,
@@ -333,9 +383,51 @@ def batch_convert_to_markdown(
             timeout=per_file_timeout,
         )
 
-        results[file_path] = result
+    futures = {}
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for file_path in file_paths:
+            # Skip if file doesn't exist
+            if not os.path.exists(file_path):
+                results[file_path] = {
+                    "success": False,
+                    "error": f"Input file does not exist: {file_path}",
+                }
+                continue
+
+            # Generate output path
+            file_name = os.path.basename(file_path)
+            base_name = os.path.splitext(file_name)[0]
+            output_path = os.path.join(output_dir, f"{base_name}.md")
+
+            futures[executor.submit(convert, file_path, output_path)] = file_path
 
-        if result["success"]:
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                file_path = futures[future]
+                try:
+                    results[file_path] = future.result()
+                except Exception as e:
+                    results[file_path] = {
+                        "success": False,
+                        "error": f"Error during conversion: {str(e)}",
+                    }
+        except FuturesTimeoutError:
+            for future, file_path in futures.items():
+                if file_path not in results:
+                    future.cancel()
+                    results[file_path] = {
+                        "success": False,
+                        "error": f"Batch timed out after {timeout} seconds",
+                    }
+    finally:
+        # Running conversions end on their own per-file timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Keep results in input order
+    results = {file_path: results[file_path] for file_path in file_paths}
+    for file_path in file_paths:
+        if results[file_path]["success"]:
             successful_count += 1
         else:
             failed_count += 1
@@ -1,6 +1,7 @@
 from typing import List, Any
 
 from agent.components.tool import register_tool, get_tool_metadata, to_openai_tools
+from agent.components.tool_cache import memoize_tool
 from agent.core import ActionContext
 from agent.prompt import Prompt
 from inspect import signature, Parameter
@@ -9,6 +10,9 @@ import json
 from pycommon.logger import getLogger
 logger = getLogger("tool_prompt")
 
+# Identical prompts from the same user and model within this window reuse the answer
+PROMPT_CACHE_TTL = 3600
+
 
 # @register_tool(tags=["prompts"])
 def prompt_llm_with_messages(action_context: ActionContext, prompt: dict):
@@ -263,6 +267,7 @@ def qa_check(
 
 
 # @register_tool(tags=["prompts"])
+@memoize_tool(ttl=PROMPT_CACHE_TTL)
 def prompt_llm(action_context: ActionContext, prompt: str):
     """
     Generate a response to a prompt using the LLM model.
@@ -303,6 +308,7 @@ def prompt_llm_with_info(
 
 
 # @register_tool(tags=["prompts"])
+@memoize_tool(ttl=PROMPT_CACHE_TTL)
 def prompt_llm_for_json(action_context: ActionContext, schema: dict, prompt: str):
     """
     Have the LLM generate JSON in response to a prompt. Always use this tool when you need structured data out of the LLM.
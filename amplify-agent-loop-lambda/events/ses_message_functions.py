@@ -4,7 +4,10 @@ import email
 from email import policy
 import re
 import os
+import threading
+import time
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
 from pycommon.logger import getLogger
 from botocore.exceptions import ClientError
 logger = getLogger("agent_email_events")
@@ -112,6 +115,83 @@ def safe_decode(byte_content):
 
 
 
+# GSI on the Cognito users table's email attribute (object-access CognitoUsersTable)
+COGNITO_USERS_EMAIL_INDEX = os.environ.get("COGNITO_USERS_EMAIL_INDEX", "EmailIndex")
+# In-container cache of email -> user_id; unknown senders are cached for less time
+USERNAME_CACHE_TTL_SECONDS = int(os.environ.get("EMAIL_USERNAME_CACHE_TTL_SECONDS", "900"))
+USERNAME_NEGATIVE_CACHE_TTL_SECONDS = int(
+    os.environ.get("EMAIL_USERNAME_NEGATIVE_CACHE_TTL_SECONDS", "300")
+)
+USERNAME_CACHE_MAX_ENTRIES = 2048
+
+_username_cache = {}
+_username_cache_lock = threading.Lock()
+
+
+def _cached_username(email_lower):
+    with _username_cache_lock:
+        entry = _username_cache.get(email_lower)
+        if entry is None:
+            return False, None
+        if entry[0] <= time.time():
+            del _username_cache[email_lower]
+            return False, None
+        return True, entry[1]
+
+
+def _cache_username(email_lower, username):
+    ttl = USERNAME_CACHE_TTL_SECONDS if username else USERNAME_NEGATIVE_CACHE_TTL_SECONDS
+    with _username_cache_lock:
+        if len(_username_cache) >= USERNAME_CACHE_MAX_ENTRIES:
+            now = time.time()
+            for key in [k for k, v in _username_cache.items() if v[0] <= now]:
+                del _username_cache[key]
+            if len(_username_cache) >= USERNAME_CACHE_MAX_ENTRIES:
+                _username_cache.clear()
+        _username_cache[email_lower] = (time.time() + ttl, username)
+
+
+def _query_user_id_by_email(cognito_user_table, email_values):
+    """
+    user_id for the first of email_values found on the email index. Falls back
+    to a paginated scan where the index has not been deployed yet.
+    """
+    try:
+        for value in email_values:
+            response = cognito_user_table.query(
+                IndexName=COGNITO_USERS_EMAIL_INDEX,
+                KeyConditionExpression=Key("email").eq(value),
+                ProjectionExpression="user_id",
+                Limit=1,
+            )
+            for item in response.get("Items", []):
+                if item.get("user_id"):
+                    return item["user_id"]
+        return None
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ValidationException":
+            raise
+        logger.warning(
+            "Email index %s unavailable (%s), scanning Cognito users table",
+            COGNITO_USERS_EMAIL_INDEX,
+            e,
+        )
+
+    scan_params = {
+        "ProjectionExpression": "user_id, email",
+        "FilterExpression": Attr("email").is_in(list(email_values)),
+    }
+    while True:
+        response = cognito_user_table.scan(**scan_params)
+        for item in response.get("Items", []):
+            if item.get("user_id"):
+                return item["user_id"]
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            return None
+        scan_params["ExclusiveStartKey"] = last_evaluated_key
+
+
 def lookup_username_from_cognito_table(email_address):
     """
     Direct lookup of username from email address using Cognito users table.
@@ -120,6 +200,9 @@ def lookup_username_from_cognito_table(email_address):
     Handles two cases:
     1. User has email field populated → match email field, return user_id
     2. User has no email field → check if user_id itself matches the email
+
+    Results, including unknown senders, are cached in the container for
+    EMAIL_USERNAME_CACHE_TTL_SECONDS / EMAIL_USERNAME_NEGATIVE_CACHE_TTL_SECONDS.
     
     Args:
         email_address (str): Full email like "karely.rodriguez@vanderbilt.edu"
@@ -129,6 +212,12 @@ def lookup_username_from_cognito_table(email_address):
     """
     if not email_address:
         return None
+
+    email_lower = email_address.lower()
+    found, username = _cached_username(email_lower)
+    if found:
+        logger.debug("Cognito lookup cache hit: %s -> %s", email_address, username)
+        return username
         
     try:
         dynamodb = boto3.resource("dynamodb")
@@ -140,7 +229,6 @@ def lookup_username_from_cognito_table(email_address):
             return None
             
         cognito_user_table = dynamodb.Table(table_name)
-        email_lower = email_address.lower()
         
         # Strategy 1: Look for users where user_id itself matches the email
         # (for cases where user_id is the email)
@@ -155,29 +243,24 @@ def lookup_username_from_cognito_table(email_address):
                 username = item.get("user_id")
                 if username:
                     logger.info("Cognito user_id field match: %s -> %s", email_address, username)
+                    _cache_username(email_lower, username)
                     return username
         except ClientError:
             # Item not found, continue to next strategy
             pass
         
         # Strategy 2: Look for users where email field matches
-        response = cognito_user_table.scan(
-            ProjectionExpression="user_id, email",
-            FilterExpression="email = :target_email",
-            ExpressionAttributeValues={
-                ":target_email": email_lower
-            }
-        )
-        
-        if response.get("Items"):
-            # Found exact match in email field
-            item = response["Items"][0]
-            username = item.get("user_id")
-            if username:
-                logger.info("Cognito email field match: %s -> %s", email_address, username)
-                return username
+        email_values = [email_lower]
+        if email_address != email_lower:
+            email_values.append(email_address)
+        username = _query_user_id_by_email(cognito_user_table, email_values)
+        if username:
+            logger.info("Cognito email field match: %s -> %s", email_address, username)
+            _cache_username(email_lower, username)
+            return username
                 
         logger.info("No Cognito table match found for email: %s", email_address)
+        _cache_username(email_lower, None)
         return None
         
     except Exception as e:
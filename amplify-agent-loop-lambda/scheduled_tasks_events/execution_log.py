@@ -0,0 +1,446 @@
+"""
+Append-only execution log for scheduled tasks.
+
+Each execution is its own item in SCHEDULED_TASK_EXECUTIONS_TABLE keyed by
+taskKey ("{user}#{taskId}") and executionId, so recording a run is a single
+conditional write that does not depend on how many runs the task has had.
+The ExecutedAtIndex LSI returns a task's runs newest first.
+
+Details are stored gzipped on the item; details too large for an item go to
+the consolidation bucket and the item keeps the key. When a task is deleted
+its executions are archived as compact JSONL batches, uploaded in parallel.
+"""
+
+import base64
+import gzip
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from pycommon.logger import getLogger
+
+logger = getLogger("scheduled_task_executions")
+
+EXECUTIONS_INDEX = "ExecutedAtIndex"
+# Keep compressed details well under the 400KB item limit
+INLINE_DETAILS_MAX_BYTES = int(
+    os.environ.get("SCHEDULED_TASK_EXECUTION_INLINE_BYTES", str(300 * 1024))
+)
+ARCHIVE_BATCH_RECORDS = int(os.environ.get("SCHEDULED_TASK_ARCHIVE_BATCH_RECORDS", "500"))
+ARCHIVE_WORKERS = int(os.environ.get("SCHEDULED_TASK_ARCHIVE_WORKERS", "8"))
+# Runs returned per page when a task's history is listed
+EXECUTIONS_PAGE_SIZE = int(os.environ.get("SCHEDULED_TASK_EXECUTIONS_PAGE_SIZE", "50"))
+
+# batch_write_item attempts for unprocessed items, with exponential backoff
+BATCH_WRITE_MAX_ATTEMPTS = 6
+BATCH_WRITE_BASE_DELAY = 0.1
+
+# Attributes returned when listing runs; details are only read for a single run
+_SUMMARY_ATTRIBUTES = ["executionId", "executedAt", "status", "source", "startTime", "finishedAt"]
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), default=_json_default)
+
+
+def _batch_write(dynamodb, request_items):
+    """
+    batch_write_item, retrying unprocessed items with exponential backoff.
+
+    Returns:
+        dict: The items still unprocessed after BATCH_WRITE_MAX_ATTEMPTS, keyed by table.
+    """
+    unprocessed = request_items
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(BATCH_WRITE_BASE_DELAY * 2 ** (attempt - 1))
+        response = dynamodb.batch_write_item(RequestItems=unprocessed)
+        unprocessed = response.get("UnprocessedItems", {})
+        if not unprocessed:
+            return {}
+    return unprocessed
+
+
+def _table_name():
+    table_name = os.environ.get("SCHEDULED_TASK_EXECUTIONS_TABLE")
+    if not table_name:
+        raise ValueError(
+            "Environment variable 'SCHEDULED_TASK_EXECUTIONS_TABLE' must be set."
+        )
+    return table_name
+
+
+def _task_key(current_user, task_id):
+    return f"{current_user}#{task_id}"
+
+
+def _archive_prefix(current_user, task_id):
+    return f"scheduledTaskLogs/{current_user}/{task_id}"
+
+
+def _details_attribute(current_user, task_id, execution_id, details):
+    """
+    The item attribute holding an execution's details: gzipped inline, or the
+    key of the S3 object they were written to when too large for the item.
+    """
+    body = gzip.compress(_dumps(details).encode("utf-8"))
+    if len(body) <= INLINE_DETAILS_MAX_BYTES:
+        return "details", {"B": body}
+
+    archive_key = f"{_archive_prefix(current_user, task_id)}/{execution_id}.json"
+    boto3.client("s3").put_object(
+        Bucket=os.environ.get("S3_CONSOLIDATION_BUCKET_NAME"),
+        Key=archive_key,
+        Body=_dumps(details),
+        ContentType="application/json",
+    )
+    return "detailsArchiveKey", {"S": archive_key}
+
+
+def append_execution_record(
+    current_user, task_id, execution_id, status, details=None, executed_at=None
+):
+    """
+    Create or update one execution's item. executedAt (the ExecutedAtIndex
+    sort key) is only set when the item is created, so runs stay ordered by
+    start time; later updates record finishedAt. A late "running" record never
+    overwrites a run that already finished.
+
+    Returns:
+        dict: The execution summary that was written, or None if it was skipped.
+    """
+    dynamodb = boto3.client("dynamodb")
+    executed_at = executed_at or datetime.now().isoformat()
+    details = details or {}
+
+    record = {
+        "executionId": execution_id,
+        "executedAt": executed_at,
+        "status": status,
+        "source": details.get("source", "unknown"),
+    }
+
+    values = {
+        ":user": {"S": current_user},
+        ":task_id": {"S": task_id},
+        ":executed_at": {"S": executed_at},
+        ":status": {"S": status},
+        ":source": {"S": record["source"]},
+    }
+    set_parts = [
+        "#user = :user",
+        "taskId = :task_id",
+        "executedAt = if_not_exists(executedAt, :executed_at)",
+        "#status = :status",
+        "#source = :source",
+        "startTime = if_not_exists(startTime, :executed_at)",
+    ]
+    if status != "running":
+        set_parts.append("finishedAt = :executed_at")
+    remove_parts = []
+
+    if details:
+        name, value = _details_attribute(current_user, task_id, execution_id, details)
+        if name == "details":
+            set_parts.append("details = :details")
+            values[":details"] = value
+            remove_parts.append("detailsArchiveKey")
+        else:
+            set_parts.append("detailsArchiveKey = :archive_key")
+            values[":archive_key"] = value
+            remove_parts.append("details")
+
+    update_expression = "SET " + ", ".join(set_parts)
+    if remove_parts:
+        update_expression += " REMOVE " + ", ".join(remove_parts)
+
+    params = {
+        "TableName": _table_name(),
+        "Key": {
+            "taskKey": {"S": _task_key(current_user, task_id)},
+            "executionId": {"S": execution_id},
+        },
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeNames": {
+            "#user": "user",
+            "#status": "status",
+            "#source": "source",
+        },
+        "ExpressionAttributeValues": values,
+        "ReturnValues": "NONE",
+    }
+    if status == "running":
+        params["ConditionExpression"] = (
+            "attribute_not_exists(executionId) OR #status = :status"
+        )
+
+    try:
+        dynamodb.update_item(**params)
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        logger.debug(
+            "Execution %s of task %s already finished; not marking it running",
+            execution_id,
+            task_id,
+        )
+        return None
+    return record
+
+
+def put_new_execution_records(records):
+    """
+    Write several new, already finished executions with batch_write_item.
+    Each record is a dict with current_user, task_id, execution_id, status,
+    details and executed_at. Unlike append_execution_record these are plain
+    puts, so execution ids must not exist yet.
+
+    Returns:
+        int: The number of records written.
+    """
+    if not records:
+        return 0
+
+    table_name = _table_name()
+    requests = []
+    for record in records:
+        current_user = record["current_user"]
+        task_id = record["task_id"]
+        execution_id = record["execution_id"]
+        executed_at = record.get("executed_at") or datetime.now().isoformat()
+        details = record.get("details") or {}
+
+        item = {
+            "taskKey": {"S": _task_key(current_user, task_id)},
+            "executionId": {"S": execution_id},
+            "user": {"S": current_user},
+            "taskId": {"S": task_id},
+            "executedAt": {"S": executed_at},
+            "startTime": {"S": executed_at},
+            "status": {"S": record["status"]},
+            "source": {"S": details.get("source", "unknown")},
+        }
+        if record["status"] != "running":
+            item["finishedAt"] = {"S": executed_at}
+        if details:
+            name, value = _details_attribute(current_user, task_id, execution_id, details)
+            item[name] = value
+        requests.append({"PutRequest": {"Item": item}})
+
+    dynamodb = boto3.client("dynamodb")
+    written = len(requests)
+    for i in range(0, len(requests), 25):
+        unprocessed = _batch_write(dynamodb, {table_name: requests[i : i + 25]})
+        if unprocessed:
+            dropped = len(unprocessed.get(table_name, []))
+            written -= dropped
+            logger.error("Gave up writing %s execution records after retries", dropped)
+    return written
+
+
+def list_execution_records(current_user, task_id, limit=None):
+    """Execution summaries for a task, newest first."""
+    dynamodb = boto3.client("dynamodb")
+    deserializer = TypeDeserializer()
+    names = {f"#a{i}": name for i, name in enumerate(_SUMMARY_ATTRIBUTES)}
+
+    records = []
+    paginator = dynamodb.get_paginator("query")
+    for page in paginator.paginate(
+        TableName=_table_name(),
+        IndexName=EXECUTIONS_INDEX,
+        KeyConditionExpression="taskKey = :task_key",
+        ExpressionAttributeValues={":task_key": {"S": _task_key(current_user, task_id)}},
+        ExpressionAttributeNames=names,
+        ProjectionExpression=", ".join(names),
+        ScanIndexForward=False,
+    ):
+        for item in page.get("Items", []):
+            records.append({k: deserializer.deserialize(v) for k, v in item.items()})
+            if limit and len(records) >= limit:
+                return records
+    return records
+
+
+def _encode_page_token(key):
+    return base64.urlsafe_b64encode(
+        json.dumps(key, separators=(",", ":")).encode("utf-8")
+    ).decode("ascii")
+
+
+def _decode_page_token(next_token):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(next_token.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid nextToken")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid nextToken")
+    return key
+
+
+def list_execution_records_page(current_user, task_id, limit=EXECUTIONS_PAGE_SIZE, next_token=None):
+    """
+    One page of execution summaries for a task, newest first.
+
+    Returns:
+        tuple: (records, next_token), next_token is None on the last page.
+    """
+    dynamodb = boto3.client("dynamodb")
+    deserializer = TypeDeserializer()
+    names = {f"#a{i}": name for i, name in enumerate(_SUMMARY_ATTRIBUTES)}
+
+    query_args = {
+        "TableName": _table_name(),
+        "IndexName": EXECUTIONS_INDEX,
+        "KeyConditionExpression": "taskKey = :task_key",
+        "ExpressionAttributeValues": {":task_key": {"S": _task_key(current_user, task_id)}},
+        "ExpressionAttributeNames": names,
+        "ProjectionExpression": ", ".join(names),
+        "ScanIndexForward": False,
+        "Limit": limit,
+    }
+    if next_token:
+        query_args["ExclusiveStartKey"] = _decode_page_token(next_token)
+
+    response = dynamodb.query(**query_args)
+    records = [
+        {k: deserializer.deserialize(v) for k, v in item.items()}
+        for item in response.get("Items", [])
+    ]
+    last_key = response.get("LastEvaluatedKey")
+    return records, _encode_page_token(last_key) if last_key else None
+
+
+def _record_from_item(item):
+    deserializer = TypeDeserializer()
+    record = {k: deserializer.deserialize(v) for k, v in item.items()}
+    for key in ("taskKey", "user", "taskId"):
+        record.pop(key, None)
+    details = record.pop("details", None)
+    if details is not None:
+        record["details"] = json.loads(gzip.decompress(bytes(details)).decode("utf-8"))
+    return record
+
+
+def get_execution_record(current_user, task_id, execution_id):
+    """One execution with its details, or None if it is not in the execution log."""
+    dynamodb = boto3.client("dynamodb")
+    response = dynamodb.get_item(
+        TableName=_table_name(),
+        Key={
+            "taskKey": {"S": _task_key(current_user, task_id)},
+            "executionId": {"S": execution_id},
+        },
+    )
+    if "Item" not in response:
+        return None
+
+    record = _record_from_item(response["Item"])
+    archive_key = record.pop("detailsArchiveKey", None)
+    if archive_key and "details" not in record:
+        try:
+            s3_response = boto3.client("s3").get_object(
+                Bucket=os.environ.get("S3_CONSOLIDATION_BUCKET_NAME"), Key=archive_key
+            )
+            record["details"] = json.loads(s3_response["Body"].read().decode("utf-8"))
+        except Exception as e:
+            logger.error("Error fetching archived details for %s: %s", execution_id, e)
+            record["detailsError"] = str(e)
+    return record
+
+
+def archive_execution_records(current_user, task_id):
+    """
+    Move every execution of a task to the consolidation bucket as JSONL
+    batches of ARCHIVE_BATCH_RECORDS runs, uploaded concurrently, then delete
+    the archived items.
+
+    Returns:
+        dict: Result with success status and archived count
+    """
+    consolidation_bucket = os.environ.get("S3_CONSOLIDATION_BUCKET_NAME")
+    if not consolidation_bucket:
+        logger.error("S3_CONSOLIDATION_BUCKET_NAME environment variable not set")
+        return {"success": False, "archived_count": 0, "error": "Consolidation bucket not configured"}
+
+    table_name = _table_name()
+    dynamodb = boto3.client("dynamodb")
+    s3 = boto3.client("s3")
+    task_key = _task_key(current_user, task_id)
+
+    items = []
+    paginator = dynamodb.get_paginator("query")
+    for page in paginator.paginate(
+        TableName=table_name,
+        KeyConditionExpression="taskKey = :task_key",
+        ExpressionAttributeValues={":task_key": {"S": task_key}},
+    ):
+        items.extend(page.get("Items", []))
+
+    if not items:
+        return {"success": True, "archived_count": 0}
+
+    batches = [
+        items[i : i + ARCHIVE_BATCH_RECORDS]
+        for i in range(0, len(items), ARCHIVE_BATCH_RECORDS)
+    ]
+    prefix = _archive_prefix(current_user, task_id)
+    run_id = uuid.uuid4().hex[:8]
+
+    def upload(indexed_batch):
+        index, batch = indexed_batch
+        lines = "\n".join(_dumps(_record_from_item(item)) for item in batch)
+        key = f"{prefix}/executions-{run_id}-{index:04d}.jsonl"
+        s3.put_object(
+            Bucket=consolidation_bucket,
+            Key=key,
+            Body=(lines + "\n").encode("utf-8"),
+            ContentType="application/x-ndjson",
+        )
+        return batch
+
+    archived = []
+    with ThreadPoolExecutor(max_workers=min(ARCHIVE_WORKERS, len(batches))) as executor:
+        futures = [executor.submit(upload, b) for b in enumerate(batches)]
+        for future in futures:
+            try:
+                archived.extend(future.result())
+            except Exception as e:
+                logger.error("Failed to archive an execution batch for task %s: %s", task_id, e)
+
+    # Only delete what made it to S3
+    for i in range(0, len(archived), 25):
+        requests = [
+            {"DeleteRequest": {"Key": {"taskKey": item["taskKey"], "executionId": item["executionId"]}}}
+            for item in archived[i : i + 25]
+        ]
+        unprocessed = _batch_write(dynamodb, {table_name: requests})
+        if unprocessed:
+            # Already in S3; the leftover items are copies of archived runs
+            logger.warning(
+                "Could not delete %s archived executions of task %s",
+                len(unprocessed.get(table_name, [])),
+                task_id,
+            )
+
+    logger.info(
+        "Archived %s executions for task %s to %s in %s batches",
+        len(archived),
+        task_id,
+        prefix,
+        len(batches),
+    )
+    return {
+        "success": len(archived) == len(items),
+        "archived_count": len(archived),
+    }
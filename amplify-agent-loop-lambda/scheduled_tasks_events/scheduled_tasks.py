@@ -1,6 +1,8 @@
 import json
 import os
-from datetime import datetime
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import re
 from typing import Dict, Any, List
 from zoneinfo import ZoneInfo
@@ -11,20 +13,32 @@ import pytz
 from decimal import Decimal
 
 from events.event_handler import MessageHandler
+from scheduled_tasks_events.execution_log import (
+    append_execution_record,
+    put_new_execution_records,
+)
 from delegation.api_keys import get_api_key_directly_by_id
 from events.event_templates import get_assistant_by_alias
-from pycommon.api.user_data import load_user_data, save_user_data
+from pycommon.api.user_data import load_user_data
 from pycommon.api.ses_email import send_email
-from pycommon.lzw import safe_compress
+from pycommon.lzw import is_lzw_compressed_format, lzw_uncompress
 from croniter import croniter
 from pycommon.logger import getLogger
 from pycommon.decorators import required_env_vars, track_execution
 from pycommon.dal.providers.aws.resource_perms import DynamoDBOperation
 logger = getLogger("agent_scheduled_tasks")
 
-# Constants for log archival
-MAX_LOGS_SIZE_BYTES = 350 * 1024  # 350KB threshold for archival
-TARGET_SIZE_AFTER_ARCHIVAL = 200 * 1024  # Keep 200KB in USER_DATA_STORAGE_TABLE
+# Due-time index: a sparse GSI keyed on nextRunBucket ("<UTC hour>#<shard>")
+# with nextRunAt as the sort key. Only active tasks with a next run carry it.
+NEXT_RUN_INDEX = os.environ.get("SCHEDULED_TASKS_NEXT_RUN_INDEX", "NextRunBucketIndex")
+NEXT_RUN_SHARDS = int(os.environ.get("SCHEDULED_TASKS_NEXT_RUN_SHARDS", "4"))
+# Hours of past buckets each tick queries; older runs are moved forward by reconcile_next_runs
+NEXT_RUN_LOOKBACK_HOURS = int(os.environ.get("SCHEDULED_TASKS_NEXT_RUN_LOOKBACK_HOURS", "2"))
+
+# Queue dispatch: concurrent key lookups / SQS batches / failure records
+DISPATCH_MAX_WORKERS = int(os.environ.get("SCHEDULED_TASKS_DISPATCH_WORKERS", "8"))
+SQS_BATCH_SIZE = 10  # send_message_batch limit
+SQS_MAX_BATCH_BYTES = 256 * 1024
 
 class DecimalEncoder(json.JSONEncoder):
     """
@@ -349,12 +363,15 @@ def task_completed(user_id, task_id, task_data, result):
                 )
 
             dynamodb = boto3.client("dynamodb")
-            dynamodb.update_item(
+            response = dynamodb.update_item(
                 TableName=table_name,
                 Key={"user": {"S": user_id}, "taskId": {"S": task_id}},
                 UpdateExpression="REMOVE lastCheckedAt, lastCheckRunId",
-                ReturnValues="NONE",
+                ReturnValues="ALL_NEW",
             )
+            # Runs that were due while this one executed are skipped, as they
+            # are counted from lastRunAt; move nextRunAt past them
+            _sync_next_run_after_execution(dynamodb, table_name, response)
 
             logger.info(f"Task {task_id} completed successfully and reset for next run")
 
@@ -429,12 +446,15 @@ def task_failed(user_id, task_id, error, task_data):
                 )
 
             dynamodb = boto3.client("dynamodb")
-            dynamodb.update_item(
+            response = dynamodb.update_item(
                 TableName=table_name,
                 Key={"user": {"S": user_id}, "taskId": {"S": task_id}},
                 UpdateExpression="REMOVE lastCheckedAt, lastCheckRunId",
-                ReturnValues="NONE",
+                ReturnValues="ALL_NEW",
             )
+            # Runs that were due while this one executed are skipped, as they
+            # are counted from lastRunAt; move nextRunAt past them
+            _sync_next_run_after_execution(dynamodb, table_name, response)
 
         if task_data.get("notifyOnFailure", False) and task_data.get(
             "notifyEmailAddresses", []
@@ -470,6 +490,15 @@ def task_failed(user_id, task_id, error, task_data):
         return None
 
 
+def _sync_next_run_after_execution(dynamodb, table_name, update_response):
+    attributes = update_response.get("Attributes")
+    if not attributes:
+        return
+    deserializer = TypeDeserializer()
+    task = {key: deserializer.deserialize(value) for key, value in attributes.items()}
+    update_next_run(dynamodb, table_name, task, after=datetime.now(pytz.utc))
+
+
 def get_timestamp(isoformat=True):
     date = datetime.now(pytz.utc)
     if isoformat:
@@ -514,16 +543,19 @@ def email_task_details(api_key, email_subject, email_body, email_addresses):
             logger.warning(f"Failed to send task notification to {address}")
 
 
-def archive_logs_to_consolidation_bucket(current_user, task_id, logs_to_archive, access_token):
+def archive_logs_to_consolidation_bucket(current_user, task_id, logs_to_archive, access_token=None):
     """
     Archive logs from USER_DATA_STORAGE_TABLE to consolidation bucket.
-    
+
+    Each execution keeps its own object (the details reader looks them up by
+    execution id); the uploads run concurrently.
+
     Args:
         current_user (str): User ID owning the task
         task_id (str): Task ID
         logs_to_archive (dict): Dictionary of {execution_id: compressed_data} to archive
         access_token (str): Access token for authentication
-    
+
     Returns:
         dict: Result with success status and archived count
     """
@@ -533,112 +565,59 @@ def archive_logs_to_consolidation_bucket(current_user, task_id, logs_to_archive,
         if not consolidation_bucket:
             logger.error("S3_CONSOLIDATION_BUCKET_NAME environment variable not set")
             return {"success": False, "archived_count": 0, "error": "Consolidation bucket not configured"}
-        
+
+        if not logs_to_archive:
+            return {"success": True, "archived_count": 0}
+
         s3 = boto3.client("s3")
-        archived_count = 0
-        
-        for execution_id, compressed_data in logs_to_archive.items():
+
+        def archive(execution):
+            execution_id, compressed_data = execution
             try:
                 # Archive path: scheduledTaskLogs/{user_id}/{task_id}/{execution_id}.json
                 archive_key = f"scheduledTaskLogs/{current_user}/{task_id}/{execution_id}.json"
-                
+
                 # Decompress data before archiving to S3 (S3 stores uncompressed)
                 if hasattr(compressed_data, '__iter__') and not isinstance(compressed_data, (str, bytes)):
                     # Already decompressed data
                     log_data = compressed_data
-                else:
+                elif is_lzw_compressed_format(compressed_data):
                     # Decompress LZW data
-                    from pycommon.lzw import is_lzw_compressed_format, lzw_uncompress
-                    if is_lzw_compressed_format(compressed_data):
-                        log_data = lzw_uncompress(compressed_data)
-                    else:
-                        log_data = compressed_data
-                
-                # Store in consolidation bucket
+                    log_data = lzw_uncompress(compressed_data)
+                else:
+                    log_data = compressed_data
+
                 s3.put_object(
                     Bucket=consolidation_bucket,
                     Key=archive_key,
                     Body=safe_json_dumps(log_data),
                     ContentType="application/json"
                 )
-                
-                archived_count += 1
                 logger.debug(f"Archived execution {execution_id} to consolidation bucket: {archive_key}")
-                
+                return True
             except Exception as e:
                 logger.error(f"Failed to archive execution {execution_id}: {e}")
-                continue
-        
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(DISPATCH_MAX_WORKERS, len(logs_to_archive))) as executor:
+            archived_count = sum(executor.map(archive, logs_to_archive.items()))
+
         logger.info(f"Archived {archived_count} logs for task {task_id} to consolidation bucket")
         return {"success": True, "archived_count": archived_count}
-        
+
     except Exception as e:
         logger.error(f"Error archiving logs to consolidation bucket: {e}")
         return {"success": False, "archived_count": 0, "error": str(e)}
 
 
-def calculate_logs_size(logs_dict):
-    """
-    Calculate approximate size of logs dictionary in bytes.
-    
-    Args:
-        logs_dict (dict): Dictionary of logs
-        
-    Returns:
-        int: Approximate size in bytes
-    """
-    try:
-        # Approximate size calculation using JSON serialization
-        return len(safe_json_dumps(logs_dict).encode('utf-8'))
-    except Exception as e:
-        logger.warning(f"Failed to calculate logs size: {e}")
-        return 0
-
-
-def select_logs_for_archival(logs_dict, target_size):
-    """
-    Select oldest logs for archival to reach target size.
-    
-    Args:
-        logs_dict (dict): Dictionary of {execution_id: compressed_data}
-        target_size (int): Target size to keep in bytes
-        
-    Returns:
-        tuple: (logs_to_keep, logs_to_archive) as dictionaries
-    """
-    try:
-        # Sort by execution_id (which contains timestamp) to get chronological order
-        # execution_id format: "execution-{uuid}" or "scheduled-task-{task_id}-{timestamp}"
-        sorted_executions = sorted(logs_dict.items(), key=lambda x: x[0], reverse=True)  # Newest first
-        
-        logs_to_keep = {}
-        logs_to_archive = {}
-        current_size = 0
-        
-        # Keep newest logs until we reach target size
-        for execution_id, log_data in sorted_executions:
-            log_size = len(safe_json_dumps(log_data).encode('utf-8'))
-            
-            if current_size + log_size <= target_size:
-                logs_to_keep[execution_id] = log_data
-                current_size += log_size
-            else:
-                logs_to_archive[execution_id] = log_data
-        
-        logger.debug(f"Selected {len(logs_to_keep)} logs to keep ({current_size} bytes), {len(logs_to_archive)} logs to archive")
-        
-        return logs_to_keep, logs_to_archive
-        
-    except Exception as e:
-        logger.error(f"Failed to select logs for archival: {e}")
-        # Return all logs to keep as fallback
-        return logs_dict, {}
-
-
 def add_task_execution_record(current_user, task_id, status, details=None, execution_id=None, access_token=None):
     """
     Add execution record to a task's logs.
 
+    The record is appended to the execution log (one item per execution);
+    the task item itself only gets its lastRunAt updated, so the cost does not
+    grow with the number of past runs.
+
     Args:
         current_user (str): User ID owning the task
         task_id (str): ID of the task
@@ -651,188 +630,394 @@ def add_task_execution_record(current_user, task_id, status, details=None, execu
     """
     # Get environment variables
     table_name = os.environ.get("SCHEDULED_TASKS_TABLE")
-    logs_bucket = os.environ.get("SCHEDULED_TASKS_LOGS_BUCKET")  #Marked for future deletion
 
-    if not table_name or not logs_bucket:
-        raise ValueError(
-            "Environment variables 'SCHEDULED_TASKS_TABLE' and 'SCHEDULED_TASKS_LOGS_BUCKET' must be set."
-        )
+    if not table_name:
+        raise ValueError("Environment variable 'SCHEDULED_TASKS_TABLE' must be set.")
 
     # Initialize AWS clients
     dynamodb = boto3.client("dynamodb")
-    s3 = boto3.client("s3")
-    
-    # Initialize deserializer and serializer early
-    deserializer = TypeDeserializer()
-    serializer = TypeSerializer()
 
     try:
-        # First, check if the task exists and belongs to the user
-        response = dynamodb.get_item(
-            TableName=table_name,
-            Key={"user": {"S": current_user}, "taskId": {"S": task_id}},
-        )
+        # Use provided execution_id or create a new one for backward compatibility
+        if execution_id is None:
+            execution_id = f"execution-{str(uuid.uuid4())}"
 
-        # If task doesn't exist or doesn't belong to the user
-        if "Item" not in response:
+        executed_at = datetime.now().isoformat()
+
+        # Update lastRunAt; the condition doubles as the existence check
+        try:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key={"user": {"S": current_user}, "taskId": {"S": task_id}},
+                UpdateExpression="SET lastRunAt = :executedAt",
+                ConditionExpression="attribute_exists(taskId)",
+                ExpressionAttributeValues={":executedAt": {"S": executed_at}},
+            )
+        except dynamodb.exceptions.ConditionalCheckFailedException:
             return {
                 "success": False,
                 "message": "Task not found or you don't have permission to update it",
             }
 
-        # Use provided execution_id or create a new one for backward compatibility
-        if execution_id is None:
-            execution_id = f"execution-{str(uuid.uuid4())}"
-        
-        executed_at = datetime.now().isoformat()
+        append_execution_record(
+            current_user,
+            task_id,
+            execution_id,
+            status,
+            details,
+            executed_at=executed_at,
+        )
+        logger.debug(f"Recorded execution {execution_id} with status {status} for task {task_id}")
 
-        execution_record = {
+        return {
+            "success": True,
+            "message": f"Execution record added successfully",
             "executionId": execution_id,
-            "executedAt": executed_at,
-            "status": status,
-            "source": details.get("source", "unknown"),
         }
 
-        # Check if task has migrated logs (no detailsKey entries)
-        logs = []
-        if "logs" in response["Item"]:
-            logs = deserializer.deserialize(response["Item"]["logs"])
-        
-        has_details_keys = any(log_entry.get("detailsKey") for log_entry in logs)
-        
-        # Store details based on migration status
-        if details:
-            if has_details_keys:
-                # Legacy mode: Store in S3
-                s3_key = f"{current_user}/{task_id}/logs/{execution_id}.json"
-                s3.put_object(
-                    Bucket=logs_bucket,
-                    Key=s3_key,
-                    Body=json.dumps(details),
-                    ContentType="application/json",
-                )
-                execution_record["detailsKey"] = s3_key
+    except Exception as e:
+        logger.error(f"Error adding execution record: {e}")
+        raise RuntimeError(f"Failed to add execution record: {e}")
+
+
+def get_task_timezone(task):
+    """The task's ZoneInfo, defaulting to America/Chicago."""
+    user_timezone_str = task.get("timeZone") or "America/Chicago"
+    try:
+        return ZoneInfo(user_timezone_str)
+    except Exception:
+        logger.warning(
+            f"Invalid timezone '{user_timezone_str}' for task {task.get('taskId')}. Using America/Chicago."
+        )
+        return ZoneInfo("America/Chicago")
+
+
+def _parse_date_bound(date_str, user_tz, end_of_day=False):
+    """
+    Parse a dateRange bound to UTC. Date-only strings (YYYY-MM-DD) are the
+    start or end of that day in the user's timezone.
+    """
+    if len(date_str) == 10 and date_str.count("-") == 2:
+        date_naive = datetime.fromisoformat(date_str)
+        if end_of_day:
+            date_user_tz = date_naive.replace(
+                hour=23, minute=59, second=59, microsecond=999999, tzinfo=user_tz
+            )
+        else:
+            date_user_tz = date_naive.replace(
+                hour=0, minute=0, second=0, microsecond=0, tzinfo=user_tz
+            )
+        return date_user_tz.astimezone(pytz.utc)
+    # Full datetime string - ensure it's UTC aware
+    return datetime.fromisoformat(date_str.replace("Z", "+00:00")).astimezone(pytz.utc)
+
+
+def get_task_date_range(task, user_tz):
+    """(start, end) of the task's dateRange in UTC; either may be None. Raises ValueError on bad dates."""
+    date_range = task.get("dateRange") or {}
+    start_date = end_date = None
+    if isinstance(date_range.get("startDate"), str) and date_range["startDate"]:
+        start_date = _parse_date_bound(date_range["startDate"], user_tz)
+    if isinstance(date_range.get("endDate"), str) and date_range["endDate"]:
+        end_date = _parse_date_bound(date_range["endDate"], user_tz, end_of_day=True)
+    return start_date, end_date
+
+
+def _task_base_time(task):
+    """lastRunAt, falling back to createdAt: the point cron instances are counted from."""
+    for date_type in ["lastRunAt", "createdAt"]:
+        date_str = task.get(date_type)
+        if date_str and date_str != "":
+            try:
+                # Since these are already UTC with timezone info, just parse directly
+                return datetime.fromisoformat(date_str)
+            except ValueError:
+                logger.error(f"Error parsing {date_type} '{date_str}'.")
+    return None
+
+
+def compute_next_run_at(task, after=None):
+    """
+    Next cron instance of an active task, in UTC.
+
+    Instances are counted from ``after`` (default: lastRunAt, then createdAt)
+    and respect the task's dateRange. Returns None for inactive tasks and
+    tasks with no further runs.
+    """
+    if str(task.get("active", 1)) not in ("1", "True", "true"):
+        return None
+    cron_expression = task.get("cronExpression")
+    if not cron_expression:
+        return None
+
+    user_tz = get_task_timezone(task)
+    try:
+        start_date, end_date = get_task_date_range(task, user_tz)
+    except (ValueError, TypeError) as e:
+        logger.error(f"Error parsing date range for task {task.get('taskId')}: {e}")
+        return None
+
+    base_dt = after or _task_base_time(task)
+    if base_dt is None:
+        return None
+    if base_dt.tzinfo is None:
+        # createdAt is written without an offset by a UTC Lambda
+        base_dt = pytz.utc.localize(base_dt)
+    if start_date and base_dt < start_date:
+        # The first run is the first instance at or after the start date
+        base_dt = start_date - timedelta(microseconds=1)
+
+    try:
+        next_run = croniter(cron_expression, base_dt.astimezone(user_tz)).get_next(
+            datetime
+        )
+    except Exception as e:
+        logger.error(f"Error with croniter for task {task.get('taskId')}: {e}")
+        return None
+
+    next_run_utc = next_run.astimezone(pytz.utc)
+    if end_date and next_run_utc > end_date:
+        return None
+    return next_run_utc
+
+
+def next_run_bucket(user, task_id, next_run_at):
+    """
+    Partition key of the due-time index: the hour the run falls in plus a
+    stable shard so a busy hour is spread over NEXT_RUN_SHARDS partitions.
+    """
+    shard = zlib.crc32(f"{user}/{task_id}".encode("utf-8")) % NEXT_RUN_SHARDS
+    return f"{next_run_at.astimezone(pytz.utc).strftime('%Y-%m-%dT%H')}#{shard}"
+
+
+def _oldest_queried_hour(now_utc):
+    """Start of the oldest bucket query_due_tasks reads."""
+    return now_utc.replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=NEXT_RUN_LOOKBACK_HOURS
+    )
+
+
+def next_run_attributes(task, after=None, next_run_at=None):
+    """DynamoDB values for nextRunAt/nextRunBucket, or {} when the task has no next run."""
+    if next_run_at is None:
+        next_run_at = compute_next_run_at(task, after)
+    if next_run_at is None:
+        return {}
+    now_utc = datetime.now(pytz.utc)
+    if next_run_at < _oldest_queried_hour(now_utc):
+        # A run missed long ago is due now; keep it inside the queried buckets
+        next_run_at = now_utc
+    return {
+        "nextRunAt": {"S": next_run_at.isoformat()},
+        "nextRunBucket": {
+            "S": next_run_bucket(task.get("user"), task.get("taskId"), next_run_at)
+        },
+    }
+
+
+def update_next_run(dynamodb, table_name, task, after=None, next_run_at=None):
+    """Store the task's next run time, or drop it from the due-time index if there is none."""
+    attributes = next_run_attributes(task, after, next_run_at)
+    key = {"user": {"S": task["user"]}, "taskId": {"S": task["taskId"]}}
+    try:
+        if attributes:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key=key,
+                UpdateExpression="SET nextRunAt = :next_run_at, nextRunBucket = :next_run_bucket",
+                ConditionExpression="attribute_exists(taskId)",
+                ExpressionAttributeValues={
+                    ":next_run_at": attributes["nextRunAt"],
+                    ":next_run_bucket": attributes["nextRunBucket"],
+                },
+                ReturnValues="NONE",
+            )
+        else:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key=key,
+                UpdateExpression="REMOVE nextRunAt, nextRunBucket",
+                ConditionExpression="attribute_exists(taskId)",
+                ReturnValues="NONE",
+            )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        logger.debug(f"Task {task.get('taskId')} no longer exists; not scheduling it")
+    except Exception as e:
+        logger.error(f"Error updating nextRunAt for task {task.get('taskId')}: {e}")
+    return attributes
+
+
+def query_due_tasks(dynamodb, table_name, now_utc):
+    """
+    Active tasks whose nextRunAt has passed, read from the due-time index.
+    Only the buckets from NEXT_RUN_LOOKBACK_HOURS ago up to the current hour
+    are queried (one query per bucket and shard, run concurrently); older
+    runs are picked up by reconcile_next_runs.
+    """
+    now_iso = now_utc.isoformat()
+    oldest_hour = _oldest_queried_hour(now_utc)
+    buckets = [
+        f"{(oldest_hour + timedelta(hours=h)).strftime('%Y-%m-%dT%H')}#{shard}"
+        for h in range(NEXT_RUN_LOOKBACK_HOURS + 1)
+        for shard in range(NEXT_RUN_SHARDS)
+    ]
+
+    def query_bucket(bucket):
+        items = []
+        paginator = dynamodb.get_paginator("query")
+        for page in paginator.paginate(
+            TableName=table_name,
+            IndexName=NEXT_RUN_INDEX,
+            KeyConditionExpression="nextRunBucket = :bucket AND nextRunAt <= :now",
+            ExpressionAttributeValues={
+                ":bucket": {"S": bucket},
+                ":now": {"S": now_iso},
+            },
+        ):
+            items.extend(page.get("Items", []))
+        return items
+
+    with ThreadPoolExecutor(max_workers=min(16, len(buckets))) as executor:
+        return [item for items in executor.map(query_bucket, buckets) for item in items]
+
+
+def find_due_instance(task, now_utc):
+    """
+    Earliest cron instance of the task that is due and has not been claimed
+    yet (later than lastCheckedAt), or None.
+    """
+    user = task.get("user")
+    task_id = task.get("taskId")
+    cron_expression = task.get("cronExpression")
+    user_tz = get_task_timezone(task)
+
+    if not cron_expression:
+        logger.warning(
+            f"Task {task_id} for user {user} is active but has no cronExpression. Skipping."
+        )
+        return None
+
+    # Convert current time to user's timezone for display
+    now_user_tz = now_utc.astimezone(user_tz)
+    logger.debug(
+        f"Processing task {task_id} (user: {user}, cron: {cron_expression}, timezone: {task.get('timeZone')})"
+    )
+    logger.debug(
+        f"Current time in user's timezone: {now_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')}"
+    )
+
+    # 1. Date Range Check
+    try:
+        start_date, end_date = get_task_date_range(task, user_tz)
+    except (ValueError, TypeError) as e:
+        logger.error(
+            f"Error parsing date range for task {task_id} (user {user}): {e}. Skipping."
+        )
+        return None
+    if start_date and now_utc < start_date:
+        logger.debug(f"Task not started yet. Start date: {start_date.isoformat()}")
+        return None
+    if end_date and now_utc > end_date:
+        logger.debug(f"Task has ended. End date: {end_date.isoformat()}")
+        return None
+
+    # 2. Get last checked time to avoid re-processing instances
+    last_checked_at_str = task.get("lastCheckedAt")
+    last_checked_at = None
+    if last_checked_at_str:
+        try:
+            last_checked_at = datetime.fromisoformat(last_checked_at_str)
+            if last_checked_at.tzinfo is None:
+                last_checked_at = pytz.utc.localize(last_checked_at)
             else:
-                # Migrated mode: Store in USER_STORAGE_TABLE dictionary with compression and archival
-                if access_token:
-                    try:
-                        # Get existing logs dictionary or create new
-                        app_id = "amplify-agent-logs"
-                        existing_logs_data = None
-                        try:
-                            existing_logs_data = load_user_data(access_token, app_id, "scheduled-task-logs", task_id)
-                        except Exception:
-                            pass  # New consolidated log entry
-                        
-                        if existing_logs_data and "logs" in existing_logs_data:
-                            logs_dict = existing_logs_data["logs"]
-                        else:
-                            logs_dict = {}
-                        
-                        # Add compressed log data directly to dictionary
-                        compressed_details = safe_compress(details)
-                        logs_dict[execution_id] = compressed_details
-                        
-                        # Check if we need to archive old logs (350KB threshold)
-                        current_size = calculate_logs_size(logs_dict)
-                        logger.debug(f"Current logs size for task {task_id}: {current_size} bytes")
-                        
-                        if current_size > MAX_LOGS_SIZE_BYTES:
-                            logger.info(f"Logs size ({current_size} bytes) exceeds threshold ({MAX_LOGS_SIZE_BYTES} bytes), archiving old logs for task {task_id}")
-                            
-                            # Select logs to keep (200KB) and archive the rest
-                            logs_to_keep, logs_to_archive = select_logs_for_archival(logs_dict, TARGET_SIZE_AFTER_ARCHIVAL)
-                            
-                            if logs_to_archive:
-                                # Archive old logs to consolidation bucket
-                                archive_result = archive_logs_to_consolidation_bucket(
-                                    current_user, task_id, logs_to_archive, access_token
-                                )
-                                
-                                if archive_result["success"]:
-                                    # Use the reduced logs dictionary
-                                    logs_dict = logs_to_keep
-                                    logger.info(f"Archived {archive_result['archived_count']} logs, keeping {len(logs_dict)} recent logs for task {task_id}")
-                                else:
-                                    logger.warning(f"Failed to archive logs, keeping all logs in USER_DATA_STORAGE_TABLE: {archive_result.get('error', 'Unknown error')}")
-                        
-                        # Save logs dictionary (either original or reduced after archival)
-                        consolidated_data = {
-                            "taskId": task_id,
-                            "user": current_user,
-                            "logs": logs_dict
-                        }
-                        
-                        save_result = save_user_data(access_token, app_id, "scheduled-task-logs", task_id, consolidated_data)
-                        
-                        # DEBUG: Log save result 
-                        logger.debug(f"save_user_data returned: {save_result}")
-                        
-                        if save_result:
-                            logger.info(f"✅ Successfully stored execution {execution_id} in logs dictionary for task {task_id}")
-                        else:
-                            logger.error(f"❌ FAILED to store execution {execution_id} - save_user_data returned: {save_result}")
-                    except Exception as e:
-                        logger.error(f"SAVE DEBUG: Exception during USER_STORAGE_TABLE save: {e}", exc_info=True)
-                        logger.warning(f"Failed to store in USER_STORAGE_TABLE, falling back to S3: {e}")
-                        # Fallback to S3 if USER_STORAGE_TABLE fails
-                        s3_key = f"{current_user}/{task_id}/logs/{execution_id}.json"
-                        s3.put_object(
-                            Bucket=logs_bucket,
-                            Key=s3_key,
-                            Body=json.dumps(details),
-                            ContentType="application/json",
-                        )
-                        execution_record["detailsKey"] = s3_key
-
-        # Update the task in DynamoDB to add the record to logs and update lastRunAt
-        deserializer = TypeDeserializer()
-        serializer = TypeSerializer()
-
-        # Use previously loaded logs
-
-        # Find existing record with same execution_id and update it, or insert new record
-        existing_record_index = None
-        for i, log_entry in enumerate(logs):
-            if log_entry.get("executionId") == execution_id:
-                existing_record_index = i
+                last_checked_at = last_checked_at.astimezone(pytz.utc)
+            logger.debug(f"Last checked at (UTC): {last_checked_at.isoformat()}")
+        except ValueError:
+            logger.error(
+                f"Error parsing lastCheckedAt '{last_checked_at_str}'. Treating as None."
+            )
+            last_checked_at = None
+
+    # 3. Determine base datetime for finding all due instances
+    base_dt_utc = _task_base_time(task)
+    if not base_dt_utc:
+        logger.error(f"Task {task_id} has no valid lastRunAt or createdAt. Skipping.")
+        return None
+
+    # 4. Find the first instance that is due (between base time and now)
+    try:
+        # IMPORTANT: Create croniter with the user's timezone
+        # This interprets the cron expression in the user's local time
+        cron_iter = croniter(cron_expression, base_dt_utc.astimezone(user_tz))
+        pending = 0
+        earliest_due_instance_utc = None
+
+        while pending <= 1000:
+            next_instance_utc = cron_iter.get_next(datetime).astimezone(pytz.utc)
+            if next_instance_utc > now_utc:
                 break
-        
-        if existing_record_index is not None:
-            # Update existing record - preserve startTime from original record
-            existing_record = logs[existing_record_index]
-            if "startTime" in existing_record and status != "running":
-                execution_record["startTime"] = existing_record["startTime"]
-            logs[existing_record_index] = execution_record
-            logger.debug(f"Updated existing execution record {execution_id} with status {status}")
-        else:
-            # Insert new record at the beginning
-            logs.insert(0, execution_record)
-            logger.debug(f"Created new execution record {execution_id} with status {status}")
-
-        # Update the task
-        update_expression = "SET logs = :logs, lastRunAt = :executedAt"
-        expression_attribute_values = {
-            ":logs": serializer.serialize(logs),
-            ":executedAt": serializer.serialize(executed_at),
-        }
+            # Only include instances that haven't been checked yet
+            if last_checked_at is None or next_instance_utc > last_checked_at:
+                if earliest_due_instance_utc is None:
+                    earliest_due_instance_utc = next_instance_utc
+                pending += 1
+    except Exception as e:
+        logger.error(f"Error with croniter for task {task_id}: {e}. Skipping.", exc_info=True)
+        return None
+
+    if earliest_due_instance_utc is None:
+        logger.debug(f"No due instances found for task {task_id}")
+        return None
+
+    logger.debug(
+        f"Will process earliest due instance: {earliest_due_instance_utc.astimezone(user_tz).strftime('%Y-%m-%d %H:%M:%S %Z')} ({earliest_due_instance_utc.isoformat()})"
+    )
+    if pending > 1:
+        logger.debug(f"Note: {pending - 1} additional instance(s) pending")
+    return earliest_due_instance_utc
+
 
+def claim_task(dynamodb, table_name, task, due_instance_utc, now_utc, run_id):
+    """
+    Atomically claim a due instance of the task and move its nextRunAt past
+    now. Returns False if another scheduler run claimed it first.
+    """
+    user = task["user"]
+    task_id = task["taskId"]
+    next_run = next_run_attributes(task, after=now_utc)
+
+    update_expression = "SET lastCheckedAt = :current_time_iso, lastCheckRunId = :run_id_val"
+    expression_attribute_values = {
+        ":current_time_iso": {"S": now_utc.isoformat()},
+        ":run_id_val": {"S": run_id},
+        ":earliest_instance_iso": {"S": due_instance_utc.isoformat()},
+    }
+    if next_run:
+        update_expression += ", nextRunAt = :next_run_at, nextRunBucket = :next_run_bucket"
+        expression_attribute_values[":next_run_at"] = next_run["nextRunAt"]
+        expression_attribute_values[":next_run_bucket"] = next_run["nextRunBucket"]
+    else:
+        update_expression += " REMOVE nextRunAt, nextRunBucket"
+
+    try:
+        # Use conditional update to prevent race conditions
+        # Only update if lastCheckedAt doesn't exist OR is older than this instance
         dynamodb.update_item(
             TableName=table_name,
-            Key={"user": {"S": current_user}, "taskId": {"S": task_id}},
+            Key={"user": {"S": user}, "taskId": {"S": task_id}},
             UpdateExpression=update_expression,
+            ConditionExpression="attribute_not_exists(lastCheckedAt) OR lastCheckedAt < :earliest_instance_iso",
             ExpressionAttributeValues=expression_attribute_values,
+            ReturnValues="NONE",
         )
+    except dynamodb.exceptions.ConditionalCheckFailedException:
+        logger.debug(f"Task {task_id} (user {user}) already claimed by another process")
+        return False
 
-        return {
-            "success": True,
-            "message": f"Execution record added successfully",
-            "executionId": execution_id,
-        }
-
-    except Exception as e:
-        logger.error(f"Error adding execution record: {e}")
-        raise RuntimeError(f"Failed to add execution record: {e}")
+    logger.info(
+        f"Successfully claimed task {task_id} (user {user}) for instance {due_instance_utc.isoformat()}"
+    )
+    return True
 
 
 def find_tasks_to_execute():
@@ -840,6 +1025,9 @@ def find_tasks_to_execute():
     Find all scheduled tasks that are due to be executed.
     This function is intended to be called by a Lambda triggered by a CloudWatch scheduled event.
 
+    Candidates come from the nextRunAt due-time index, so a tick only reads
+    the tasks that are due rather than every task in the table.
+
     Returns:
         list: List of tasks to execute
     """
@@ -850,269 +1038,43 @@ def find_tasks_to_execute():
     dynamodb = boto3.client("dynamodb")
     # Always work in UTC for storage and comparisons
     now_utc = datetime.now(pytz.utc)
-    now_iso = now_utc.isoformat()
 
     tasks = []
     run_id = str(uuid.uuid4())  # Unique ID for this scheduler run
     deserializer = TypeDeserializer()
 
-    logger.info(f"Scanning for active tasks. Current time (UTC): {now_iso}, Run ID: {run_id}")
+    logger.info(f"Querying due tasks. Current time (UTC): {now_utc.isoformat()}, Run ID: {run_id}")
 
     try:
-        # Scan for all active tasks. Filtering for "due" tasks will happen in Lambda.
-        paginator = dynamodb.get_paginator("scan")
-        page_iterator = paginator.paginate(
-            TableName=table_name,
-            FilterExpression="active = :active_status",
-            ExpressionAttributeValues={":active_status": {"N": "1"}},
-        )
+        items = query_due_tasks(dynamodb, table_name, now_utc)
+        logger.debug(f"Due-time index returned {len(items)} candidate tasks")
 
-        for page in page_iterator:
-            for item in page.get("Items", []):
-                task = {
-                    key: deserializer.deserialize(value) for key, value in item.items()
-                }
-                user = task.get("user")
-                task_id = task.get("taskId")
-                cron_expression = task.get("cronExpression")
-
-                # Get user's timezone (default to America/Chicago if not specified)
-                user_timezone_str = task.get("timeZone", "America/Chicago")
-                try:
-                    user_tz = ZoneInfo(user_timezone_str)
-                except:
-                    logger.warning(
-                        f"Invalid timezone '{user_timezone_str}' for task {task_id}. Using America/Chicago."
-                    )
-                    user_tz = ZoneInfo("America/Chicago")
-
-                if not user or not task_id:
-                    logger.warning(f"Skipping item due to missing user or taskId: {item}")
-                    continue
+        for item in items:
+            task = {key: deserializer.deserialize(value) for key, value in item.items()}
+            user = task.get("user")
+            task_id = task.get("taskId")
 
-                if not cron_expression:
-                    logger.warning(
-                        f"Task {task_id} for user {user} is active but has no cronExpression. Skipping."
-                    )
-                    continue
-
-                # Convert current time to user's timezone for display
-                now_user_tz = now_utc.astimezone(user_tz)
-                logger.debug(
-                    f"Processing task {task_id} (user: {user}, cron: {cron_expression}, timezone: {user_timezone_str})"
-                )
-                logger.debug(
-                    f"Current time in user's timezone: {now_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-                )
-
-                # 1. Date Range Check (these remain in UTC as they're already stored that way)
-                date_range = task.get("dateRange", {})
-                skip_task_due_to_date_range = False
-                if "startDate" in date_range and date_range["startDate"]:
-                    try:
-                        start_date_str = date_range["startDate"]
-                        if isinstance(start_date_str, str):
-                            # Check if it's a date-only string (YYYY-MM-DD format)
-                            if len(start_date_str) == 10 and start_date_str.count('-') == 2:
-                                # Date-only string - interpret as start of day in user's timezone
-                                start_date_naive = datetime.fromisoformat(start_date_str)
-                                start_date_user_tz = start_date_naive.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=user_tz)
-                                start_date = start_date_user_tz.astimezone(pytz.utc)
-                            else:
-                                # Full datetime string - ensure it's UTC aware for comparison with now_utc
-                                start_date = datetime.fromisoformat(
-                                    start_date_str.replace("Z", "+00:00")
-                                ).astimezone(pytz.utc)
-                            if now_utc < start_date:
-                                skip_task_due_to_date_range = True
-                                logger.debug(
-                                    f"Task not started yet. Start date: {start_date.isoformat()}"
-                                )
-                    except (ValueError, TypeError) as e:
-                        logger.error(
-                            f"Error parsing start date for task {task_id} (user {user}): {e}. Skipping."
-                        )
-                        skip_task_due_to_date_range = True
-
-                if (
-                    not skip_task_due_to_date_range
-                    and "endDate" in date_range
-                    and date_range["endDate"]
-                ):
-                    try:
-                        end_date_str = date_range["endDate"]
-                        if isinstance(end_date_str, str):
-                            # Check if it's a date-only string (YYYY-MM-DD format)
-                            if len(end_date_str) == 10 and end_date_str.count('-') == 2:
-                                # Date-only string - interpret as end of day in user's timezone
-                                end_date_naive = datetime.fromisoformat(end_date_str)
-                                end_date_user_tz = end_date_naive.replace(hour=23, minute=59, second=59, microsecond=999999, tzinfo=user_tz)
-                                end_date = end_date_user_tz.astimezone(pytz.utc)
-                            else:
-                                # Full datetime string - ensure it's UTC aware
-                                end_date = datetime.fromisoformat(
-                                    end_date_str.replace("Z", "+00:00")
-                                ).astimezone(pytz.utc)
-                            if now_utc > end_date:
-                                skip_task_due_to_date_range = True
-                                logger.debug(
-                                    f"Task has ended. End date: {end_date.isoformat()}"
-                                )
-                    except (ValueError, TypeError) as e:
-                        logger.error(
-                            f"Error parsing end date for task {task_id} (user {user}): {e}. Skipping."
-                        )
-                        skip_task_due_to_date_range = True
-
-                if skip_task_due_to_date_range:
-                    logger.debug(f"Skipping task {task_id} for user {user} due to date range.")
-                    continue
-
-                # 2. Get last checked time to avoid re-processing instances
-                last_checked_at_str = task.get("lastCheckedAt")
-                last_checked_at = None
-                if last_checked_at_str:
-                    try:
-                        last_checked_at = datetime.fromisoformat(last_checked_at_str)
-                        if last_checked_at.tzinfo is None:
-                            last_checked_at = pytz.utc.localize(last_checked_at)
-                        else:
-                            last_checked_at = last_checked_at.astimezone(pytz.utc)
-                        logger.debug(f"Last checked at (UTC): {last_checked_at.isoformat()}")
-                    except ValueError:
-                        logger.error(
-                            f"Error parsing lastCheckedAt '{last_checked_at_str}'. Treating as None."
-                        )
-                        last_checked_at = None
-
-                # 3. Determine base datetime for finding all due instances
-                base_dt_utc = None
-
-                attr = ["lastRunAt", "createdAt"]
-                # Try lastRunAt first, fall back to createdAt
-                for date_type in attr:
-                    date_str = task.get(date_type)
-                    if date_str and date_str != "":
-                        try:
-                            # Since these are already UTC with timezone info, just parse directly
-                            base_dt_utc = datetime.fromisoformat(date_str)
-                            logger.debug(
-                                f"Using {date_type} as base (UTC): {base_dt_utc.isoformat()}"
-                            )
-                            break
-                        except ValueError:
-                            logger.error(f"Error parsing {date_type} '{date_str}'.")
-                            continue
-
-                if not base_dt_utc:
-                    logger.error(
-                        f"Task {task_id} has no valid lastRunAt or createdAt. Skipping."
-                    )
-                    continue
+            if not user or not task_id:
+                logger.warning(f"Skipping item due to missing user or taskId: {item}")
+                continue
 
-                # Convert base time to user's timezone for cron calculation
-                base_dt_user_tz = base_dt_utc.astimezone(user_tz)
-                logger.debug(
-                    f"Base time in user timezone: {base_dt_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-                )
+            if str(task.get("active")) != "1":
+                update_next_run(dynamodb, table_name, task)
+                continue
 
-                # 4. Find ALL instances that are due (between base time and now)
-                try:
-                    # IMPORTANT: Create croniter with the user's timezone
-                    # This interprets the cron expression in the user's local time
-                    cron_iter = croniter(cron_expression, base_dt_user_tz)
-                    due_instances_utc = []
-
-                    # Collect all instances up to current time
-                    while True:
-                        # Get next instance in user's timezone
-                        next_instance_user_tz = cron_iter.get_next(datetime)
-                        # Convert to UTC for comparison
-                        next_instance_utc = next_instance_user_tz.astimezone(pytz.utc)
-
-                        if next_instance_utc > now_utc:
-                            # Log the next scheduled run for clarity
-                            logger.debug(
-                                f"Next scheduled run: {next_instance_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')} ({next_instance_utc.strftime('%Y-%m-%d %H:%M:%S %Z')})"
-                            )
-                            break
-
-                        # Only include instances that haven't been checked yet
-                        if (
-                            last_checked_at is None
-                            or next_instance_utc > last_checked_at
-                        ):
-                            due_instances_utc.append(next_instance_utc)
-                            logger.debug(
-                                f"Found due instance: {next_instance_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')} ({next_instance_utc.strftime('%Y-%m-%d %H:%M:%S %Z')})"
-                            )
-
-                        # Safety limit to prevent infinite loops
-                        if len(due_instances_utc) > 1000:
-                            logger.warning(
-                                f"Task {task_id} has over 1000 due instances. Limiting to most recent 100."
-                            )
-                            due_instances_utc = due_instances_utc[-100:]
-                            break
-
-                    if not due_instances_utc:
-                        logger.debug(f"No due instances found for task {task_id}")
-                        continue
-
-                    # Get the earliest due instance that hasn't been processed
-                    earliest_due_instance_utc = due_instances_utc[0]
-                    earliest_due_instance_user_tz = (
-                        earliest_due_instance_utc.astimezone(user_tz)
-                    )
-                    logger.debug(
-                        f"Will process earliest due instance: {earliest_due_instance_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')} ({earliest_due_instance_utc.isoformat()})"
-                    )
-                    if len(due_instances_utc) > 1:
-                        logger.debug(
-                            f"Note: {len(due_instances_utc) - 1} additional instance(s) pending"
-                        )
-
-                except Exception as e:
-                    logger.error(f"Error with croniter for task {task_id}: {e}. Skipping.", exc_info=True)
-                    continue
-
-                # 5. Attempt to claim the earliest due instance atomically
-                logger.debug(
-                    f"Attempting to claim task {task_id} for instance {earliest_due_instance_utc.isoformat()}"
-                )
-                try:
-                    # Use conditional update to prevent race conditions
-                    # Only update if lastCheckedAt doesn't exist OR is older than this instance
-                    dynamodb.update_item(
-                        TableName=table_name,
-                        Key={"user": {"S": user}, "taskId": {"S": task_id}},
-                        UpdateExpression="SET lastCheckedAt = :current_time_iso, lastCheckRunId = :run_id_val",
-                        ConditionExpression="attribute_not_exists(lastCheckedAt) OR lastCheckedAt < :earliest_instance_iso",
-                        ExpressionAttributeValues={
-                            ":current_time_iso": {"S": now_iso},
-                            ":run_id_val": {"S": run_id},
-                            ":earliest_instance_iso": {
-                                "S": earliest_due_instance_utc.isoformat()
-                            },
-                        },
-                        ReturnValues="NONE",
-                    )
+            due_instance_utc = find_due_instance(task, now_utc)
+            if due_instance_utc is None:
+                # nextRunAt was stale; move the task to its real bucket
+                update_next_run(dynamodb, table_name, task, after=now_utc)
+                continue
 
-                    logger.info(
-                        f"Successfully claimed task {task_id} (user {user}) for instance {earliest_due_instance_user_tz.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-                    )
+            try:
+                if claim_task(dynamodb, table_name, task, due_instance_utc, now_utc, run_id):
                     tasks.append(task)
-
-                except dynamodb.exceptions.ConditionalCheckFailedException:
-                    logger.debug(
-                        f"Task {task_id} (user {user}) already claimed by another process"
-                    )
-                    continue
-                except Exception as e:
-                    logger.error(
-                        f"Error updating lastCheckedAt for task {task_id} (user {user}): {e}"
-                    )
-                    continue
+            except Exception as e:
+                logger.error(
+                    f"Error updating lastCheckedAt for task {task_id} (user {user}): {e}"
+                )
 
         logger.info(f"Summary: Found {len(tasks)} tasks to execute in run {run_id}")
         return tasks
@@ -1126,10 +1088,158 @@ def find_tasks_to_execute():
         raise RuntimeError(f"Failed to find tasks to execute (run {run_id}): {str(e)}")
 
 
+def reconcile_next_runs():
+    """
+    Full pass over the active tasks that writes nextRunAt where it is
+    missing (tasks created before the index existed) or older than the
+    scheduler's lookback window, and drops it from inactive tasks. Runs on
+    a slow schedule; the per-tick path never scans.
+    """
+    table_name = os.environ.get("SCHEDULED_TASKS_TABLE")
+    if not table_name:
+        raise ValueError("Environment variable 'SCHEDULED_TASKS_TABLE' must be set.")
+
+    dynamodb = boto3.client("dynamodb")
+    deserializer = TypeDeserializer()
+    oldest_queried = _oldest_queried_hour(datetime.now(pytz.utc))
+    updated = 0
+
+    paginator = dynamodb.get_paginator("scan")
+    for page in paginator.paginate(
+        TableName=table_name,
+        ProjectionExpression="#user, taskId, active, cronExpression, timeZone, dateRange, lastRunAt, createdAt, nextRunAt",
+        ExpressionAttributeNames={"#user": "user"},
+    ):
+        for item in page.get("Items", []):
+            task = {key: deserializer.deserialize(value) for key, value in item.items()}
+            if not task.get("user") or not task.get("taskId"):
+                continue
+
+            next_run_at = task.get("nextRunAt")
+            if str(task.get("active")) != "1":
+                if next_run_at:
+                    update_next_run(dynamodb, table_name, task)
+                    updated += 1
+                continue
+
+            if next_run_at and datetime.fromisoformat(next_run_at) >= oldest_queried:
+                continue
+
+            # Missing, or overdue and outside the lookback window: recompute,
+            # which puts overdue runs into the current bucket
+            attributes = update_next_run(dynamodb, table_name, task)
+            if attributes or next_run_at:
+                updated += 1
+
+    logger.info(f"Reconciled nextRunAt for {updated} scheduled tasks")
+    return updated
+
+
+def backfill_next_runs(event=None, context=None):
+    """
+    Writes nextRunAt for tasks created before the due-time index existed.
+    Safe to run repeatedly; invoked manually after deploying so those tasks
+    run from the next tick instead of after the hourly reconcile.
+    """
+    updated = reconcile_next_runs()
+    logger.info(f"Backfilled nextRunAt for {updated} scheduled tasks")
+    return {"updated": updated}
+
+
+def _lookup_api_keys(api_key_ids):
+    """Resolve each distinct apiKeyId once, concurrently. Returns {apiKeyId: lookup result}."""
+    api_key_ids = list(api_key_ids)
+    if not api_key_ids:
+        return {}
+    with ThreadPoolExecutor(
+        max_workers=min(DISPATCH_MAX_WORKERS, len(api_key_ids))
+    ) as executor:
+        results = executor.map(get_api_key_directly_by_id, api_key_ids)
+        return dict(zip(api_key_ids, results))
+
+
+def _message_batches(entries):
+    """Group SQS entries into batches of at most 10 messages and SQS_MAX_BATCH_BYTES."""
+    batch, batch_bytes = [], 0
+    for entry in entries:
+        size = len(entry["MessageBody"].encode("utf-8"))
+        if batch and (
+            len(batch) == SQS_BATCH_SIZE or batch_bytes + size > SQS_MAX_BATCH_BYTES
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(entry)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _record_dispatch_failures(failed, task_source):
+    """
+    Record tasks that could not be queued: one batch of failure executions in
+    the execution log, plus lastRunAt on each task as add_task_execution_record
+    would set it.
+    """
+    table_name = os.environ.get("SCHEDULED_TASKS_TABLE")
+    if not table_name:
+        logger.error("Environment variable 'SCHEDULED_TASKS_TABLE' must be set.")
+        return
+    dynamodb = boto3.client("dynamodb")
+    executed_at = datetime.now().isoformat()
+
+    def touch_last_run(failedTask):
+        logger.error(f"Failed to send task {failedTask['taskId']} to queue: {failedTask['error']}")
+        try:
+            dynamodb.update_item(
+                TableName=table_name,
+                Key={"user": {"S": failedTask["userId"]}, "taskId": {"S": failedTask["taskId"]}},
+                UpdateExpression="SET lastRunAt = :executedAt",
+                ConditionExpression="attribute_exists(taskId)",
+                ExpressionAttributeValues={":executedAt": {"S": executed_at}},
+            )
+            return True
+        except dynamodb.exceptions.ConditionalCheckFailedException:
+            return False
+        except Exception as e:
+            logger.error(f"Error updating lastRunAt for task {failedTask['taskId']}: {e}")
+            return True
+
+    with ThreadPoolExecutor(
+        max_workers=min(DISPATCH_MAX_WORKERS, len(failed))
+    ) as executor:
+        exists = list(executor.map(touch_last_run, failed))
+
+    records = [
+        {
+            "current_user": failedTask["userId"],
+            "task_id": failedTask["taskId"],
+            "execution_id": f"execution-{str(uuid.uuid4())}",
+            "status": "failure",
+            "executed_at": executed_at,
+            "details": {
+                "error": "Failed to send task to queue",
+                "message": failedTask["error"],
+                "failedAt": failedTask["failedAt"],
+                "source": task_source,
+            },
+        }
+        for failedTask, task_exists in zip(failed, exists)
+        if task_exists
+    ]
+    try:
+        put_new_execution_records(records)
+    except Exception as e:
+        logger.error(f"Error recording {len(records)} queue failures: {e}")
+
+
 def send_tasks_to_queue(tasks: List[Dict[str, Any]], task_source="scheduled-task"):
     """
     Send tasks to the agent queue for execution.
 
+    API keys are looked up once per apiKeyId, messages are sent with
+    send_message_batch and batches and failure records are processed
+    concurrently (DISPATCH_MAX_WORKERS).
+
     Args:
         tasks (list): List of tasks to send to the queue
 
@@ -1148,15 +1258,21 @@ def send_tasks_to_queue(tasks: List[Dict[str, Any]], task_source="scheduled-task
     successful = []
     failed = []
 
-    for task in tasks:
+    logger.debug("Retrieving api keys for %s tasks", len(tasks))
+    api_keys = _lookup_api_keys(
+        {task.get("apiKeyId") for task in tasks if task.get("apiKeyId")}
+    )
+
+    entries = []
+    tasks_by_entry_id = {}
+    for index, task in enumerate(tasks):
         current_user = task["user"]
-        logger.debug(f"Current user: {current_user}")
         task_id = task["taskId"]
 
-        logger.debug("Retrieving api key for task")
-        api_key_id = task.get("apiKeyId")
-        # Retrieve API key
-        api_result = get_api_key_directly_by_id(api_key_id)
+        api_result = api_keys.get(task.get("apiKeyId")) or {
+            "success": False,
+            "message": "Task has no apiKeyId",
+        }
         if not api_result["success"]:
             failed.append(
                 {
@@ -1167,52 +1283,73 @@ def send_tasks_to_queue(tasks: List[Dict[str, Any]], task_source="scheduled-task
                     "failedAt": get_timestamp(),
                 }
             )
+            continue
 
         task["apiKey"] = api_result["apiKey"]
         task["source"] = task_source
         try:
-            # Create message payload
+            # Create message payload with our safe JSON serialization helper
             message = {"source": "scheduled-task", "taskData": task}
-            logger.debug(f"Sending task {task_id} to queue")
-            # Send message to queue with our safe JSON serialization helper
-            response = sqs.send_message(
-                QueueUrl=queue_url, MessageBody=safe_json_dumps(message)
-            )
-
-            successful.append(
-                {"taskId": task_id, "messageId": response.get("MessageId")}
-            )
-
+            entry_id = str(index)
+            entries.append({"Id": entry_id, "MessageBody": safe_json_dumps(message)})
+            tasks_by_entry_id[entry_id] = task
         except Exception as e:
-            logger.error(f"Error sending task {task['taskId']} to queue: {e}")
+            logger.error(f"Error serializing task {task_id} for the queue: {e}")
             failed.append(
                 {
-                    "taskId": task["taskId"],
+                    "taskId": task_id,
                     "userId": current_user,
+                    "apiKey": task.get("apiKey"),
                     "error": str(e),
                     "failedAt": datetime.now(pytz.utc).isoformat(),
                 }
             )
+
+    def send_batch(batch):
+        try:
+            response = sqs.send_message_batch(QueueUrl=queue_url, Entries=batch)
+        except Exception as e:
+            response = {
+                "Failed": [
+                    {"Id": entry["Id"], "Message": str(e)} for entry in batch
+                ]
+            }
+        return response
+
+    batches = list(_message_batches(entries))
+    if batches:
+        logger.debug(f"Sending {len(entries)} tasks to queue in {len(batches)} batches")
+        with ThreadPoolExecutor(
+            max_workers=min(DISPATCH_MAX_WORKERS, len(batches))
+        ) as executor:
+            responses = list(executor.map(send_batch, batches))
+
+        for response in responses:
+            for entry in response.get("Successful", []):
+                task = tasks_by_entry_id[entry["Id"]]
+                successful.append(
+                    {"taskId": task["taskId"], "messageId": entry.get("MessageId")}
+                )
+            for entry in response.get("Failed", []):
+                task = tasks_by_entry_id[entry["Id"]]
+                logger.error(
+                    f"Error sending task {task['taskId']} to queue: {entry.get('Message')}"
+                )
+                failed.append(
+                    {
+                        "taskId": task["taskId"],
+                        "userId": task["user"],
+                        "apiKey": task.get("apiKey"),
+                        "error": entry.get("Message") or entry.get("Code", "Unknown error"),
+                        "failedAt": datetime.now(pytz.utc).isoformat(),
+                    }
+                )
+
+    if failed:
+        _record_dispatch_failures(failed, task_source)
+
     for failedTask in failed:
-        id = failedTask["taskId"]
-        logger.error(f"Failed to send task {id} to queue: {failedTask['error']}")
-        
-        # Create a sessionId for this failed queue operation with short UUID format
-        session_id = f"execution-{str(uuid.uuid4())}"
-        
-        add_task_execution_record(
-            failedTask["userId"],
-            id,
-            "failure",
-            {
-                "error": "Failed to send task to queue",
-                "message": failedTask["error"],
-                "failedAt": failedTask["failedAt"],
-                "source": task_source,
-            },
-            execution_id=session_id,
-            access_token=task["apiKey"]
-        )
+        failedTask.pop("apiKey", None)
     return {"successful": successful, "failed": failed}
 
 
@@ -1233,6 +1370,15 @@ def execute_scheduled_tasks(event, context):
         dict: Result of the execution
     """
     try:
+        if isinstance(event, dict) and event.get("reconcileNextRuns"):
+            updated = reconcile_next_runs()
+            return {
+                "statusCode": 200,
+                "body": safe_json_dumps(
+                    {"message": "Reconciled task next run times", "updated": updated}
+                ),
+            }
+
         # Find tasks to execute
         tasks = find_tasks_to_execute()
 
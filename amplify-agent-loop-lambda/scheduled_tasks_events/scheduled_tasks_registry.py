@@ -8,7 +8,18 @@ from pycommon.api.api_key import deactivate_key
 from pycommon.api.user_data import load_user_data, delete_user_data
 from pycommon.lzw import is_lzw_compressed_format, lzw_uncompress
 from delegation.api_keys import create_agent_event_api_key
-from scheduled_tasks_events.scheduled_tasks import send_tasks_to_queue
+from scheduled_tasks_events.scheduled_tasks import (
+    send_tasks_to_queue,
+    next_run_attributes,
+    update_next_run,
+    archive_logs_to_consolidation_bucket,
+)
+from scheduled_tasks_events.execution_log import (
+    list_execution_records,
+    list_execution_records_page,
+    get_execution_record,
+    archive_execution_records,
+)
 from pycommon.logger import getLogger
 logger = getLogger("scheduled_task_registry")
 
@@ -85,6 +96,7 @@ def create_scheduled_task(
 
     # Prepare the item to be inserted into the DynamoDB table
     serializer = TypeSerializer()
+    created_at = datetime.now().isoformat()
     item = {
         "user": serializer.serialize(current_user),
         "taskId": serializer.serialize(task_id),
@@ -95,7 +107,7 @@ def create_scheduled_task(
         "objectInfo": serializer.serialize(object_info),
         "cronExpression": serializer.serialize(cron_expression),
         "active": {"N": "1" if active else "0"},
-        "createdAt": serializer.serialize(datetime.now().isoformat()),
+        "createdAt": serializer.serialize(created_at),
         "logs": serializer.serialize([]),
         "apiKeyId": serializer.serialize(api_key_id),
         "timeZone": serializer.serialize(time_zone),
@@ -113,6 +125,21 @@ def create_scheduled_task(
     if notify_email_addresses:
         item["notifyEmailAddresses"] = serializer.serialize(notify_email_addresses)
 
+    # Index the first run so the scheduler finds the task without scanning
+    item.update(
+        next_run_attributes(
+            {
+                "user": current_user,
+                "taskId": task_id,
+                "active": 1 if active else 0,
+                "cronExpression": cron_expression,
+                "timeZone": time_zone,
+                "dateRange": date_range,
+                "createdAt": created_at,
+            }
+        )
+    )
+
     try:
         # Insert the task into the DynamoDB table
         dynamodb.put_item(TableName=table_name, Item=item)
@@ -122,13 +149,16 @@ def create_scheduled_task(
         raise RuntimeError(f"Failed to create scheduled task: {e}")
 
 
-def get_scheduled_task(current_user, task_id, access_token=None):
+def get_scheduled_task(current_user, task_id, access_token=None, logs_limit=None, logs_next_token=None):
     """
     Get a scheduled task by ID.
 
     Args:
         current_user (str): User ID owning the task
         task_id (str): ID of the task to retrieve
+        logs_limit (int, optional): Runs to return, newest first. Defaults to
+            SCHEDULED_TASK_EXECUTIONS_PAGE_SIZE.
+        logs_next_token (str, optional): logsNextToken from a previous call, for older runs
 
     Returns:
         dict: The scheduled task details or None if not found
@@ -160,10 +190,28 @@ def get_scheduled_task(current_user, task_id, access_token=None):
             for key, value in response["Item"].items()
         }
 
-        # Return logs array as-is (metadata only)
-        # Frontend will call get_task_execution_details() for actual log data
-        logs_array = task.get("logs", [])
-        
+        # Return log metadata only; the frontend calls get_task_execution_details()
+        # for actual log data. Runs from the execution log come first; runs
+        # recorded on the task item before it existed follow. Callers that pass
+        # logsLimit or logsNextToken get one page at a time, legacy runs on the
+        # last page; others get the whole history.
+        if logs_limit or logs_next_token:
+            page_args = {"next_token": logs_next_token}
+            if logs_limit:
+                page_args["limit"] = int(logs_limit)
+            logs_array, logs_next_token = list_execution_records_page(
+                current_user, task_id, **page_args
+            )
+        else:
+            logs_array = list_execution_records(current_user, task_id)
+        if logs_next_token is None:
+            recorded = {log_entry["executionId"] for log_entry in logs_array}
+            logs_array.extend(
+                log_entry
+                for log_entry in task.get("logs", [])
+                if log_entry.get("executionId") not in recorded
+            )
+
         # Convert to expected format for frontend
         result = {
             "taskId": task["taskId"],
@@ -176,6 +224,8 @@ def get_scheduled_task(current_user, task_id, access_token=None):
             "active": task["active"] == 1,
             "logs": logs_array,
         }
+        if logs_next_token:
+            result["logsNextToken"] = logs_next_token
 
         # Add optional fields if they exist
         if "dateRange" in task:
@@ -365,14 +415,27 @@ def update_scheduled_task(
         update_expression = "SET " + ", ".join(update_expression_parts)
 
         # Update the item in DynamoDB
-        dynamodb.update_item(
+        response = dynamodb.update_item(
             TableName=table_name,
             Key={"user": {"S": current_user}, "taskId": {"S": task_id}},
             UpdateExpression=update_expression,
             ExpressionAttributeNames=expression_attribute_names,
             ExpressionAttributeValues=expression_attribute_values,
+            ReturnValues="ALL_NEW",
         )
 
+        # Schedule changes (including enabling/disabling) move the task in the due-time index
+        if any(
+            value is not None
+            for value in (cron_expression, date_range, active, time_zone)
+        ):
+            deserializer = TypeDeserializer()
+            task = {
+                key: deserializer.deserialize(value)
+                for key, value in response.get("Attributes", {}).items()
+            }
+            update_next_run(dynamodb, table_name, task)
+
         return {"success": True, "message": f"Task {task_id} updated successfully"}
 
     except Exception as e:
@@ -428,6 +491,11 @@ def delete_scheduled_task(current_user, task_id, access_token):
         logs = task_data.get("logs", [])
         
         logger.info("Deleting task %s with api key id %s", task_id, api_key_id)
+
+        # Archive the execution log as JSONL batches
+        archive_result = archive_execution_records(current_user, task_id)
+        if not archive_result["success"]:
+            logger.warning("Could not archive all executions for task %s: %s", task_id, archive_result)
         
         # Archive logs instead of deleting them
         if logs:
@@ -480,37 +548,10 @@ def delete_scheduled_task(current_user, task_id, access_token):
                     existing_logs_data = load_user_data(access_token, app_id, "scheduled-task-logs", task_id)
                     
                     if existing_logs_data and "logs" in existing_logs_data:
-                        logs_dict = existing_logs_data["logs"]
-                        
-                        # Archive each log to consolidation bucket
-                        for execution_id, compressed_data in logs_dict.items():
-                            try:
-                                archive_key = f"scheduledTaskLogs/{current_user}/{task_id}/{execution_id}.json"
-                                
-                                # Decompress data for storage in consolidation bucket
-                                if hasattr(compressed_data, '__iter__') and not isinstance(compressed_data, (str, bytes)):
-                                    # Already decompressed data
-                                    log_data = compressed_data
-                                else:
-                                    # Decompress LZW data
-                                    if is_lzw_compressed_format(compressed_data):
-                                        log_data = lzw_uncompress(compressed_data)
-                                    else:
-                                        log_data = compressed_data
-                                
-                                # Store in consolidation bucket
-                                s3.put_object(
-                                    Bucket=consolidation_bucket,
-                                    Key=archive_key,
-                                    Body=json.dumps(log_data),
-                                    ContentType="application/json"
-                                )
-                                
-                                migrated_logs_archived += 1
-                                logger.debug("Archived migrated log: %s", archive_key)
-                                
-                            except Exception as e:
-                                logger.warning("Failed to archive migrated log execution %s: %s", execution_id, e)
+                        archive_result = archive_logs_to_consolidation_bucket(
+                            current_user, task_id, existing_logs_data["logs"], access_token
+                        )
+                        migrated_logs_archived += archive_result["archived_count"]
                     
                     # Delete from USER_STORAGE_TABLE after archival
                     try:
@@ -589,6 +630,11 @@ def get_task_execution_details(current_user, task_id, execution_id, access_token
             for key, value in response["Item"].items()
         }
 
+        # Executions recorded in the execution log carry their own details
+        execution_record = get_execution_record(current_user, task_id, execution_id)
+        if execution_record:
+            return execution_record
+
         # Find the execution record
         logs = task.get("logs", [])
         execution_record = next(
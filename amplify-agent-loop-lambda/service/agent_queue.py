@@ -1,10 +1,12 @@
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from events.event_handler import MessageHandler
 from service.handlers import handle_event
 import boto3
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from events.email_events import SESMessageHandler
 from events.email_scheduling_events import SESSchedulingMessageHandler
@@ -21,136 +23,246 @@ agent_queue = os.environ["AGENT_QUEUE_URL"]
 
 _handlers: List[MessageHandler] = []
 
+# Records of one SQS batch are processed concurrently, up to this many at a time
+QUEUE_RECORD_WORKERS = int(os.environ.get("AGENT_QUEUE_RECORD_WORKERS", "4"))
+
+# Message shape -> index of the handler that accepts it (None: no handler)
+_dispatch_table: Dict[tuple, Optional[int]] = {}
+_dispatch_lock = threading.Lock()
+_DISPATCH_TABLE_MAX_ENTRIES = 1024
+
 
 def register_handler(handler: MessageHandler):
     _handlers.append(handler)
+    with _dispatch_lock:
+        _dispatch_table.clear()
 
 
-def route_queue_event(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Process messages from SQS queue by trying registered handlers."""
-    # logger.info("Processing SQS event: %s", json.dumps(event))
+def _message_shape(message_body: Dict[str, Any]) -> Optional[tuple]:
+    """
+    The parts of a message the registered handlers decide on: the task
+    source, or for SNS notifications the SES destinations / S3 buckets.
+    None when the message has no recognizable shape.
+    """
+    if "source" in message_body:
+        return ("source", str(message_body.get("source")))
 
-    for record in event.get("Records", []):
-        receipt_handle = record.get("receiptHandle")
+    inner = message_body.get("Message")
+    if isinstance(inner, str):
         try:
-            message_body = json.loads(record.get("body", "{}"))
-
-            # Log basic info about the message to help debug
-            message_type = message_body.get("Type", "Unknown")
-            message_subject = message_body.get("Subject", "No subject")
-            logger.info("Processing message: type=%s, subject=%s", message_type, message_subject)
-
-            logger.info("Starting handler chain with %d handlers", len(_handlers))
-            handled_by_any = False
-            for idx, handler in enumerate(_handlers):
-                handler_name = handler.__class__.__name__
-                logger.info("Trying handler %d: %s", idx + 1, handler_name)
-                if handler.can_handle(message_body):
-                    logger.info("Handler %s CAN handle this message", handler_name)
-                    handled_by_any = True
-                    input_event = handler.process(message_body, context)
-
-                    if input_event: 
-
-                        if handler.is_agent_loop_event():
-                            # print(f"Agent input event: {agent_input_event}")
-                            response = process_and_invoke_agent(input_event)
-                            logger.info("Agent response: %s", response)
-
-                            if response.get("handled"): 
-                                # delete record from sqs
-                                try:
-                                    sqs.delete_message(
-                                        QueueUrl=agent_queue, ReceiptHandle=receipt_handle
-                                    )
-                                except Exception as e:
-                                    logger.warning("Error deleting message: %s, continuing", e)
-
-                                result = response.get("result") 
-                                if not result:
-                                    logger.error("Agent response missing")
-                                    handler.onFailure(
-                                        input_event,
-                                        Exception(
-                                            "Failed to run the agent: Agent response missing"
-                                        ),
-                                    )
-                                    result = [
-                                        {
-                                            "role": "environment",
-                                            "content": "Failed to run the agent.",
-                                        }
-                                    ]
-                                logger.info(
-                                    f"Final agent results: {json.dumps(result, separators=(',', ':'))}"
-                                )
-                                handler.onSuccess(input_event, result)
-                            else:
-                                # Handle case when fat container returns handled=False
-                                error_msg = response.get("error", "Agent failed to handle event")
-                                logger.error("Agent failed to handle event: %s", error_msg)
-                                handler.onFailure(
-                                    input_event,
-                                    Exception(f"Agent failed to handle event: {error_msg}")
-                                )
-
-                        else:
-                            # Non-agent-loop event processing can be handled here if needed
-                            handler.onSuccess(input_event, input_event.get("result"))
-                    else:
-                        # If agent_input_event is None, pass the original message_body instead
-                        event_for_failure = input_event if input_event is not None else message_body
-                        handler.onFailure(
-                            event_for_failure, Exception("No result from handler")
+            inner = json.loads(inner)
+        except ValueError:
+            return None
+    if not isinstance(inner, dict):
+        return None
+
+    if all(k in inner for k in ["notificationType", "mail", "receipt"]):
+        destinations = inner.get("mail", {}).get("destination", [])
+        return (
+            "ses",
+            message_body.get("Type"),
+            tuple(sorted(str(email).lower() for email in destinations)),
+        )
+    if "Records" in inner:
+        sources = {
+            (r.get("eventSource"), r.get("s3", {}).get("bucket", {}).get("name"))
+            for r in inner.get("Records", [])
+            if isinstance(r, dict)
+        }
+        return ("records", message_body.get("Type"), tuple(sorted(sources, key=str)))
+    return None
+
+
+def find_handler(message_body: Dict[str, Any]) -> Optional[MessageHandler]:
+    """
+    First registered handler whose can_handle accepts the message. The
+    answer is cached per message shape so the handler chain is only probed
+    once for each kind of message.
+    """
+    shape = _message_shape(message_body)
+    if shape is not None:
+        with _dispatch_lock:
+            if shape in _dispatch_table:
+                index = _dispatch_table[shape]
+                return _handlers[index] if index is not None else None
+
+    logger.info("Starting handler chain with %d handlers", len(_handlers))
+    found = None
+    for idx, handler in enumerate(_handlers):
+        handler_name = handler.__class__.__name__
+        logger.info("Trying handler %d: %s", idx + 1, handler_name)
+        if handler.can_handle(message_body):
+            logger.info("Handler %s CAN handle this message", handler_name)
+            found = idx
+            break
+        logger.info("Handler %s cannot handle this message", handler_name)
+
+    if shape is not None:
+        with _dispatch_lock:
+            if len(_dispatch_table) >= _DISPATCH_TABLE_MAX_ENTRIES:
+                _dispatch_table.clear()
+            _dispatch_table[shape] = found
+    return _handlers[found] if found is not None else None
+
+
+def _process_record(record: Dict[str, Any], context: Any) -> bool:
+    """
+    Run one SQS record through its handler. Returns False when the record
+    should go back to the queue.
+    """
+    receipt_handle = record.get("receiptHandle")
+    message_body = {}
+    handler = None
+    # Once the agent has run the record is never retried, even if a callback fails
+    agent_handled = False
+    try:
+        message_body = json.loads(record.get("body", "{}"))
+
+        # Log basic info about the message to help debug
+        message_type = message_body.get("Type", "Unknown")
+        message_subject = message_body.get("Subject", "No subject")
+        logger.info("Processing message: type=%s, subject=%s", message_type, message_subject)
+
+        handler = find_handler(message_body)
+        if handler is None:
+            logger.warning("No handler could process this message! Type: %s, Subject: %s", message_type, message_subject)
+            return True
+
+        input_event = handler.process(message_body, context)
+
+        if input_event:
+
+            if handler.is_agent_loop_event():
+                response = process_and_invoke_agent(input_event)
+                logger.info("Agent response: %s", response)
+
+                if response.get("handled"):
+                    agent_handled = True
+                    # Delete right away: if a later record in the batch times the
+                    # invocation out, this agent run is not repeated
+                    try:
+                        sqs.delete_message(
+                            QueueUrl=agent_queue, ReceiptHandle=receipt_handle
                         )
-                        logger.info(
-                            "Ignoring event per handler instructions (e.g., return None)"
+                    except Exception as e:
+                        logger.warning("Error deleting message: %s, continuing", e)
+
+                    result = response.get("result")
+                    if not result:
+                        logger.error("Agent response missing")
+                        handler.onFailure(
+                            input_event,
+                            Exception(
+                                "Failed to run the agent: Agent response missing"
+                            ),
                         )
-                    # Only one handler should process each message — stop after first match
-                    break
+                        result = [
+                            {
+                                "role": "environment",
+                                "content": "Failed to run the agent.",
+                            }
+                        ]
+                    logger.info(
+                        f"Final agent results: {json.dumps(result, separators=(',', ':'))}"
+                    )
+                    handler.onSuccess(input_event, result)
                 else:
-                    logger.info("Handler %s cannot handle this message", handler_name)
+                    # Handle case when fat container returns handled=False
+                    error_msg = response.get("error", "Agent failed to handle event")
+                    logger.error("Agent failed to handle event: %s", error_msg)
+                    handler.onFailure(
+                        input_event,
+                        Exception(f"Agent failed to handle event: {error_msg}")
+                    )
+
+            else:
+                # Non-agent-loop event processing can be handled here if needed
+                handler.onSuccess(input_event, input_event.get("result"))
+        else:
+            # If agent_input_event is None, pass the original message_body instead
+            event_for_failure = input_event if input_event is not None else message_body
+            handler.onFailure(
+                event_for_failure, Exception("No result from handler")
+            )
+            logger.info(
+                "Ignoring event per handler instructions (e.g., return None)"
+            )
+        return True
 
-            if not handled_by_any:
-                logger.warning("No handler could process this message! Type: %s, Subject: %s", message_type, message_subject)
+    except Exception as e:
+        logger.error("Error processing message: %s", e)
 
-        except Exception as e:
-            logger.error("Error processing message: %s", e)
-            
-            # CRITICAL: Message processing failure = agent workflow blocked
-            from pycommon.api.critical_logging import log_critical_error, SEVERITY_HIGH
-            import traceback
-            log_critical_error(
-                function_name="process_queue_messages",
-                error_type="AgentQueueMessageProcessingFailure",
-                error_message=f"Failed to process SQS message: {str(e)}",
-                severity=SEVERITY_HIGH,
-                stack_trace=traceback.format_exc(),
-                context={
-                    "message_id": record.get('messageId'),
-                    "receipt_handle": receipt_handle[:50] if receipt_handle else 'unknown',
-                    "error_details": str(e)
-                }
+        # CRITICAL: Message processing failure = agent workflow blocked
+        import traceback
+        log_critical_error(
+            function_name="process_queue_messages",
+            error_type="AgentQueueMessageProcessingFailure",
+            error_message=f"Failed to process SQS message: {str(e)}",
+            severity=SEVERITY_HIGH,
+            stack_trace=traceback.format_exc(),
+            context={
+                "message_id": record.get('messageId'),
+                "receipt_handle": receipt_handle[:50] if receipt_handle else 'unknown',
+                "error_details": str(e)
+            }
+        )
+
+        if agent_handled:
+            return True
+
+        # Only call onFailure if we have a handler that can process this message
+        try:
+            handler = handler or find_handler(message_body)
+            if handler:
+                handler.onFailure(message_body, e)
+        except Exception as failure_error:
+            logger.warning("Error in onFailure: %s, continuing", failure_error)
+        try:
+            sqs.change_message_visibility(
+                QueueUrl=agent_queue,
+                ReceiptHandle=receipt_handle,
+                VisibilityTimeout=0,
             )
-            
-            # Only call onFailure if we have a handler that can process this message
-            for handler in _handlers:
-                if handler.can_handle(message_body):
-                    handler.onFailure(message_body, e)
-                    break
-            try:
-                sqs.change_message_visibility(
-                    QueueUrl=agent_queue,
-                    ReceiptHandle=receipt_handle,
-                    VisibilityTimeout=0,
-                )
-            except Exception as e:
-                logger.warning("Error changing message visibility: %s, continuing", e)
-            raise
+        except Exception as e:
+            logger.warning("Error changing message visibility: %s, continuing", e)
+        return False
+
+
+def route_queue_event(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Process messages from SQS queue by trying registered handlers.
+
+    Records are processed concurrently (AGENT_QUEUE_RECORD_WORKERS) and
+    failures are reported as batchItemFailures, so only the failed records
+    return to the queue.
+    """
+    records = event.get("Records", [])
+    if not records:
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "Successfully processed events"}),
+            "batchItemFailures": [],
+        }
+
+    with ThreadPoolExecutor(
+        max_workers=min(QUEUE_RECORD_WORKERS, len(records))
+    ) as executor:
+        outcomes = list(
+            executor.map(lambda record: _process_record(record, context), records)
+        )
+
+    failures = [
+        {"itemIdentifier": record.get("messageId")}
+        for record, ok in zip(records, outcomes)
+        if not ok
+    ]
+    if failures:
+        logger.warning("%d of %d records failed and will be retried", len(failures), len(records))
 
     return {
         "statusCode": 200,
         "body": json.dumps({"message": "Successfully processed events"}),
+        "batchItemFailures": failures,
     }
 
 
@@ -1,7 +1,9 @@
+import gzip
 import json
 import os
 import traceback
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 
@@ -23,6 +25,7 @@ from agent.components.agent_registry import AgentRegistry
 from agent.components.common_goals import Goal
 from agent.components.python_action_registry import PythonActionRegistry
 from agent.components.python_environment import PythonEnvironment
+from agent.components.run_profiler import AGENT_RUN_PROFILING, NO_OP_PROFILER, RunProfiler
 from agent.core import Action, UnknownActionError
 from agent.prompt import create_llm
 from agent.tools.ops import ops_to_tools, get_default_ops_as_tools
@@ -46,6 +49,20 @@ patch_all()  # AWS x-ray patch all supported libraries (boto3, requests, etc.)
 from pycommon.logger import getLogger
 logger = getLogger("agent_handlers")
 
+# agent_state.json bodies larger than this are stored gzip-compressed
+AGENT_STATE_COMPRESS_THRESHOLD_BYTES = int(
+    os.environ.get("AGENT_STATE_COMPRESS_THRESHOLD_BYTES", str(256 * 1024))
+)
+
+
+def read_json_object(s3_response) -> Any:
+    """Parse a JSON S3 object, decompressing it if it was stored with gzip content encoding."""
+    body = s3_response["Body"].read()
+    if s3_response.get("ContentEncoding") == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
 def save_conversation_state(
     current_user: str, session_id: str, conversation_results: List[Dict[str, Any]]
 ) -> Dict[str, Any]:
@@ -75,12 +92,18 @@ def save_conversation_state(
         s3_key = f"agentState/{current_user}/{session_id}/agent_state.json"
 
         # Convert conversation results to JSON and store in consolidation S3 bucket
+        body = json.dumps(conversation_results, separators=(",", ":")).encode("utf-8")
+        extra_args = {}
+        if len(body) > AGENT_STATE_COMPRESS_THRESHOLD_BYTES:
+            body = gzip.compress(body)
+            extra_args["ContentEncoding"] = "gzip"
         try:
             s3.put_object(
                 Bucket=consolidation_bucket,
                 Key=s3_key,
-                Body=json.dumps(conversation_results, indent=2),
+                Body=body,
                 ContentType="application/json",
+                **extra_args,
             )
         except ClientError as e:
             logger.error("Error storing conversation in S3: %s", e)
@@ -662,6 +685,9 @@ def handle_event(
         def event_printer_wrapper(event_id: str, event: Dict[str, Any]):
             return event_printer(event_id, event, current_user, session_id)
 
+        # The profiler is created here so it also covers saving the run
+        profiler = RunProfiler() if AGENT_RUN_PROFILING else NO_OP_PROFILER
+
         action_context_props = {
             "current_user": current_user,
             "request_id": request_id,
@@ -673,7 +699,10 @@ def handle_event(
             "agent_registry": agent_registry,
             "llm": llm,
             "work_directory": work_directory,
+            "file_tracker": tracker,
         }
+        if AGENT_RUN_PROFILING:
+            action_context_props["run_profiler"] = profiler
         
         # Add attached database connection ID from metadata or chat body if present
         attached_database_id = None
@@ -728,10 +757,11 @@ def handle_event(
                 return content
 
         # Convert memory to a list of dicts
-        processed_result = [
-            {"role": item["type"], "content": load_memory_content(item)}
-            for item in result.items
-        ]
+        with profiler.phase("memory_serialization"):
+            processed_result = [
+                {"role": item["type"], "content": load_memory_content(item)}
+                for item in result.items
+            ]
 
         total_token_cost = llm.get_total_cost()
 
@@ -741,11 +771,21 @@ def handle_event(
             {"role": "environment", "content": {"total_token_cost": total_token_cost}}
         )
 
-        # Save conversation state to S3 and update DynamoDB
+        # Save conversation state to S3 and update DynamoDB while the changed
+        # session files and their index are uploaded
         with xray_recorder.in_subsegment("save_conversation_state"):
-            save_result = save_conversation_state(
-                current_user, session_id, processed_result
-            )
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                file_upload = executor.submit(tracker.upload_changed_files)
+                with profiler.phase("save_conversation_state"):
+                    save_result = save_conversation_state(
+                        current_user, session_id, processed_result
+                    )
+                file_results = file_upload.result()
+
+        if AGENT_RUN_PROFILING:
+            summary = profiler.summary()
+            logger.info("Agent run profile: %s", summary)
+            event_printer_wrapper("agent/profile/summary", summary)
 
         if not save_result["success"]:
             logger.warning("Failed to save conversation state: %s", save_result['error'])
@@ -759,9 +799,7 @@ def handle_event(
             
 
         logger.info("Conversation state saved to S3: %s", save_result['s3_location'])
-        logger.info("Checking for changed files")
-        with xray_recorder.in_subsegment("upload_changed_files"):
-            file_results = tracker.upload_changed_files()
+        logger.info("Uploaded changed files: %s", file_results.get("message"))
 
         session_files = tracker.get_tracked_files()
 
@@ -1144,9 +1182,7 @@ def get_latest_agent_state(current_user, session_id):
                 # Fetch conversation results from S3
                 s3 = boto3.client("s3")
                 s3_response = s3.get_object(Bucket=bucket, Key=key)
-                conversation_data = json.loads(
-                    s3_response["Body"].read().decode("utf-8")
-                )
+                conversation_data = read_json_object(s3_response)
 
                 # Fetch session files from index.json with backward compatibility
                 session_files = {}
@@ -170,7 +170,15 @@ def create_scheduled_task_handler(
     parameters={
         "type": "object",
         "properties": {
-            "taskId": {"type": "string", "description": "ID of the task to retrieve"}
+            "taskId": {"type": "string", "description": "ID of the task to retrieve"},
+            "logsLimit": {
+                "type": "integer",
+                "description": "Optional number of runs to return in logs, newest first; without it or logsNextToken every run is returned",
+            },
+            "logsNextToken": {
+                "type": "string",
+                "description": "Optional continuation token for older runs",
+            },
         },
         "required": ["taskId"],
     },
@@ -198,6 +206,10 @@ def create_scheduled_task_handler(
                     "notifyOnCompletion": {"type": "boolean"},
                     "notifyOnFailure": {"type": "boolean"},
                     "notifyEmailAddresses": {"type": "array"},
+                    "logsNextToken": {
+                        "type": "string",
+                        "description": "Present when older runs can be fetched with logsNextToken",
+                    },
                 },
                 "description": "Task details when found",
             },
@@ -206,9 +218,11 @@ def create_scheduled_task_handler(
         "required": ["success", "message"],
     },
 )
-def get_scheduled_task_handler(current_user, access_token, task_id):
+def get_scheduled_task_handler(current_user, access_token, task_id, logs_limit=None, logs_next_token=None):
     try:
-        task = get_scheduled_task(current_user, task_id, access_token)
+        task = get_scheduled_task(
+            current_user, task_id, access_token, logs_limit=logs_limit, logs_next_token=logs_next_token
+        )
         if task is None:
             return {"success": False, "message": "Task not found"}
         return {"success": True, "task": task, "message": "Task retrieved successfully"}
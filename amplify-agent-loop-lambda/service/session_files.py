@@ -1,17 +1,80 @@
 import os
+import re
 import hashlib
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 import boto3
 from typing import Dict, List, Tuple, Optional
 import uuid
 from pathlib import Path
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 import shutil
 import requests
 from pycommon.logger import getLogger
 logger = getLogger("session_files")
 
+# How files from a resumed session are brought back into the working directory:
+#   "serial"   - download one at a time before the agent starts
+#   "parallel" - download on a bounded thread pool before the agent starts
+#   "lazy"     - download nothing up front; a file is fetched the first time a
+#                tool call references it (see materialize_referenced_files)
+RESTORE_MODE = os.environ.get("AGENT_SESSION_RESTORE_MODE", "parallel").lower()
+RESTORE_WORKERS = int(os.environ.get("AGENT_SESSION_RESTORE_WORKERS", "8"))
+
+# How files are compared against the state captured at start_tracking:
+#   "stat" - compare size and mtime; only files whose stat differs are hashed
+#   "hash" - hash every file on every scan (the original behaviour)
+CHANGE_DETECTION = os.environ.get("AGENT_FILE_CHANGE_DETECTION", "stat").lower()
+# md5, blake2b, or crc32 (non-cryptographic, fastest)
+HASH_ALGORITHM = os.environ.get("AGENT_FILE_HASH_ALGORITHM", "md5").lower()
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# End-of-run uploads: files are uploaded concurrently, and files above the
+# multipart threshold are split into parts that are uploaded in parallel too
+UPLOAD_WORKERS = int(os.environ.get("AGENT_SESSION_UPLOAD_WORKERS", "8"))
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get("AGENT_SESSION_MULTIPART_THRESHOLD_BYTES", str(8 * 1024 * 1024))),
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+class _Crc32:
+    """hashlib-style wrapper around zlib.crc32."""
+
+    def __init__(self):
+        self._value = 0
+
+    def update(self, data: bytes):
+        self._value = zlib.crc32(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+def _new_hasher(algorithm: str):
+    if algorithm == "crc32":
+        return _Crc32()
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    return hashlib.md5()
+
+
+def hash_file(filepath: str, algorithm: str = None) -> str:
+    """Hash a file in fixed-size blocks so large files are never fully buffered."""
+    hasher = _new_hasher(algorithm or HASH_ALGORITHM)
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
 class LambdaFileTracker:
     def __init__(self, current_user: str, session_id: str, working_dir: str = "/tmp"):
         self.current_user = current_user
@@ -24,6 +87,16 @@ class LambdaFileTracker:
         self.data_sources: Dict[str, str] = {}  # Maps source ID -> local filename
         self.deleted_files: List[str] = []  # Track files that have been deleted
 
+        # Lazy restore state: original path -> S3 key of files not yet downloaded
+        self.pending_files: Dict[str, str] = {}
+        self._pending_bucket: Optional[str] = None
+        self._pending_versions: Dict[str, Dict] = {}
+        self._materializing: Dict[str, threading.Event] = {}
+        self._pending_lock = threading.Lock()
+
+        # Index written by the last upload_changed_files, reused by get_tracked_files
+        self._written_index: Optional[Dict] = None
+
         # Create session working directory in /tmp
         self.working_dir = working_dir
         os.makedirs(self.working_dir, exist_ok=True)
@@ -36,15 +109,21 @@ class LambdaFileTracker:
         except Exception as e:
             logger.error("Error cleaning up temporary files: %s", e)
 
-    def get_file_info(self, filepath: str) -> Dict:
-        """Get file size and hash for a given file."""
+    def get_file_info(self, filepath: str, include_hash: bool = True) -> Dict:
+        """Get file size, mtime and (optionally) hash for a given file."""
         stats = os.stat(filepath)
-        with open(filepath, "rb") as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        return {"size": stats.st_size, "hash": file_hash, "mtime": stats.st_mtime}
+        info = {"size": stats.st_size, "mtime": stats.st_mtime, "mtime_ns": stats.st_mtime_ns}
+        if include_hash:
+            info["hash"] = hash_file(filepath)
+        return info
 
-    def scan_directory(self) -> Dict[str, Dict]:
-        """Scan working directory and return file information."""
+    def scan_directory(self, include_hash: bool = None) -> Dict[str, Dict]:
+        """
+        Scan working directory and return file information. Files are only
+        hashed in "hash" change detection mode unless include_hash is given.
+        """
+        if include_hash is None:
+            include_hash = CHANGE_DETECTION == "hash"
         file_info = {}
         for root, _, files in os.walk(self.working_dir):
             for file in files:
@@ -52,11 +131,33 @@ class LambdaFileTracker:
                 rel_path = os.path.relpath(full_path, self.working_dir)
                 try:
                     logger.debug("Found file %s", rel_path)
-                    file_info[rel_path] = self.get_file_info(full_path)
+                    file_info[rel_path] = self.get_file_info(full_path, include_hash)
                 except (IOError, OSError) as e:
                     logger.error("Error reading file %s: %s", full_path, e)
         return file_info
 
+    def _is_changed(self, filepath: str, current_info: Dict) -> bool:
+        """
+        Compare a scanned file with its state at start_tracking. Files whose
+        size and mtime are unchanged are skipped without being read; the rest
+        are hashed (filling in current_info["hash"]) and compared to the
+        starting hash when one was recorded.
+        """
+        initial_info = self.initial_state.get(filepath)
+        if (
+            initial_info is not None
+            and current_info["size"] == initial_info["size"]
+            and current_info.get("mtime_ns") == initial_info.get("mtime_ns")
+            and ("hash" not in current_info or current_info["hash"] == initial_info.get("hash"))
+        ):
+            return False
+
+        if "hash" not in current_info:
+            current_info["hash"] = hash_file(os.path.join(self.working_dir, filepath))
+        if initial_info is None or current_info["size"] != initial_info["size"] or "hash" not in initial_info:
+            return True
+        return current_info["hash"] != initial_info["hash"]
+
     def find_existing_session(self) -> Optional[Dict]:
         """Look for existing session files in S3 with backward compatibility."""
         try:
@@ -107,49 +208,85 @@ class LambdaFileTracker:
             logger.error("Error checking for existing session: %s", e)
             return None
 
-    def restore_session_files(self, index_content: Dict) -> bool:
-        """Restore files from a previous session to the working directory."""
-        try:
-            # Determine which bucket and key prefix to use
-            bucket_type = index_content.get("_bucket_type", "legacy")
-            if bucket_type == "consolidation":
-                bucket_to_use = self.consolidation_bucket
-                key_prefix = f"agentState/{self.current_user}/{self.session_id}/"
-            else:
-                bucket_to_use = self.legacy_bucket
-                key_prefix = f"{self.current_user}/{self.session_id}/"
+    def _restore_location(self, index_content: Dict) -> Tuple[str, str]:
+        """Bucket and key prefix that hold the files of the session described by the index."""
+        bucket_type = index_content.get("_bucket_type", "legacy")
+        if bucket_type == "consolidation":
+            return self.consolidation_bucket, f"agentState/{self.current_user}/{self.session_id}/"
+        return self.legacy_bucket, f"{self.current_user}/{self.session_id}/"
+
+    def _files_to_restore(self, index_content: Dict, key_prefix: str) -> Tuple[Dict[str, str], int]:
+        """Map of original path -> S3 key for every indexed file that was not deleted."""
+        # Load list of files that were previously deleted
+        deleted_files = index_content.get("deleted_files", [])
+        to_restore = {}
+        files_skipped = 0
+        for original_path, s3_name in index_content["mappings"].items():
+            # Skip files that were previously deleted
+            if original_path in deleted_files or original_path in self.deleted_files:
+                logger.info("Skipping previously deleted file: %s", original_path)
+                files_skipped += 1
+                continue
+            to_restore[original_path] = f"{key_prefix}{s3_name}"
+        return to_restore, files_skipped
+
+    def _download_session_file(self, bucket: str, original_path: str, s3_key: str) -> bool:
+        logger.info("Restoring %s from %s (bucket: %s)", original_path, s3_key, bucket)
+        local_path = os.path.join(self.working_dir, original_path)
 
-            # Load list of files that were previously deleted
-            deleted_files = index_content.get("deleted_files", [])
-            files_restored = 0
-            files_skipped = 0
-
-            # Download each file from the index
-            for original_path, s3_name in index_content["mappings"].items():
-                # Skip files that were previously deleted
-                if (
-                    original_path in deleted_files
-                    or original_path in self.deleted_files
-                ):
-                    logger.info("Skipping previously deleted file: %s", original_path)
-                    files_skipped += 1
-                    continue
+        # Ensure the target directory exists
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
 
-                # Construct the S3 key based on bucket type
-                s3_key = f"{key_prefix}{s3_name}"
-                logger.info("Restoring %s from %s (bucket: %s)", original_path, s3_key, bucket_to_use)
-                local_path = os.path.join(self.working_dir, original_path)
+        try:
+            self.s3_client.download_file(bucket, s3_key, local_path)
+            return True
+        except ClientError as e:
+            logger.error("Error downloading file %s: %s", s3_key, e)
+            return False
 
-                # Ensure the target directory exists
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    def restore_session_files(self, index_content: Dict, mode: str = None) -> bool:
+        """
+        Restore files from a previous session to the working directory.
 
-                try:
-                    # Download the file
-                    self.s3_client.download_file(bucket_to_use, s3_key, local_path)
-                    files_restored += 1
-                except ClientError as e:
-                    logger.error("Error downloading file %s: %s", s3_key, e)
-                    continue
+        mode is one of "serial", "parallel" or "lazy" and defaults to
+        AGENT_SESSION_RESTORE_MODE. In lazy mode the files are only registered
+        as pending and are downloaded by materialize() on first use.
+        """
+        mode = (mode or RESTORE_MODE).lower()
+        try:
+            # Determine which bucket and key prefix to use
+            bucket_to_use, key_prefix = self._restore_location(index_content)
+            to_restore, files_skipped = self._files_to_restore(index_content, key_prefix)
+
+            if mode == "lazy":
+                with self._pending_lock:
+                    self._pending_bucket = bucket_to_use
+                    self.pending_files.update(to_restore)
+                    version_history = index_content.get("version_history", {})
+                    self._pending_versions = {
+                        path: version_history[path][-1]
+                        for path in to_restore
+                        if version_history.get(path)
+                    }
+                logger.info(
+                    "Files pending lazy restore: %d, files skipped (previously deleted): %d",
+                    len(to_restore), files_skipped
+                )
+                return True
+
+            if mode == "parallel" and len(to_restore) > 1:
+                workers = max(1, min(RESTORE_WORKERS, len(to_restore)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(
+                        lambda item: self._download_session_file(bucket_to_use, *item),
+                        to_restore.items(),
+                    ))
+            else:
+                results = [
+                    self._download_session_file(bucket_to_use, original_path, s3_key)
+                    for original_path, s3_key in to_restore.items()
+                ]
+            files_restored = sum(1 for restored in results if restored)
 
             logger.info(
                 "Files restored: %d, files skipped (previously deleted): %d", files_restored, files_skipped
@@ -160,6 +297,99 @@ class LambdaFileTracker:
             logger.error("Error restoring session files: %s", e)
             return False
 
+    def materialize(self, paths: List[str]) -> List[str]:
+        """
+        Download pending (lazily restored) files so they exist in the working
+        directory. Paths are relative to the working directory; paths that are
+        not pending are ignored. Returns the paths that were downloaded.
+        """
+        to_download = {}
+        to_wait = []
+        with self._pending_lock:
+            for path in paths:
+                if path in self.pending_files:
+                    to_download[path] = self.pending_files.pop(path)
+                    self._materializing[path] = threading.Event()
+                elif path in self._materializing:
+                    to_wait.append(self._materializing[path])
+
+        def download(item):
+            path, s3_key = item
+            try:
+                if self._download_session_file(self._pending_bucket, path, s3_key):
+                    # The restored content is the baseline for change detection
+                    local_path = os.path.join(self.working_dir, path)
+                    info = self.get_file_info(local_path, CHANGE_DETECTION == "hash")
+                    with self._pending_lock:
+                        self.initial_state[path] = info
+                    return path
+                return None
+            finally:
+                with self._pending_lock:
+                    self._materializing.pop(path).set()
+
+        if len(to_download) > 1:
+            workers = max(1, min(RESTORE_WORKERS, len(to_download)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                downloaded = list(executor.map(download, to_download.items()))
+        else:
+            downloaded = [download(item) for item in to_download.items()]
+
+        for event in to_wait:
+            event.wait()
+
+        if to_download:
+            logger.info("Materialized %d lazily restored files", len(to_download))
+        return [path for path in downloaded if path]
+
+    def materialize_all(self) -> List[str]:
+        """Download every file still pending from a lazy restore."""
+        with self._pending_lock:
+            paths = list(self.pending_files)
+        return self.materialize(paths)
+
+    def materialize_referenced_files(self, args) -> List[str]:
+        """
+        Materialize pending files referenced by a tool call's arguments.
+
+        Every string in args (recursively through dicts and lists) is checked
+        for the relative or absolute path of a pending file. A reference to the
+        working directory itself, or a glob inside it, can touch any file, so
+        it materializes everything that is still pending.
+        """
+        with self._pending_lock:
+            if not self.pending_files:
+                return []
+            pending = list(self.pending_files)
+
+        strings = []
+
+        def collect(value):
+            if isinstance(value, str):
+                strings.append(value)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    collect(item)
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    collect(item)
+
+        collect(args)
+        if not strings:
+            return []
+
+        working_dir = os.path.normpath(self.working_dir)
+        directory_reference = re.compile(re.escape(working_dir) + r"/?(?=$|[\s'\";|&)])")
+        for text in strings:
+            if directory_reference.search(text) or (working_dir in text and _GLOB_CHARS.search(text)):
+                return self.materialize_all()
+
+        referenced = [
+            path for path in pending
+            if any(path in text for text in strings)
+        ]
+        return self.materialize(referenced)
+
     def write_file(self, filename: str, content: bytes | str) -> str:
         """
         Write content to a file in the working directory.
@@ -174,6 +404,16 @@ class LambdaFileTracker:
 
         return filename
 
+    def open_file(self, filename: str, mode: str = "w", **kwargs):
+        """
+        Open a file in the working directory for incremental writes. Like
+        write_file, the file is picked up as a changed file and uploaded with
+        the session.
+        """
+        local_path = os.path.join(self.working_dir, filename)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        return open(local_path, mode, **kwargs)
+
     def read_file(self, filename: str) -> bytes:
         """Read content from a file in the working directory."""
         local_path = os.path.join(self.working_dir, filename)
@@ -201,11 +441,13 @@ class LambdaFileTracker:
 
         # Start tracking current state
         self.initial_state = self.scan_directory()
-        logger.info("Now tracking %d files", len(self.initial_state))
+        logger.info(
+            "Now tracking %d files, %d pending lazy restore", len(self.initial_state), len(self.pending_files)
+        )
 
         return {
             "session_restored": existing_session is not None,
-            "files_tracking": len(self.initial_state),
+            "files_tracking": len(self.initial_state) + len(self.pending_files),
         }
 
     def get_tracked_files(self) -> Dict[str, Dict]:
@@ -225,8 +467,12 @@ class LambdaFileTracker:
             # Try consolidation bucket first
             consolidation_index_key = f"agentState/{self.current_user}/{self.session_id}/index.json"
             try:
-                response = self.s3_client.get_object(Bucket=self.consolidation_bucket, Key=consolidation_index_key)
-                index_data = json.loads(response["Body"].read().decode("utf-8"))
+                if self._written_index is not None:
+                    # This invocation just wrote the index; no need to read it back
+                    index_data = self._written_index
+                else:
+                    response = self.s3_client.get_object(Bucket=self.consolidation_bucket, Key=consolidation_index_key)
+                    index_data = json.loads(response["Body"].read().decode("utf-8"))
                 filename_mappings = index_data.get("mappings", {})
                 version_history = index_data.get("version_history", {})
             except ClientError as e:
@@ -266,6 +512,22 @@ class LambdaFileTracker:
                 if filepath in version_history:
                     tracked_files[file_id]["versions"] = version_history[filepath]
 
+            # Files still pending a lazy restore are part of the session even
+            # though they have not been downloaded
+            for filepath, s3_filename in filename_mappings.items():
+                if filepath not in self.pending_files or filepath in current_files:
+                    continue
+                file_id = s3_filename.rsplit(".", 1)[0]
+                latest = self._pending_versions.get(filepath, {})
+                tracked_files[file_id] = {
+                    "original_name": filepath,
+                    "size": latest.get("size", 0),
+                    "last_modified": latest.get("timestamp", ""),
+                    "s3_filename": s3_filename,
+                }
+                if filepath in version_history:
+                    tracked_files[file_id]["versions"] = version_history[filepath]
+
         except Exception as e:
             logger.error("Error getting tracked files: %s", e)
 
@@ -562,10 +824,7 @@ class LambdaFileTracker:
 
         # Check for modified or new files
         for filepath, current_info in current_state.items():
-            if (
-                filepath not in self.initial_state
-                or current_info["hash"] != self.initial_state[filepath]["hash"]
-            ):
+            if self._is_changed(filepath, current_info):
                 changed_files.append(filepath)
                 new_s3_name = str(uuid.uuid4()) + Path(filepath).suffix
                 filename_mapping[filepath] = new_s3_name
@@ -576,9 +835,10 @@ class LambdaFileTracker:
                     "size": current_info["size"],
                 }
 
-        # Check for deleted files (exist in initial_state but not in current_state)
+        # Check for deleted files (exist in initial_state but not in current_state).
+        # Files still pending a lazy restore were never touched and are unchanged.
         for filepath in self.initial_state:
-            if filepath not in current_state:
+            if filepath not in current_state and filepath not in self.pending_files:
                 deleted_files.append(filepath)
                 # Remove the mapping for deleted files
                 if filepath in filename_mapping:
@@ -654,30 +914,41 @@ class LambdaFileTracker:
                 # Save deleted files to instance variable for next session
                 self.deleted_files = existing_index["deleted_files"]
 
-            # Upload index file to consolidation bucket
-            self.s3_client.put_object(
-                Bucket=self.consolidation_bucket,
-                Key=consolidation_index_key,
-                Body=json.dumps(existing_index, indent=2),
-                ContentType="application/json",
-            )
-
-            # Upload changed files to consolidation bucket with agentState/ prefix
-            upload_results = {}
-            for original_path in changed_files:
+            def upload_file(original_path):
                 safe_name = filename_mapping[original_path]
                 s3_key = f"agentState/{self.current_user}/{self.session_id}/{safe_name}"
                 local_path = os.path.join(self.working_dir, original_path)
 
                 try:
-                    with open(local_path, "rb") as file:
-                        self.s3_client.upload_fileobj(file, self.consolidation_bucket, s3_key)
-                    upload_results[original_path] = {
-                        "status": "success",
-                        "s3_key": s3_key,
-                    }
+                    self.s3_client.upload_file(
+                        local_path, self.consolidation_bucket, s3_key, Config=UPLOAD_TRANSFER_CONFIG
+                    )
+                    return {"status": "success", "s3_key": s3_key}
                 except Exception as e:
-                    upload_results[original_path] = {"status": "error", "error": str(e)}
+                    return {"status": "error", "error": str(e)}
+
+            # Upload the index file and the changed files (with agentState/ prefix)
+            # to the consolidation bucket concurrently
+            workers = max(1, min(UPLOAD_WORKERS, len(changed_files) + 1))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                index_upload = executor.submit(
+                    self.s3_client.put_object,
+                    Bucket=self.consolidation_bucket,
+                    Key=consolidation_index_key,
+                    Body=json.dumps(existing_index, separators=(",", ":")),
+                    ContentType="application/json",
+                )
+                file_uploads = {
+                    original_path: executor.submit(upload_file, original_path)
+                    for original_path in changed_files
+                }
+                upload_results = {
+                    original_path: future.result()
+                    for original_path, future in file_uploads.items()
+                }
+                index_upload.result()
+
+            self._written_index = existing_index
 
             return {
                 "status": "success",
@@ -1,5 +1,6 @@
 from workflow.workflow_template_registry import (
     list_workflow_templates,
+    list_workflow_templates_page,
     get_workflow_template,
     register_workflow_template,
     delete_workflow_template,
@@ -266,7 +267,7 @@ def get_workflow_template_handler(current_user, access_token, template_id):
 
 
 @required_env_vars({
-    "WORKFLOW_TEMPLATES_TABLE": [DynamoDBOperation.SCAN],
+    "WORKFLOW_TEMPLATES_TABLE": [DynamoDBOperation.QUERY],
 })
 @api_tool(
     path="/vu-agent/list-workflow-templates",
@@ -284,6 +285,14 @@ def get_workflow_template_handler(current_user, access_token, template_id):
                 "type": "boolean",
                 "description": "Optional boolean to include public templates",
             },
+            "limit": {
+                "type": "integer",
+                "description": "Optional page size; when set (or nextToken is given) a single page is returned",
+            },
+            "nextToken": {
+                "type": "string",
+                "description": "Optional continuation token from a previous page",
+            },
         },
         "required": [],
     },
@@ -335,19 +344,29 @@ def get_workflow_template_handler(current_user, access_token, template_id):
                     ],
                 },
                 "description": "List of workflow templates",
-            }
+            },
+            "nextToken": {
+                "type": "string",
+                "description": "Continuation token for the next page, absent on the last page",
+            },
         },
         "required": ["templates"],
     },
 )
-def list_workflow_templates_handler(current_user, access_token, filter_base_templates=False, include_public_templates=False):
+def list_workflow_templates_handler(current_user, access_token, filter_base_templates=False, include_public_templates=False, limit=None, next_token=None):
     try:
-        templates = list_workflow_templates(current_user, include_public_templates)
+        if limit or next_token:
+            templates, next_token = list_workflow_templates_page(
+                current_user, include_public_templates, limit=limit, next_token=next_token
+            )
+        else:
+            templates = list_workflow_templates(current_user, include_public_templates)
         if filter_base_templates:
             templates = [t for t in templates if t["isBaseTemplate"]]
-        return {
-            "templates": templates
-        }  # No need for conversion; already uses templateId
+        result = {"templates": templates}  # No need for conversion; already uses templateId
+        if next_token:
+            result["nextToken"] = next_token
+        return result
     except Exception as e:
         raise RuntimeError(f"Failed to list workflow templates: {str(e)}")
 
@@ -1,5 +1,8 @@
 from datetime import datetime
 import os
+import base64
+import threading
+import time
 import boto3
 import uuid
 from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
@@ -70,6 +73,91 @@ def _fix_python_dict_strings_in_data(data):
 def get_app_id() -> str:
     return "amplify-workflows"
 
+
+# Sparse GSI: only public templates carry publicCatalog, so the index holds
+# exactly the public catalog, sorted by templateId
+PUBLIC_TEMPLATES_INDEX = "PublicTemplatesIndex"
+PUBLIC_CATALOG_KEY = "public"
+PUBLIC_CATALOG_CACHE_SECONDS = int(os.environ.get("WORKFLOW_PUBLIC_TEMPLATES_CACHE_SECONDS", "60"))
+DEFAULT_TEMPLATE_PAGE_SIZE = 100
+
+_public_catalog_cache = {"expires_at": 0, "templates": None}
+_public_catalog_lock = threading.Lock()
+
+
+def _public_catalog_attributes(is_public):
+    return {"publicCatalog": {"S": PUBLIC_CATALOG_KEY}} if is_public else {}
+
+
+def _template_summary(item, deserializer):
+    return {
+        'templateId': deserializer.deserialize(item['templateId']),  # Use camel case
+        'name': deserializer.deserialize(item['name']),
+        'description': deserializer.deserialize(item['description']),
+        'inputSchema': deserializer.deserialize(item['inputSchema']),  # Use camel case
+        'outputSchema': deserializer.deserialize(item['outputSchema']),  # Use camel case
+        'isBaseTemplate': deserializer.deserialize(item['isBaseTemplate']) if 'isBaseTemplate' in item else False,
+        'isPublic': bool(deserializer.deserialize(item['isPublic'])) if 'isPublic' in item else False,
+        'user': deserializer.deserialize(item['user']),  # Include user info to distinguish ownership
+    }
+
+
+def invalidate_public_template_cache():
+    with _public_catalog_lock:
+        _public_catalog_cache["expires_at"] = 0
+        _public_catalog_cache["templates"] = None
+
+
+def get_public_templates():
+    """
+    Every public template's summary, sorted by templateId. Read from the
+    PublicTemplatesIndex and cached in the container for
+    WORKFLOW_PUBLIC_TEMPLATES_CACHE_SECONDS.
+    """
+    with _public_catalog_lock:
+        if (
+            _public_catalog_cache["templates"] is not None
+            and _public_catalog_cache["expires_at"] > time.time()
+        ):
+            return _public_catalog_cache["templates"]
+
+    table_name = os.environ.get("WORKFLOW_TEMPLATES_TABLE")
+    if not table_name:
+        raise ValueError("Environment variable 'WORKFLOW_TEMPLATES_TABLE' must be set.")
+
+    dynamodb = boto3.client("dynamodb")
+    deserializer = TypeDeserializer()
+    templates = []
+    paginator = dynamodb.get_paginator("query")
+    for page in paginator.paginate(
+        TableName=table_name,
+        IndexName=PUBLIC_TEMPLATES_INDEX,
+        KeyConditionExpression="publicCatalog = :catalog",
+        ExpressionAttributeValues={":catalog": {"S": PUBLIC_CATALOG_KEY}},
+    ):
+        templates.extend(_template_summary(item, deserializer) for item in page.get("Items", []))
+
+    with _public_catalog_lock:
+        _public_catalog_cache["templates"] = templates
+        _public_catalog_cache["expires_at"] = time.time() + PUBLIC_CATALOG_CACHE_SECONDS
+    return templates
+
+
+def _encode_page_token(token):
+    return base64.urlsafe_b64encode(
+        json.dumps(token, separators=(",", ":")).encode("utf-8")
+    ).decode("ascii")
+
+
+def _decode_page_token(next_token):
+    try:
+        token = json.loads(base64.urlsafe_b64decode(next_token.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid nextToken")
+    if not isinstance(token, dict) or token.get("phase") not in ("user", "public"):
+        raise ValueError("Invalid nextToken")
+    return token
+
 def register_workflow_template(
     current_user,
     template,
@@ -140,10 +228,13 @@ def register_workflow_template(
             "inputSchema": serializer.serialize(input_schema),  # Use camel case
             "outputSchema": serializer.serialize(output_schema),  # Use camel case
             "createdAt": serializer.serialize(datetime.now().isoformat()),
+            **_public_catalog_attributes(is_public),
         }
 
         # Insert the metadata into the DynamoDB table
         dynamodb.put_item(TableName=table_name, Item=item)
+        if is_public:
+            invalidate_public_template_cache()
 
         return template_id  # Changed from template_uuid to template_id
     except Exception as e:
@@ -285,75 +376,135 @@ def get_workflow_template(
     except Exception as e:
         raise RuntimeError(f"Failed to fetch workflow template: {e}")
 
-def list_workflow_templates(current_user, include_public_templates=False):
+def list_workflow_templates_page(
+    current_user,
+    include_public_templates=False,
+    limit=DEFAULT_TEMPLATE_PAGE_SIZE,
+    next_token=None,
+):
+    """
+    One page of the user's templates followed by other users' public templates.
+
+    Returns:
+        tuple: (templates, next_token); next_token is None on the last page.
+    """
     # Get the table name from the environment variable
     table_name = os.environ.get("WORKFLOW_TEMPLATES_TABLE")
     if not table_name:
         raise ValueError("Environment variable 'WORKFLOW_TEMPLATES_TABLE' must be set.")
 
-    # Initialize the DynamoDB client
-    dynamodb = boto3.client("dynamodb")
+    limit = max(1, int(limit or DEFAULT_TEMPLATE_PAGE_SIZE))
+    token = _decode_page_token(next_token) if next_token else {"phase": "user"}
+    deserializer = TypeDeserializer()
+    templates = []
 
     try:
-        # Define expression attribute names to avoid reserved keyword issue
-        expression_attribute_names = {"#user": "user"}
+        if token["phase"] == "user":
+            # Initialize the DynamoDB client
+            dynamodb = boto3.client("dynamodb")
+
+            # Query the DynamoDB table for the templates by the current user
+            query_params = {
+                "TableName": table_name,
+                "KeyConditionExpression": "#user = :user",
+                # Define expression attribute names to avoid reserved keyword issue
+                "ExpressionAttributeNames": {"#user": "user"},
+                "ExpressionAttributeValues": {":user": {"S": current_user}},
+                "Limit": limit,
+            }
+            if token.get("key"):
+                query_params["ExclusiveStartKey"] = token["key"]
+            user_response = dynamodb.query(**query_params)
+            templates.extend(
+                _template_summary(item, deserializer)
+                for item in user_response.get("Items", [])
+            )
 
-        # Query the DynamoDB table for all templates by the current user
-        user_response = dynamodb.query(
-            TableName=table_name,
-            KeyConditionExpression="#user = :user",
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues={":user": {"S": current_user}},
-        )
+            last_evaluated_key = user_response.get("LastEvaluatedKey")
+            if last_evaluated_key:
+                return templates, _encode_page_token(
+                    {"phase": "user", "key": last_evaluated_key}
+                )
+            if not include_public_templates:
+                return templates, None
+            token = {"phase": "public"}
+
+        # Public templates from other users, from the cached catalog
+        public = [t for t in get_public_templates() if t["user"] != current_user]
+        after = token.get("after")
+        if after:
+            public = [t for t in public if t["templateId"] > after]
+
+        room = limit - len(templates)
+        page = public[:room] if room > 0 else []
+        templates.extend(page)
+        if len(public) > len(page):
+            return templates, _encode_page_token(
+                {"phase": "public", "after": page[-1]["templateId"] if page else after}
+            )
+        return templates, None
 
-        # Start with user's templates
-        all_items = []
-        if 'Items' in user_response and user_response['Items']:
-            all_items.extend(user_response['Items'])
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error("Error listing workflow templates: %s", e)
+        raise RuntimeError(f"Failed to list workflow templates: {e}")
 
-        # Only scan for public templates if flag is True
-        if include_public_templates:
-            # Scan for public templates from other users (exclude current user)
-            public_response = dynamodb.scan(
-                TableName=table_name,
-                FilterExpression="isPublic = :pub AND #user <> :current_user",
-                ExpressionAttributeNames={
-                    "#user": "user"
-                },
-                ExpressionAttributeValues={
-                    ":pub": {"N": "1"},
-                    ":current_user": {"S": current_user}
-                }
-            )
 
-            if 'Items' in public_response and public_response['Items']:
-                all_items.extend(public_response['Items'])
+def list_workflow_templates(current_user, include_public_templates=False):
+    """All of the user's templates, plus other users' public templates if requested."""
+    templates = []
+    next_token = None
+    while True:
+        page, next_token = list_workflow_templates_page(
+            current_user,
+            include_public_templates,
+            limit=1000,
+            next_token=next_token,
+        )
+        templates.extend(page)
+        if not next_token:
+            return templates
 
-        # Check if any items exist
-        if not all_items:
-            return []
 
-        # Deserialize the items into a list of metadata dictionaries
-        deserializer = TypeDeserializer()
-        templates = [
-            {
-                'templateId': deserializer.deserialize(item['templateId']),  # Use camel case
-                'name': deserializer.deserialize(item['name']),
-                'description': deserializer.deserialize(item['description']),
-                'inputSchema': deserializer.deserialize(item['inputSchema']),  # Use camel case
-                'outputSchema': deserializer.deserialize(item['outputSchema']),  # Use camel case
-                'isBaseTemplate': deserializer.deserialize(item['isBaseTemplate']) if 'isBaseTemplate' in item else False,
-                'isPublic': bool(deserializer.deserialize(item['isPublic'])) if 'isPublic' in item else False,
-                'user': deserializer.deserialize(item['user']),  # Include user info to distinguish ownership
-            }
-            for item in all_items
-        ]
+def backfill_public_template_index(event=None, context=None):
+    """
+    Adds the PublicTemplatesIndex key to public templates saved before the
+    index existed. Safe to run repeatedly; invoked manually after deploying.
+    """
+    table_name = os.environ.get("WORKFLOW_TEMPLATES_TABLE")
+    if not table_name:
+        raise ValueError("Environment variable 'WORKFLOW_TEMPLATES_TABLE' must be set.")
 
-        return templates
+    dynamodb = boto3.client("dynamodb")
+    updated = 0
+    paginator = dynamodb.get_paginator("scan")
+    for page in paginator.paginate(
+        TableName=table_name,
+        ProjectionExpression="#user, templateId",
+        FilterExpression="isPublic = :pub AND attribute_not_exists(publicCatalog)",
+        ExpressionAttributeNames={"#user": "user"},
+        ExpressionAttributeValues={":pub": {"N": "1"}},
+    ):
+        for item in page.get("Items", []):
+            try:
+                dynamodb.update_item(
+                    TableName=table_name,
+                    Key={"user": item["user"], "templateId": item["templateId"]},
+                    UpdateExpression="SET publicCatalog = :catalog",
+                    ConditionExpression="isPublic = :pub",
+                    ExpressionAttributeValues={
+                        ":catalog": {"S": PUBLIC_CATALOG_KEY},
+                        ":pub": {"N": "1"},
+                    },
+                )
+                updated += 1
+            except dynamodb.exceptions.ConditionalCheckFailedException:
+                continue
 
-    except Exception as e:
-        logger.error("Error listing workflow templates: %s", e)
-        raise RuntimeError(f"Failed to list workflow templates: {e}")
+    logger.info("Added %d public templates to %s", updated, PUBLIC_TEMPLATES_INDEX)
+    invalidate_public_template_cache()
+    return {"updated": updated}
 
 
 def delete_workflow_template(current_user, template_id, access_token):
@@ -421,6 +572,7 @@ def delete_workflow_template(current_user, template_id, access_token):
             TableName=table_name,
             Key={"user": {"S": current_user}, "templateId": {"S": template_id}},
         )
+        invalidate_public_template_cache()
 
         return {
             "success": True,
@@ -526,6 +678,7 @@ def update_workflow_template(
             "inputSchema": serializer.serialize(input_schema),
             "outputSchema": serializer.serialize(output_schema),
             "updatedAt": serializer.serialize(datetime.now().isoformat()),
+            **_public_catalog_attributes(is_public),
         }
         
         # Only include s3Key if it existed in the original record (legacy workflows)
@@ -540,6 +693,7 @@ def update_workflow_template(
 
         # Update the item in DynamoDB
         dynamodb.put_item(TableName=table_name, Item=updated_item)
+        invalidate_public_template_cache()
 
         return {
             "success": True,
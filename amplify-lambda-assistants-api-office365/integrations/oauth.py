@@ -1,7 +1,11 @@
 from datetime import datetime, timezone
 import json
 import os
+import threading
+import time
+import zlib
 import requests
+from requests.adapters import HTTPAdapter
 import boto3
 from .integrationsList import integrations_list
 from pycommon.api.secrets import get_secret_parameter
@@ -29,8 +33,103 @@ class MissingCredentialsError(Exception):
     pass
 
 
+# Decrypted credentials are reused until shortly before the token expires,
+# and never longer than CREDENTIALS_CACHE_MAX_SECONDS
+CREDENTIALS_CACHE_MAX_SECONDS = int(
+    os.environ.get("O365_CREDENTIALS_CACHE_MAX_SECONDS", "900")
+)
+CREDENTIALS_EXPIRY_SKEW_SECONDS = 60
+INTEGRATIONS_CACHE_TTL_SECONDS = int(
+    os.environ.get("O365_INTEGRATIONS_CACHE_TTL_SECONDS", "300")
+)
+CREDENTIALS_CACHE_MAX_ENTRIES = 1024
+GRAPH_POOL_MAXSIZE = int(os.environ.get("O365_GRAPH_POOL_MAXSIZE", "16"))
+
+_credentials_cache = {}
+_integrations_cache = {}
+_cache_lock = threading.Lock()
+# Striped locks so only one caller per user and integration loads or refreshes credentials
+_load_locks = [threading.Lock() for _ in range(64)]
+
+# Connections to Graph are kept open across invocations of the container
+_graph_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GRAPH_POOL_MAXSIZE)
+
+
+def _cache_get(cache, key):
+    with _cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del cache[key]
+            return None
+        return entry[1]
+
+
+def _cache_put(cache, key, value, expires_at):
+    with _cache_lock:
+        if len(cache) >= CREDENTIALS_CACHE_MAX_ENTRIES:
+            now = time.time()
+            for k in [k for k, v in cache.items() if v[0] <= now]:
+                del cache[k]
+            if len(cache) >= CREDENTIALS_CACHE_MAX_ENTRIES:
+                cache.clear()
+        cache[key] = (expires_at, value)
+
+
+def invalidate_user_credentials(current_user, integration):
+    """Forget the cached credentials, e.g. after Graph rejected the token."""
+    with _cache_lock:
+        _credentials_cache.pop((current_user, integration), None)
+
+
+def _get_available_integrations(current_user, access_token):
+    available_integrations = _cache_get(_integrations_cache, current_user)
+    if available_integrations is None:
+        available_integrations = get_user_integrations(access_token)
+        if available_integrations:
+            _cache_put(
+                _integrations_cache,
+                current_user,
+                available_integrations,
+                time.time() + INTEGRATIONS_CACHE_TTL_SECONDS,
+            )
+    return available_integrations
+
+
 def get_user_credentials(
     current_user, integration, access_token, retry_num=0, available_integrations=None
+):
+    """
+    The user's decrypted credentials for the integration. Credentials are
+    cached in the container until shortly before they expire; concurrent
+    callers for the same user and integration wait for a single load or
+    refresh instead of each doing their own.
+    """
+    key = (current_user, integration)
+    credentials = _cache_get(_credentials_cache, key)
+    if credentials is not None:
+        return dict(credentials)
+
+    with _load_locks[zlib.crc32(f"{current_user}/{integration}".encode("utf-8")) % len(_load_locks)]:
+        credentials = _cache_get(_credentials_cache, key)
+        if credentials is not None:
+            return dict(credentials)
+
+        credentials = _load_user_credentials(
+            current_user, integration, access_token, retry_num, available_integrations
+        )
+        expires_at = min(
+            float(credentials["expires_at"]) - CREDENTIALS_EXPIRY_SKEW_SECONDS,
+            time.time() + CREDENTIALS_CACHE_MAX_SECONDS,
+        )
+        if expires_at > time.time():
+            _cache_put(_credentials_cache, key, credentials, expires_at)
+        return dict(credentials)
+
+
+def _load_user_credentials(
+    current_user, integration, access_token, retry_num=0, available_integrations=None
 ):
     if retry_num > MAX_RETRIES:
         raise Exception(
@@ -43,7 +142,7 @@ def get_user_credentials(
         raise ValueError("OAUTH_USER_TABLE environment variable is not set")
 
     if not available_integrations:
-        available_integrations = get_user_integrations(access_token)
+        available_integrations = _get_available_integrations(current_user, access_token)
         if not available_integrations:
             logger.error("Failed to retrieve supported integrations for user %s", current_user)
             raise Exception(
@@ -89,7 +188,7 @@ def get_user_credentials(
                             f"Failed to refresh credentials for user {current_user} and integration {integration}"
                         )
 
-                    return get_user_credentials(
+                    return _load_user_credentials(
                         current_user,
                         integration,
                         access_token,
@@ -123,6 +222,8 @@ def get_ms_graph_session(current_user, integration, access_token):
     """
     Reuse get_user_credentials(...) to fetch a stored Microsoft Graph token
     and return a requests.Session with the correct Authorization header.
+    The session has its own headers but shares the container's pooled Graph
+    connections, so callers skip the TLS handshake on warm containers.
     """
     creds = get_user_credentials(current_user, integration, access_token)
     token = creds.get("token")
@@ -132,9 +233,16 @@ def get_ms_graph_session(current_user, integration, access_token):
         )
 
     session = requests.Session()
+    session.mount("https://", _graph_adapter)
     session.headers.update(
         {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     )
+
+    def drop_rejected_token(response, *args, **kwargs):
+        if response.status_code == 401:
+            invalidate_user_credentials(current_user, integration)
+
+    session.hooks["response"].append(drop_rejected_token)
     return session
 
 @required_env_vars({
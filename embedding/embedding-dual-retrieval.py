@@ -32,6 +32,7 @@ from schemata.permissions import get_permission_checker
 from pycommon.const import APIAccessType
 from pycommon.logger import getLogger
 from pycommon.api.critical_logging import log_critical_error, SEVERITY_HIGH
+from request_timings import timed_execution, stage, current_timings
 import traceback
 
 add_api_access_types([APIAccessType.CHAT.value, APIAccessType.DUAL_EMBEDDING.value])
@@ -189,6 +190,170 @@ class EmbeddingPerformanceCache:
 performance_cache = EmbeddingPerformanceCache()
 
 
+# Retrieval strategy selection for src_id filtered vector search.
+# - exact: scan the matching rows via idx_src and sort (perfect recall). Used for
+#          few matching rows, and for filters too selective for HNSW post-filtering
+# - hnsw:  the filter keeps a large share of the table, walk the HNSW index
+#          (iterative scan on pgvector >= 0.8, widened ef_search otherwise)
+RETRIEVAL_STRATEGY_EXACT = "exact"
+RETRIEVAL_STRATEGY_HNSW = "hnsw"
+
+retrieval_exact_max_rows = int(os.environ.get("RAG_RETRIEVAL_EXACT_MAX_ROWS", "50000"))
+retrieval_hnsw_max_scan_tuples = int(os.environ.get("RAG_RETRIEVAL_HNSW_MAX_SCAN_TUPLES", "20000"))
+# "exact" or "hnsw" skips the selectivity estimate, e.g. to benchmark one strategy
+retrieval_strategy = os.environ.get("RAG_RETRIEVAL_STRATEGY", "auto")
+# A fixed hnsw.ef_search instead of one derived from the selectivity
+retrieval_hnsw_ef_search = int(os.environ.get("RAG_RETRIEVAL_HNSW_EF_SEARCH", "0"))
+HNSW_MAX_EF_SEARCH = 1000  # pgvector upper bound for hnsw.ef_search
+
+SIMILARITY_COLUMNS = "content, src, locations, orig_indexes, char_index, token_count, id"
+
+
+class SourceStatsCache:
+    """
+    Per-container cache of the embeddings table size and the pgvector version,
+    used with the planner's row estimate to judge the selectivity of a src_ids
+    filter.
+    """
+    def __init__(self):
+        self._table_rows: Optional[Tuple[int, float]] = None
+        self._pgvector_version: Optional[Tuple[int, ...]] = None
+        self.table_rows_ttl = 3600
+
+    def get_table_rows(self, cur) -> int:
+        if self._table_rows and time.time() - self._table_rows[1] < self.table_rows_ttl:
+            return self._table_rows[0]
+        cur.execute("SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = 'embeddings'")
+        row = cur.fetchone()
+        table_rows = int(row[0]) if row else 0
+        self._table_rows = (table_rows, time.time())
+        return table_rows
+
+    def get_pgvector_version(self, cur) -> Tuple[int, ...]:
+        if self._pgvector_version is None:
+            cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = cur.fetchone()
+            try:
+                self._pgvector_version = tuple(int(part) for part in row[0].split("."))
+            except (TypeError, ValueError, AttributeError):
+                self._pgvector_version = (0,)
+        return self._pgvector_version
+
+
+source_stats_cache = SourceStatsCache()
+
+
+def estimate_matched_rows(cur, src_ids) -> int:
+    """
+    The planner's estimate of the rows a src_ids filter selects. Only plans the
+    query, so no rows are read; sources embedded since the last ANALYZE are
+    underestimated, which errs towards the exact strategy.
+    """
+    cur.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM embeddings WHERE src = ANY(%s)", (src_ids,))
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _ef_search(expected_scan_tuples):
+    if retrieval_hnsw_ef_search:
+        return str(min(HNSW_MAX_EF_SEARCH, retrieval_hnsw_ef_search))
+    return str(min(HNSW_MAX_EF_SEARCH, max(40, expected_scan_tuples * 2)))
+
+
+def choose_retrieval_strategy(cur, src_ids, limit):
+    """
+    Pick a retrieval strategy from the estimated number of rows the src_ids
+    filter selects.
+
+    Returns (strategy, matched_rows, hnsw_settings).
+    """
+    if retrieval_strategy == RETRIEVAL_STRATEGY_EXACT:
+        return RETRIEVAL_STRATEGY_EXACT, None, {}
+
+    matched_rows = max(1, estimate_matched_rows(cur, src_ids))
+    if retrieval_strategy != RETRIEVAL_STRATEGY_HNSW and matched_rows <= retrieval_exact_max_rows:
+        return RETRIEVAL_STRATEGY_EXACT, matched_rows, {}
+
+    table_rows = max(source_stats_cache.get_table_rows(cur), matched_rows)
+    selectivity = matched_rows / table_rows
+    # Tuples the HNSW walk has to visit on average to collect `limit` matches
+    expected_scan_tuples = math.ceil(limit / selectivity)
+    forced = retrieval_strategy == RETRIEVAL_STRATEGY_HNSW
+
+    if source_stats_cache.get_pgvector_version(cur) >= (0, 8):
+        if forced or expected_scan_tuples <= retrieval_hnsw_max_scan_tuples:
+            settings = {
+                "hnsw.iterative_scan": "relaxed_order",
+                "hnsw.max_scan_tuples": str(retrieval_hnsw_max_scan_tuples),
+            }
+            if retrieval_hnsw_ef_search:
+                settings["hnsw.ef_search"] = _ef_search(expected_scan_tuples)
+            return RETRIEVAL_STRATEGY_HNSW, matched_rows, settings
+    elif forced or expected_scan_tuples <= HNSW_MAX_EF_SEARCH:
+        return RETRIEVAL_STRATEGY_HNSW, matched_rows, {
+            "hnsw.ef_search": _ef_search(expected_scan_tuples),
+        }
+
+    # Too selective for HNSW to find `limit` matches; scanning the matched rows
+    # is as costly as any exact plan without a per-source index
+    return RETRIEVAL_STRATEGY_EXACT, matched_rows, {}
+
+
+def _exact_similarity_query(column):
+    return f"""
+        SELECT {SIMILARITY_COLUMNS}, (({column} <#> %s::vector) * -1) AS distance
+        FROM embeddings
+        WHERE src = ANY(%s)
+        ORDER BY distance DESC
+        LIMIT %s
+    """
+
+
+def _hnsw_similarity_query(column):
+    # ORDER BY the bare operator so the planner can walk the HNSW index; the
+    # materialized CTE restores strict ordering after a relaxed iterative scan
+    return f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT {SIMILARITY_COLUMNS}, (({column} <#> %s::vector) * -1) AS distance
+            FROM embeddings
+            WHERE src = ANY(%s)
+            ORDER BY {column} <#> %s::vector
+            LIMIT %s
+        )
+        SELECT * FROM candidates ORDER BY distance DESC
+    """
+
+
+def search_similar_embeddings(cur, column, query_embedding, src_ids, limit):
+    """
+    Top `limit` rows by inner product on `column` restricted to `src_ids`,
+    using the cheapest strategy for the selectivity of the filter.
+
+    Returns (rows, strategy). Rows keep the (content, src, locations,
+    orig_indexes, char_index, token_count, id, distance) shape.
+    """
+    src_ids = [str(src_id) for src_id in (src_ids or [])]
+    if not src_ids:
+        return [], RETRIEVAL_STRATEGY_EXACT
+
+    embedding_literal = "[" + ",".join(map(str, query_embedding)) + "]"
+    strategy, matched_rows, hnsw_settings = choose_retrieval_strategy(cur, src_ids, limit)
+    logger.info(
+        f"Retrieval strategy {strategy} for {len(src_ids)} sources / ~{matched_rows} rows on {column}"
+    )
+
+    if strategy == RETRIEVAL_STRATEGY_HNSW:
+        for setting, value in hnsw_settings.items():
+            cur.execute("SELECT set_config(%s, %s, true)", (setting, value))
+        cur.execute(_hnsw_similarity_query(column), (embedding_literal, src_ids, embedding_literal, limit))
+        return cur.fetchall(), strategy
+
+    cur.execute(_exact_similarity_query(column), (embedding_literal, src_ids, limit))
+    return cur.fetchall(), strategy
+
+
 def get_top_similar_qas(query_embedding, src_ids, limit=5):
     # DEFENSIVE: Validate query_embedding for NaN values before PostgreSQL query
     if not query_embedding or any(math.isnan(x) if isinstance(x, (int, float)) else False for x in query_embedding):
@@ -223,35 +388,14 @@ def get_top_similar_qas(query_embedding, src_ids, limit=5):
                 query_embedding, list
             ), "Expected query_embedding to be a list of floats"
 
-            # Convert the query_embedding list to a PostgreSQL array literal
-            embedding_literal = "[" + ",".join(map(str, query_embedding)) + "]"
-
-            # Prepare SQL query and parameters based on whether src_ids are provided
-            query_params = [embedding_literal, limit]  # query_embedding is already a list of floats
-            src_ids_array = "{}"
-            if src_ids:
-                # Convert src_ids list to a format suitable for the ANY clause in PostgreSQL
-                src_ids_array = "{" + ",".join(map(str, src_ids)) + "}"
-
-
-            query_params.insert(
-                1, src_ids_array
-            )  # Append the limit to the query parameters
-            # Append the limit to the query parameters
-
-            # Create SQL query string with a placeholder for the optional src_clause and a limit
-            sql_query = f"""
-                SELECT content, src, locations, orig_indexes, char_index, token_count, id, ((qa_vector_embedding <#> %s::vector) * -1) AS distance
-                FROM embeddings
-                WHERE src = ANY(%s)  -- Use the ARRAY constructor for src_ids
-                ORDER BY distance DESC  -- Order by distance for ordering
-                LIMIT %s  -- Use a placeholder for the limit
-            """
-            logger.info(f"Executing QA SQL query: {sql_query}")
-            logger.info(f"Query params - src_ids_array: {src_ids_array}, limit: {limit}")
+            logger.info(f"Executing QA similarity search - src_ids: {len(src_ids or [])}, limit: {limit}")
             try:
-                cur.execute(sql_query, query_params)
-                top_docs = cur.fetchall()
+                with stage("vector_query_qas", src_ids_count=len(src_ids or [])) as counters:
+                    top_docs, strategy = search_similar_embeddings(
+                        cur, "qa_vector_embedding", query_embedding, src_ids, limit
+                    )
+                    counters["rows_count"] = len(top_docs)
+                    counters["strategy"] = strategy
                 logger.info(f"Top QA docs retrieved: {top_docs}")
             except Exception as e:
                 logger.error(
@@ -312,32 +456,14 @@ def get_top_similar_docs(query_embedding, src_ids, limit=5):
             assert isinstance(
                 query_embedding, list
             ), "Expected query_embedding to be a list of floats"
-            src_ids_array = "{}"
-            if src_ids:
-                # Convert src_ids list to a format suitable for the ANY clause in PostgreSQL
-                src_ids_array = "{" + ",".join(map(str, src_ids)) + "}"
-
-            # Prepare the query parameters
-            # Note: query_embedding is passed directly as a list of floats
-            query_params = [
-                query_embedding,
-                src_ids_array,
-                limit,
-            ]  # src_ids should be a tuple for psycopg2 to convert it to an array
-
-            # Create SQL query string with placeholders for parameters
-            sql_query = """
-                SELECT content, src, locations, orig_indexes, char_index, token_count, id, ((vector_embedding <#> %s::vector) * -1) AS distance
-                FROM embeddings
-                WHERE src = ANY(%s)  -- Use the ARRAY constructor for src_ids
-                ORDER BY distance DESC  -- Order by distance for ordering
-                LIMIT %s  -- Use a placeholder for the limit
-            """
-            logger.info(f"Executing Top Similar SQL query: {sql_query}")
-            logger.info(f"Query params - src_ids_array: {src_ids_array}, limit: {limit}")
+            logger.info(f"Executing Top Similar search - src_ids: {len(src_ids or [])}, limit: {limit}")
             try:
-                cur.execute(sql_query, query_params)
-                top_docs = cur.fetchall()
+                with stage("vector_query_docs", src_ids_count=len(src_ids or [])) as counters:
+                    top_docs, strategy = search_similar_embeddings(
+                        cur, "vector_embedding", query_embedding, src_ids, limit
+                    )
+                    counters["rows_count"] = len(top_docs)
+                    counters["strategy"] = strategy
                 logger.info(f"Top similar docs retrieved: {top_docs}")
             except Exception as e:
                 logger.error(f"An error occurred while fetching top similar docs: {e}", exc_info=True)
@@ -863,14 +989,16 @@ async def retrieve_from_all_bedrock_kbs(bedrock_kb_ids, query_text, limit=10):
     Returns:
         list: Combined results from all KBs.
     """
-    tasks = [
-        asyncio.to_thread(retrieve_from_bedrock_kb, kb_id, query_text, limit)
-        for kb_id in bedrock_kb_ids
-    ]
-    results_per_kb = await asyncio.gather(*tasks)
-    combined = []
-    for results in results_per_kb:
-        combined.extend(results)
+    with stage("bedrock_kb", kb_count=len(bedrock_kb_ids)) as counters:
+        tasks = [
+            asyncio.to_thread(retrieve_from_bedrock_kb, kb_id, query_text, limit)
+            for kb_id in bedrock_kb_ids
+        ]
+        results_per_kb = await asyncio.gather(*tasks)
+        combined = []
+        for results in results_per_kb:
+            combined.extend(results)
+        counters["rows_count"] = len(combined)
     return combined
 
 
@@ -967,11 +1095,18 @@ async def retrieve_from_all_bedrock_kbs(bedrock_kb_ids, query_text, limit=10):
     "APP_ARN_NAME": [SecretsManagerOperation.GET_SECRET_VALUE],
 })
 @validated("dual-retrieval")
+@timed_execution(operation_name="dual_retrieval")
 def process_input_with_dual_retrieval(event, context, current_user, name, data):
     """
     Synchronous wrapper for the async dual retrieval implementation.
+    Set "includeTimings" in the request data to get the per-stage timing
+    breakdown back in the response.
     """
-    return asyncio.run(_async_process_input_with_dual_retrieval(event, context, current_user, name, data))
+    response = asyncio.run(_async_process_input_with_dual_retrieval(event, context, current_user, name, data))
+    timings = current_timings()
+    if timings and data["data"].get("includeTimings") and isinstance(response, dict):
+        response["timings"] = timings.as_dict()
+    return response
 
 
 async def _async_process_input_with_dual_retrieval(event, context, current_user, name, data):
@@ -1020,7 +1155,8 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
         tasks.append(('ast', asyncio.to_thread(classify_ast_src_ids_by_access, raw_ast_src_ids, current_user, token)))
     
     if tasks:
-        task_results = await asyncio.gather(*[task for _, task in tasks])
+        with stage("permission_classification", checks_count=len(tasks)):
+            task_results = await asyncio.gather(*[task for _, task in tasks])
         for i, (task_type, _) in enumerate(tasks):
             results_map[task_type] = task_results[i]
     
@@ -1134,6 +1270,7 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
     
     logger.info(f"Starting embedding completion check for {len(accessible_src_ids)} individual accessible data sources (filtered {len(pre_failed_documents)} pre-failed): {accessible_src_ids[:5]}..." if len(accessible_src_ids) > 5 else accessible_src_ids)
     
+    polling_start = time.perf_counter()
     while not is_complete and iteration_count < max_iterations:
         iteration_count += 1
         logger.info(f"Polling iteration {iteration_count}: Waiting for embedding completion...")
@@ -1200,6 +1337,16 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
                 logger.warning(f"Continuing with completed embeddings, {len(pending_ids)} may be incomplete")
                 break
 
+    timings = current_timings()
+    if timings:
+        timings.record(
+            "readiness_polling",
+            (time.perf_counter() - polling_start) * 1000,
+            iterations_count=iteration_count,
+            pending_count=len(pending_ids),
+            failed_count=len(failed_documents),
+        )
+
     # CRITICAL: Verify we still have sources after polling loop
     if not src_ids:
         # If Bedrock KB sources exist, fall back to KB-only retrieval
@@ -1251,7 +1398,8 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
     if len(content) < original_length:
         logger.warning(f"[TOKEN_SAFETY] User input truncated from {original_length} to {len(content)} chars to fit embedding token limit")
 
-    response_embeddings = generate_embeddings(content)
+    with stage("query_embedding"):
+        response_embeddings = generate_embeddings(content)
 
     # NaN RETRY: If embedding generation fails due to NaN, try with sanitized text
     if not response_embeddings["success"]:
@@ -1265,7 +1413,8 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
 
             if sanitized_content and len(sanitized_content.strip()) > 0:
                 logger.info(f"[NaN_RETRY] Retrying with ASCII-only text (original: {len(content)} chars, sanitized: {len(sanitized_content)} chars)")
-                response_embeddings = generate_embeddings(sanitized_content)
+                with stage("query_embedding"):
+                    response_embeddings = generate_embeddings(sanitized_content)
 
                 if response_embeddings["success"]:
                     logger.info(f"[NaN_RETRY] ✅ Retry succeeded with sanitized text")
@@ -1325,7 +1474,7 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
     # DIAGNOSTIC: Check what src values exist in the database for these IDs
     logger.info(f"[DIAGNOSTIC] Checking database for src values matching: {src_ids}")
     try:
-        with psycopg2.connect(
+        with stage("src_diagnostic_check"), psycopg2.connect(
             host=pg_host,
             database=pg_database,
             user=pg_user,
@@ -1368,6 +1517,8 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
     related_qas = retrieval_results[1]
     bedrock_kb_results = retrieval_results[2] if bedrock_kb_ids else []
 
+    response_assembly_start = time.perf_counter()
+
     # Combine results
     related_docs.extend(related_qas)
     related_docs.extend(bedrock_kb_results)
@@ -1380,7 +1531,8 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
         logger.warning(f"Source IDs queried: {src_ids}")
 
         # Check embedding status to distinguish between "no embeddings" vs "no matches"
-        embedding_status_check = await check_embedding_completion(src_ids, account_data, None, 0)
+        with stage("empty_result_status_check", src_ids_count=len(src_ids)):
+            embedding_status_check = await check_embedding_completion(src_ids, account_data, None, 0)
         documents_missing_embeddings = embedding_status_check.get("requires_embedding", [])
         documents_failed_embeddings = embedding_status_check.get("failed_documents", [])
 
@@ -1435,7 +1587,15 @@ async def _async_process_input_with_dual_retrieval(event, context, current_user,
         logger.info(f"Returning results from {len(src_ids)} successful documents, {len(failed_documents)} failed")
     else:
         logger.info(f"All {len(src_ids)} documents processed successfully")
-    
+
+    timings = current_timings()
+    if timings:
+        timings.record(
+            "response_assembly",
+            (time.perf_counter() - response_assembly_start) * 1000,
+            rows_count=len(related_docs),
+        )
+
     return response
 
 
@@ -0,0 +1,149 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from pycommon.decorators import track_execution
+from pycommon.logger import getLogger
+
+logger = getLogger("request_timings")
+
+METRICS_NAMESPACE = os.environ.get("REQUEST_TIMINGS_METRICS_NAMESPACE", "Amplify/Embedding")
+
+_current_timings: contextvars.ContextVar[Optional["RequestTimings"]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+class RequestTimings:
+    """
+    Per-request stage timer. Each named stage accumulates its total duration,
+    the number of times it ran and any counters recorded alongside it (rows
+    returned, ids checked, iterations...).
+
+    The active instance is held in a context variable, so stages timed inside
+    asyncio tasks or asyncio.to_thread workers land on the same request.
+    """
+
+    def __init__(self, operation_name: str):
+        self.operation_name = operation_name
+        self._stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._end = None
+
+    def record(self, stage: str, duration_ms: float, **counters):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"duration_ms": 0.0, "calls": 0})
+            entry["duration_ms"] += duration_ms
+            entry["calls"] += 1
+            for key, value in counters.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    entry[key] = entry.get(key, 0) + value
+                else:
+                    entry[key] = value
+
+    @contextmanager
+    def span(self, stage: str, **counters):
+        """Time a block; the yielded dict can be filled with counters known only at the end."""
+        start = time.perf_counter()
+        extra = dict(counters)
+        try:
+            yield extra
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000, **extra)
+
+    def finish(self):
+        self._end = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return (end - self._start) * 1000
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            stages = {
+                name: {**entry, "duration_ms": round(entry["duration_ms"], 2)}
+                for name, entry in self._stages.items()
+            }
+        return {"total_ms": round(self.total_ms, 2), "stages": stages}
+
+    def emit_metrics(self):
+        """Write the stage durations as a CloudWatch Embedded Metric Format log line."""
+        timings = self.as_dict()
+        metrics = {"total_ms": timings["total_ms"]}
+        for name, entry in timings["stages"].items():
+            metrics[f"{name}_ms"] = entry["duration_ms"]
+            for key, value in entry.items():
+                if key.endswith("_count") and isinstance(value, (int, float)):
+                    metrics[f"{name}_{key}"] = value
+
+        payload = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [["Operation"]],
+                        "Metrics": [
+                            {"Name": name, "Unit": "Milliseconds" if name.endswith("_ms") else "Count"}
+                            for name in metrics
+                        ],
+                    }
+                ],
+            },
+            "Operation": self.operation_name,
+            **metrics,
+        }
+        # EMF lines must be bare JSON on stdout, not wrapped by the log formatter
+        print(json.dumps(payload), flush=True)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def stage(name: str, **counters):
+    """
+    Time a stage of the current request. Yields a dict for counters; a no-op
+    timer when no request is being timed (e.g. when called from a benchmark).
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield dict(counters)
+        return
+    with timings.span(name, **counters) as extra:
+        yield extra
+
+
+def timed_execution(operation_name: str, account: str = "system"):
+    """
+    track_execution plus a per-request RequestTimings. Stage timings are
+    emitted as metrics when the handler returns and are available to the
+    handler through current_timings().
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = RequestTimings(operation_name)
+            token = _current_timings.set(timings)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.finish()
+                _current_timings.reset(token)
+                try:
+                    timings.emit_metrics()
+                except Exception as e:
+                    logger.warning("Failed to emit timing metrics for %s: %s", operation_name, e)
+
+        return track_execution(operation_name=operation_name, account=account)(wrapper)
+
+    return decorator
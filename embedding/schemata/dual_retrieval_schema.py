@@ -23,6 +23,10 @@ dual_retrieval_schema = {
             "type": "integer",
             "description": "The maximum number of documents to return.",
         },
+        "includeTimings": {
+            "type": "boolean",
+            "description": "Include a per-stage latency breakdown in the response.",
+        },
     },
     "required": ["dataSources", "userInput"],
 }
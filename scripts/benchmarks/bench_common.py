@@ -0,0 +1,232 @@
+"""
+Shared helpers for the local benchmark harnesses in this directory.
+
+The Lambda services in this repo are written to be deployed as independent
+serverless projects, so several of them ship top-level packages with the same
+name (``rag``, ``schemata``, ``tools_ops`` ...). ``service_context`` lets a
+single benchmark process drive more than one service by swapping the
+service's directory onto ``sys.path`` and keeping each service's imported
+modules in its own cache.
+"""
+
+import importlib.util
+import json
+import math
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def log(*messages):
+    for message in messages:
+        print(f"[{datetime.now()}]", message)
+
+
+def service_dir(name: str) -> str:
+    """Absolute path of a service directory at the repository root."""
+    return os.path.join(REPO_ROOT, name)
+
+
+def _local_module_names(directory: str) -> set:
+    """Top-level module and package names importable from a service directory."""
+    names = set()
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isdir(path) and not entry.startswith("."):
+            if any(f.endswith(".py") for f in os.listdir(path)):
+                names.add(entry)
+    return names
+
+
+_service_modules: Dict[str, dict] = {}
+_service_names: set = set()
+
+
+def _is_service_module(name: str) -> bool:
+    return name.split(".")[0] in _service_names
+
+
+@contextmanager
+def service_context(directory: str):
+    """
+    Make ``directory`` the active service for imports inside the block.
+
+    Modules imported from a service are cached per service and restored on
+    re-entry, so functions that import lazily at call time keep resolving
+    against their own service.
+    """
+    _service_names.update(_local_module_names(directory))
+
+    outside = {n: m for n, m in sys.modules.items() if _is_service_module(n)}
+    for name in outside:
+        del sys.modules[name]
+    sys.modules.update(_service_modules.get(directory, {}))
+    sys.path.insert(0, directory)
+    try:
+        yield
+    finally:
+        sys.path.remove(directory)
+        loaded = {n: m for n, m in sys.modules.items() if _is_service_module(n)}
+        _service_modules[directory] = loaded
+        for name in loaded:
+            del sys.modules[name]
+        sys.modules.update(outside)
+
+
+def load_module_from_path(module_name: str, path: str):
+    """Import a module from a file whose name is not a valid identifier (e.g. ``embedding-dual-retrieval.py``)."""
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``pct`` in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(samples: List[float]) -> dict:
+    """p50/p95/p99/max of a list of durations in seconds, reported in milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+        "total_s": round(sum(samples), 3),
+    }
+
+
+class StageTimer:
+    """Collects per-call durations for a named pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.peak_rss = 0
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - start)
+            self.peak_rss = peak_rss_bytes()
+
+    def summary(self) -> dict:
+        return {**latency_summary(self.samples), "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1)}
+
+
+def add_postgres_args(parser):
+    parser.add_argument("--pg-host", default=os.environ.get("PGHOST", "localhost"))
+    parser.add_argument("--pg-port", type=int, default=int(os.environ.get("PGPORT", "5432")))
+    parser.add_argument("--pg-user", default=os.environ.get("PGUSER", "postgres"))
+    parser.add_argument("--pg-password", default=os.environ.get("PGPASSWORD", "postgres"))
+    parser.add_argument("--pg-database", default=os.environ.get("PGDATABASE", "rag_benchmark"))
+    parser.add_argument(
+        "--allow-destroy",
+        action="store_true",
+        help="Allow wiping the embeddings table on a non-local host or when it already has rows",
+    )
+
+
+LOCAL_PG_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+def ensure_disposable_database(args):
+    """
+    Exit unless the benchmark database is safe to wipe: a local host whose
+    embeddings table is missing or empty. --allow-destroy skips the check.
+    """
+    if args.allow_destroy:
+        return
+
+    # A leading slash is a Unix socket directory, which is always local
+    if args.pg_host not in LOCAL_PG_HOSTS and not args.pg_host.startswith("/"):
+        raise SystemExit(
+            f"Refusing to wipe the embeddings table on non-local host {args.pg_host!r}; "
+            "pass --allow-destroy if this database is disposable"
+        )
+
+    import psycopg2
+
+    connection = psycopg2.connect(
+        host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('embeddings') IS NOT NULL;")
+            has_rows = False
+            if cursor.fetchone()[0]:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM embeddings);")
+                has_rows = cursor.fetchone()[0]
+    finally:
+        connection.close()
+    if has_rows:
+        raise SystemExit(
+            f"Refusing to wipe the embeddings table in {args.pg_database!r}, it already has rows; "
+            "pass --allow-destroy if they are disposable"
+        )
+
+
+def postgres_env(args) -> Dict[str, str]:
+    """Environment variables the RAG services read their Postgres settings from."""
+    return {
+        "RAG_POSTGRES_DB_WRITE_ENDPOINT": args.pg_host,
+        "RAG_POSTGRES_DB_READ_ENDPOINT": args.pg_host,
+        "RAG_POSTGRES_DB_PORT": str(args.pg_port),
+        "RAG_POSTGRES_DB_USERNAME": args.pg_user,
+        "RAG_POSTGRES_DB_NAME": args.pg_database,
+        # get_credentials is stubbed to return the password for this secret name
+        "RAG_POSTGRES_DB_SECRET": "benchmark-rag-postgres-secret",
+    }
+
+
+def write_report(report: dict, output_path: Optional[str]):
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+        log(f"Report written to {output_path}")
+
+
+def check_regressions(current: Dict[str, float], baseline_path: str, max_regression_pct: float) -> List[str]:
+    """
+    Compare throughput metrics (higher is better) against a previous report.
+
+    Returns a list of human readable regressions; an empty list means the run
+    is within ``max_regression_pct`` of the baseline for every shared metric.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f).get("throughput", {})
+
+    regressions = []
+    for metric, value in current.items():
+        previous = baseline.get(metric)
+        if not previous:
+            continue
+        change_pct = (value - previous) / previous * 100
+        if change_pct < -max_regression_pct:
+            regressions.append(f"{metric}: {previous:.3f} -> {value:.3f} ({change_pct:.1f}%)")
+    return regressions
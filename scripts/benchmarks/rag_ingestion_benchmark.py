@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Local throughput benchmark for the RAG ingestion pipeline.
+
+Runs every document in a corpus directory through the same handlers that run
+in production:
+
+    amplify-lambda   rag/core.process_document_for_rag   (text extraction)
+    amplify-lambda   rag/core.chunk_document_for_rag     (chunking)
+    embedding        embedding.lambda_handler            (embedding + pgvector insert)
+
+S3, SQS, DynamoDB and SSM are served by moto, embeddings and LLM calls by a
+fake provider with configurable latency, and vectors are written to a real
+local Postgres with pgvector, e.g.:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres \\
+        -e POSTGRES_DB=rag_benchmark pgvector/pgvector:pg16
+
+Usage:
+    python rag_ingestion_benchmark.py --corpus ./corpus
+    python rag_ingestion_benchmark.py --corpus ./corpus --embedding-latency-ms 80 --chat-latency-ms 600
+    python rag_ingestion_benchmark.py --corpus ./corpus --output run.json --baseline main.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from unittest import mock
+
+from bench_common import (
+    StageTimer,
+    add_postgres_args,
+    check_regressions,
+    ensure_disposable_database,
+    log,
+    peak_rss_bytes,
+    postgres_env,
+    service_context,
+    service_dir,
+    write_report,
+)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".pptx", ".xlsx", ".csv", ".txt", ".md"}
+
+BENCHMARK_USER = "benchmark-user"
+EMBEDDING_MODEL_ID = "benchmark-embedding"
+QA_MODEL_ID = "benchmark-qa"
+
+# Table name -> (hash key, range key)
+TABLES = {
+    "FILES_DYNAMO_TABLE": ("id", None),
+    "HASH_FILES_DYNAMO_TABLE": ("id", None),
+    "EMBEDDING_PROGRESS_TABLE": ("object_id", None),
+    "OBJECT_ACCESS_DYNAMODB_TABLE": ("object_id", "principal_id"),
+    "ADDITIONAL_CHARGES_TABLE": ("id", None),
+    "AMPLIFY_ADMIN_DYNAMODB_TABLE": ("config_id", None),
+    "MODEL_RATE_TABLE": ("ModelID", None),
+}
+
+BUCKETS = [
+    "S3_RAG_INPUT_BUCKET_NAME",
+    "S3_FILE_TEXT_BUCKET_NAME",
+    "S3_RAG_CHUNKS_BUCKET_NAME",
+    "S3_IMAGE_INPUT_BUCKET_NAME",
+]
+
+QUEUES = [
+    "RAG_CHUNK_DOCUMENT_QUEUE_URL",
+    "EMBEDDING_CHUNKS_INDEX_QUEUE",
+    "CRITICAL_ERRORS_SQS_QUEUE_NAME",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark process_document_for_rag -> chunk_document_for_rag -> embedding.lambda_handler locally."
+    )
+    parser.add_argument("--corpus", required=True, help="Directory of PDF/DOCX/PPTX/XLSX (and text) files")
+    parser.add_argument("--limit", type=int, help="Only ingest the first N documents")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0, help="Fake embedding call latency")
+    parser.add_argument("--chat-latency-ms", type=float, default=400.0, help="Fake QA / visual transcription latency")
+    parser.add_argument("--latency-jitter", type=float, default=0.2, help="Uniform +/- jitter as a fraction of latency")
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--keep-table", action="store_true", help="Do not drop the embeddings table before the run")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous JSON report to compare throughput against")
+    parser.add_argument("--max-regression-pct", type=float, default=10.0)
+    add_postgres_args(parser)
+    return parser.parse_args()
+
+
+class FakeProvider:
+    """Stand-in for the embedding and chat providers with configurable latency."""
+
+    def __init__(self, dim, embedding_latency_ms, chat_latency_ms, jitter):
+        self.dim = dim
+        self.embedding_latency = embedding_latency_ms / 1000.0
+        self.chat_latency = chat_latency_ms / 1000.0
+        self.jitter = jitter
+        self.calls = {"embedding": 0, "questions": 0, "visual": 0}
+        self._lock = threading.Lock()
+
+    def _delay(self, base):
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        values = [rng.gauss(0, 1) for _ in range(self.dim)]
+        norm = sum(v * v for v in values) ** 0.5 or 1.0
+        return [v / norm for v in values]
+
+    def generate_embeddings(self, content, account_data=None, document_key=None):
+        self._count("embedding")
+        time.sleep(self._delay(self.embedding_latency))
+        return {"success": True, "data": self.vector(content), "token_count": max(1, len(content) // 4)}
+
+    def generate_questions(self, content, account_data=None):
+        self._count("questions")
+        time.sleep(self._delay(self.chat_latency))
+        return {"success": True, "data": f"What does this passage say about {content[:60]!r}?"}
+
+    async def transcribe_visual_content(self, key, visual_type="image/png", account_data=None):
+        self._count("visual")
+        await asyncio.sleep(self._delay(self.chat_latency))
+        return f"Transcription of {visual_type} visual {key}"
+
+
+def configure_environment(args):
+    os.environ.update(
+        {
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "testing",
+            "AWS_SECRET_ACCESS_KEY": "testing",
+            "REGION": "us-east-1",
+            "STAGE": "benchmark",
+            "API_VERSION": "2024-02-01",
+            "LLM_ENDPOINTS_SECRETS_NAME_ARN": "benchmark-llm-endpoints",
+            "EMBEDDING_DIM": str(args.embedding_dim),
+        }
+    )
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.update(postgres_env(args))
+    for name in TABLES:
+        os.environ[name] = f"benchmark-{name.lower().replace('_', '-')}"
+    for name in BUCKETS:
+        os.environ[name] = f"benchmark-{name.lower().replace('_', '-')}"
+
+
+def create_stand_ins():
+    import boto3
+
+    dynamodb = boto3.client("dynamodb")
+    for env_name, (hash_key, range_key) in TABLES.items():
+        keys = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+        attributes = [{"AttributeName": hash_key, "AttributeType": "S"}]
+        if range_key:
+            keys.append({"AttributeName": range_key, "KeyType": "RANGE"})
+            attributes.append({"AttributeName": range_key, "AttributeType": "S"})
+        dynamodb.create_table(
+            TableName=os.environ[env_name],
+            KeySchema=keys,
+            AttributeDefinitions=attributes,
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+    s3 = boto3.client("s3")
+    for env_name in BUCKETS:
+        s3.create_bucket(Bucket=os.environ[env_name])
+
+    sqs = boto3.client("sqs")
+    for env_name in QUEUES:
+        queue_name = f"benchmark-{env_name.lower().replace('_', '-')}"
+        queue_url = sqs.create_queue(QueueName=queue_name)["QueueUrl"]
+        os.environ[env_name] = queue_name if env_name.endswith("_NAME") else queue_url
+
+    # Default models are resolved by embedding_models.get_embedding_models at import time
+    resource = boto3.resource("dynamodb")
+    resource.Table(os.environ["AMPLIFY_ADMIN_DYNAMODB_TABLE"]).put_item(
+        Item={"config_id": "defaultModels", "data": {"embeddings": EMBEDDING_MODEL_ID, "cheapest": QA_MODEL_ID}}
+    )
+    rates = resource.Table(os.environ["MODEL_RATE_TABLE"])
+    for model_id in (EMBEDDING_MODEL_ID, QA_MODEL_ID):
+        rates.put_item(Item={"ModelID": model_id, "Provider": "OpenAI", "InputContextWindow": 8192})
+
+
+def reset_embeddings_table(args):
+    import psycopg2
+
+    connection = psycopg2.connect(
+        host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database
+    )
+    with connection, connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS embeddings CASCADE;")
+    connection.close()
+
+
+def count_embedding_rows(args):
+    import psycopg2
+
+    connection = psycopg2.connect(
+        host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM embeddings;")
+        count = cursor.fetchone()[0]
+    connection.close()
+    return count
+
+
+def collect_corpus(corpus_dir, limit=None):
+    files = []
+    for root, _, names in os.walk(corpus_dir):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                files.append(os.path.join(root, name))
+    files.sort()
+    return files[:limit] if limit else files
+
+
+def upload_document(path):
+    """Upload a corpus file the way the file upload API does and return its S3 key."""
+    import boto3
+
+    name = os.path.basename(path)
+    mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    key = f"{BENCHMARK_USER}/{time.strftime('%Y-%m-%d')}/{uuid.uuid4()}.json"
+
+    with open(path, "rb") as f:
+        boto3.client("s3").put_object(
+            Bucket=os.environ["S3_RAG_INPUT_BUCKET_NAME"], Key=key, Body=f.read(), Metadata={"rag_enabled": "true"}
+        )
+    boto3.resource("dynamodb").Table(os.environ["FILES_DYNAMO_TABLE"]).put_item(
+        Item={"id": key, "name": name, "type": mime_type, "tags": [], "data": {}, "knowledgeBase": "default"}
+    )
+    return key
+
+
+def s3_event_record(bucket, key):
+    return {"s3": {"bucket": {"name": bucket}, "object": {"key": key}}}
+
+
+def drain_queue(queue_url):
+    """Receive every message currently in a queue as Lambda SQS event records."""
+    import boto3
+
+    sqs = boto3.client("sqs")
+    records = []
+    while True:
+        response = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0)
+        messages = response.get("Messages", [])
+        if not messages:
+            return records
+        for message in messages:
+            records.append(
+                {
+                    "messageId": message["MessageId"],
+                    "receiptHandle": message["ReceiptHandle"],
+                    "body": message["Body"],
+                }
+            )
+
+
+def publish_chunk_notifications():
+    """Emulate the chunks bucket -> embedding queue S3 notification."""
+    import boto3
+
+    s3 = boto3.client("s3")
+    sqs = boto3.client("sqs")
+    bucket = os.environ["S3_RAG_CHUNKS_BUCKET_NAME"]
+    published = 0
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            sqs.send_message(
+                QueueUrl=os.environ["EMBEDDING_CHUNKS_INDEX_QUEUE"],
+                MessageBody=json.dumps({"Records": [s3_event_record(bucket, obj["Key"])]}),
+            )
+            published += 1
+    return published
+
+
+def fake_rag_secrets(ds_key):
+    return {
+        "success": True,
+        "data": {"user": BENCHMARK_USER, "account": "benchmark", "rate_limit": None, "access_token": "amp-benchmark"},
+    }
+
+
+class LambdaContext:
+    def __init__(self):
+        self.aws_request_id = str(uuid.uuid4())
+
+
+def run_benchmark(args, provider):
+    amplify_lambda = service_dir("amplify-lambda")
+    embedding_service = service_dir("embedding")
+    documents = collect_corpus(args.corpus, args.limit)
+    if not documents:
+        raise SystemExit(f"No supported documents found in {args.corpus}")
+    log(f"Ingesting {len(documents)} documents from {args.corpus}")
+
+    extract_timer = StageTimer("process_document_for_rag")
+    chunk_timer = StageTimer("chunk_document_for_rag")
+    embed_timer = StageTimer("embedding.lambda_handler")
+
+    with service_context(amplify_lambda):
+        from rag import core as rag_core
+        from rag.handlers import visual_to_text
+
+        with mock.patch.object(rag_core, "get_rag_secrets_for_document", fake_rag_secrets), \
+                mock.patch.object(visual_to_text, "get_default_models", lambda token: {"cheapest_model": QA_MODEL_ID}), \
+                mock.patch.object(visual_to_text, "transcribe_visual_content", provider.transcribe_visual_content):
+            keys = [upload_document(path) for path in documents]
+            bucket = os.environ["S3_RAG_INPUT_BUCKET_NAME"]
+
+            start = time.perf_counter()
+            for key in keys:
+                event = {"Records": [{"body": json.dumps(s3_event_record(bucket, key))}]}
+                with extract_timer.measure():
+                    rag_core.process_document_for_rag(event, LambdaContext())
+            extract_elapsed = time.perf_counter() - start
+
+            chunk_records = drain_queue(os.environ["RAG_CHUNK_DOCUMENT_QUEUE_URL"])
+            start = time.perf_counter()
+            for record in chunk_records:
+                with chunk_timer.measure():
+                    rag_core.chunk_document_for_rag({"Records": [record]}, LambdaContext())
+            chunk_elapsed = time.perf_counter() - start
+
+    chunk_files = publish_chunk_notifications()
+    log(f"Extracted {len(chunk_records)} documents into {chunk_files} chunk files")
+
+    with service_context(embedding_service):
+        import embedding
+
+        with mock.patch.object(embedding, "get_rag_secrets_for_document", fake_rag_secrets), \
+                mock.patch.object(embedding, "generate_embeddings", provider.generate_embeddings), \
+                mock.patch.object(embedding, "generate_questions", provider.generate_questions):
+            embed_records = drain_queue(os.environ["EMBEDDING_CHUNKS_INDEX_QUEUE"])
+            start = time.perf_counter()
+            for record in embed_records:
+                with embed_timer.measure():
+                    embedding.lambda_handler({"Records": [record]}, LambdaContext())
+            embed_elapsed = time.perf_counter() - start
+
+    rows = count_embedding_rows(args)
+    total_elapsed = extract_elapsed + chunk_elapsed + embed_elapsed
+    throughput = {
+        "documents_per_second": len(documents) / total_elapsed if total_elapsed else 0.0,
+        "chunk_files_per_second": chunk_files / embed_elapsed if embed_elapsed else 0.0,
+        "embedded_chunks_per_second": rows / embed_elapsed if embed_elapsed else 0.0,
+    }
+    return {
+        "corpus": {"documents": len(documents), "chunk_files": chunk_files, "embedded_chunks": rows},
+        "stages": {
+            timer.name: timer.summary() for timer in (extract_timer, chunk_timer, embed_timer)
+        },
+        "throughput": {name: round(value, 3) for name, value in throughput.items()},
+        "elapsed_s": round(total_elapsed, 3),
+        "peak_rss_mb": round(peak_rss_bytes() / (1024 * 1024), 1),
+        "provider_calls": dict(provider.calls),
+        "settings": {
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "chat_latency_ms": args.chat_latency_ms,
+            "embedding_dim": args.embedding_dim,
+        },
+    }
+
+
+def print_report(report):
+    log(f"{'stage':<28}{'calls':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'total s':>10}{'rss MB':>10}")
+    for name, stats in report["stages"].items():
+        log(
+            f"{name:<28}{stats['count']:>8}{stats['p50_ms']:>12.1f}{stats['p95_ms']:>12.1f}"
+            f"{stats['p99_ms']:>12.1f}{stats['total_s']:>10.2f}{stats['peak_rss_mb']:>10.1f}"
+        )
+    for name, value in report["throughput"].items():
+        log(f"{name}: {value:.3f}")
+    log(f"Peak RSS: {report['peak_rss_mb']} MB, provider calls: {report['provider_calls']}")
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    provider = FakeProvider(args.embedding_dim, args.embedding_latency_ms, args.chat_latency_ms, args.latency_jitter)
+
+    if not args.keep_table:
+        ensure_disposable_database(args)
+        reset_embeddings_table(args)
+
+    from moto import mock_aws
+
+    with mock_aws(), mock.patch("pycommon.api.credentials.get_credentials", lambda secret_name: args.pg_password):
+        create_stand_ins()
+        report = run_benchmark(args, provider)
+
+    print_report(report)
+    write_report(report, args.output)
+
+    if args.baseline:
+        regressions = check_regressions(report["throughput"], args.baseline, args.max_regression_pct)
+        if regressions:
+            log("Throughput regressions against baseline:", *regressions)
+            sys.exit(1)
+        log("No throughput regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
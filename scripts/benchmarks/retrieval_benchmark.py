@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Latency and recall benchmark for dual retrieval vector search.
+
+Seeds a local pgvector database with a synthetic (or pre-embedded) corpus
+using the production ``embeddings`` table DDL from ``embedding/create_table.py``
+and then runs query workloads through ``get_top_similar_docs`` /
+``get_top_similar_qas`` from ``embedding/embedding-dual-retrieval.py``.
+
+For every retrieval strategy, HNSW ``ef_search`` value and concurrency level
+it reports the strategies the search actually chose, p50/p95/p99 latency,
+queries per second and recall@k against an exact (sequential scan) search
+over the same ``src_ids``. ``auto`` picks the exact strategy whenever the
+filter matches at most ``RAG_RETRIEVAL_EXACT_MAX_ROWS`` rows, so HNSW is only
+measured with ``--strategy hnsw`` or a large enough filter.
+
+Usage:
+    python retrieval_benchmark.py --rows 100000 --sources 2000
+    python retrieval_benchmark.py --skip-seed --strategy auto hnsw --ef-search 40 100 200 --concurrency 1 8 32
+    python retrieval_benchmark.py --corpus embedded.jsonl --src-ids-per-query 500
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from bench_common import (
+    add_postgres_args,
+    check_regressions,
+    ensure_disposable_database,
+    latency_summary,
+    load_module_from_path,
+    log,
+    postgres_env,
+    service_context,
+    service_dir,
+    write_report,
+)
+
+HNSW_INDEXES = ("embeddings_vector_embedding_hnsw_idx", "embeddings_vector_qa_embedding_hnsw_idx")
+TARGET_COLUMNS = {"docs": "vector_embedding", "qas": "qa_vector_embedding"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark dual retrieval vector search latency and recall.")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic rows to seed (10k - 10M)")
+    parser.add_argument("--sources", type=int, default=500, help="Distinct src documents in the synthetic corpus")
+    parser.add_argument("--clusters", type=int, default=256, help="Topic clusters used to generate synthetic vectors")
+    parser.add_argument("--corpus", help="JSONL file of {src, content, embedding[, qa_embedding]} rows to seed instead")
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--seed-batch-size", type=int, default=5000)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the rows already in the embeddings table")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per workload")
+    parser.add_argument("--src-ids-per-query", type=int, default=20, help="Size of the src_ids filter per query")
+    parser.add_argument("--k", type=int, default=10, help="Result limit and recall cutoff")
+    parser.add_argument("--strategy", nargs="+", choices=["auto", "exact", "hnsw"], default=["auto", "hnsw"],
+                        help="Retrieval strategies to run; auto lets the search choose")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200],
+                        help="hnsw.ef_search values to sweep for the hnsw strategy")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--target", choices=sorted(TARGET_COLUMNS), default="docs")
+    parser.add_argument("--random-seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Previous JSON report to compare QPS against")
+    parser.add_argument("--max-regression-pct", type=float, default=10.0)
+    add_postgres_args(parser)
+    return parser.parse_args()
+
+
+def connect(args):
+    import psycopg2
+
+    return psycopg2.connect(
+        host=args.pg_host, port=args.pg_port, user=args.pg_user, password=args.pg_password, dbname=args.pg_database
+    )
+
+
+def vector_literal(values):
+    return "[" + ",".join(f"{v:.6f}" for v in values) + "]"
+
+
+def normalize(values):
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+class SyntheticCorpus:
+    """Clustered unit vectors, so nearest-neighbour structure resembles real embeddings."""
+
+    def __init__(self, dim, clusters, rng):
+        self.dim = dim
+        self.rng = rng
+        self.centroids = [normalize([rng.gauss(0, 1) for _ in range(dim)]) for _ in range(clusters)]
+
+    def near(self, centroid, spread=0.35):
+        return normalize([c + self.rng.gauss(0, spread / self.dim ** 0.5) for c in centroid])
+
+    def sample(self):
+        return self.near(self.rng.choice(self.centroids))
+
+
+def synthetic_rows(args, corpus):
+    for i in range(args.rows):
+        src = f"global/benchmark-{i % args.sources:07d}.content.json"
+        yield src, f"synthetic chunk {i}", corpus.sample(), corpus.sample()
+
+
+def corpus_rows(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                yield row["src"], row.get("content", ""), row["embedding"], row.get("qa_embedding", row["embedding"])
+
+
+def create_embeddings_table():
+    with service_context(service_dir("embedding")):
+        from create_table import create_table
+
+        create_table()
+
+
+def seed(args, rows):
+    """Bulk load rows with COPY, building the HNSW indexes once at the end."""
+    conn = connect(args)
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'embeddings' AND indexname = ANY(%s)",
+                    (list(HNSW_INDEXES),))
+        index_ddl = cur.fetchall()
+        cur.execute("TRUNCATE embeddings;")
+        for name, _ in index_ddl:
+            cur.execute(f"DROP INDEX IF EXISTS {name};")
+
+    loaded = 0
+    start = time.perf_counter()
+    buffer = io.StringIO()
+    for src, content, embedding, qa_embedding in rows:
+        content = content.replace("\\", "\\\\").replace("\t", " ").replace("\n", " ")
+        buffer.write(f"{src}\t{content}\t{vector_literal(embedding)}\t{vector_literal(qa_embedding)}\t{loaded}\n")
+        loaded += 1
+        if loaded % args.seed_batch_size == 0:
+            _copy_batch(conn, buffer)
+            buffer = io.StringIO()
+            log(f"Seeded {loaded} rows")
+    _copy_batch(conn, buffer)
+    log(f"Seeded {loaded} rows in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    with conn, conn.cursor() as cur:
+        for name, ddl in index_ddl:
+            log(f"Building {name}")
+            cur.execute(ddl)
+        cur.execute("ANALYZE embeddings;")
+    log(f"Built HNSW indexes in {time.perf_counter() - start:.1f}s")
+    conn.close()
+
+
+def _copy_batch(conn, buffer):
+    buffer.seek(0)
+    with conn, conn.cursor() as cur:
+        cur.copy_expert(
+            "COPY embeddings (src, content, vector_embedding, qa_vector_embedding, embedding_index) FROM STDIN", buffer
+        )
+
+
+def table_stats(args):
+    conn = connect(args)
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*), COUNT(DISTINCT src) FROM embeddings;")
+        rows, sources = cur.fetchone()
+        cur.execute("SELECT pg_total_relation_size('embeddings'), pg_indexes_size('embeddings');")
+        total_size, index_size = cur.fetchone()
+        cur.execute("SELECT ARRAY(SELECT DISTINCT src FROM embeddings);")
+        all_sources = cur.fetchone()[0]
+    conn.close()
+    return {
+        "rows": rows,
+        "sources": sources,
+        "table_size_mb": round(total_size / (1024 * 1024), 1),
+        "index_size_mb": round(index_size / (1024 * 1024), 1),
+    }, all_sources
+
+
+def build_workload(args, all_sources, rng):
+    """Query vectors taken near existing rows, each with a random src_ids filter."""
+    conn = connect(args)
+    column = TARGET_COLUMNS[args.target]
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {column}::text FROM embeddings TABLESAMPLE SYSTEM (1) LIMIT %s;", (args.queries,))
+        rows = cur.fetchall()
+        if len(rows) < args.queries:
+            # Small tables may not have enough sampled pages
+            cur.execute(f"SELECT {column}::text FROM embeddings ORDER BY random() LIMIT %s;", (args.queries,))
+            rows = cur.fetchall()
+        anchors = [json.loads(row[0]) for row in rows]
+    conn.close()
+    if not anchors:
+        raise SystemExit("The embeddings table is empty - seed it first")
+
+    corpus = SyntheticCorpus(len(anchors[0]), 0, rng)
+    workload = []
+    for i in range(args.queries):
+        src_ids = rng.sample(all_sources, min(args.src_ids_per_query, len(all_sources)))
+        workload.append((corpus.near(anchors[i % len(anchors)], spread=0.2), src_ids))
+    return workload
+
+
+def exact_top_ids(args, workload):
+    """Ground truth: the same query with index scans disabled."""
+    column = TARGET_COLUMNS[args.target]
+    conn = connect(args)
+    truth = []
+    with conn.cursor() as cur:
+        cur.execute("SET enable_indexscan = off; SET enable_bitmapscan = off;")
+        for query_embedding, src_ids in workload:
+            cur.execute(
+                f"""
+                SELECT id FROM embeddings
+                WHERE src = ANY(%s)
+                ORDER BY {column} <#> %s::vector
+                LIMIT %s
+                """,
+                (src_ids, vector_literal(query_embedding), args.k),
+            )
+            truth.append({row[0] for row in cur.fetchall()})
+    conn.close()
+    return truth
+
+
+def record_strategies(dual_retrieval):
+    """Count the strategy search_similar_embeddings picks for each query."""
+    counts = {}
+    lock = threading.Lock()
+    search_similar_embeddings = dual_retrieval.search_similar_embeddings
+
+    def recorded(*args, **kwargs):
+        rows, strategy = search_similar_embeddings(*args, **kwargs)
+        with lock:
+            counts[strategy] = counts.get(strategy, 0) + 1
+        return rows, strategy
+
+    dual_retrieval.search_similar_embeddings = recorded
+    return counts
+
+
+def run_workload(search, workload, truth, k, concurrency, strategy_counts):
+    def timed(query):
+        query_embedding, src_ids = query
+        start = time.perf_counter()
+        results = search(query_embedding, src_ids, k)
+        return time.perf_counter() - start, {row[6] for row in results}
+
+    strategy_counts.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, workload))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in outcomes]
+    recalls = [
+        len(found & expected) / len(expected) if expected else 1.0
+        for (_, found), expected in zip(outcomes, truth)
+    ]
+    return {
+        **latency_summary(latencies),
+        "chosen_strategies": dict(strategy_counts),
+        "qps": round(len(workload) / elapsed, 2) if elapsed else 0.0,
+        f"recall_at_{k}": round(sum(recalls) / len(recalls), 4),
+        f"min_recall_at_{k}": round(min(recalls), 4),
+    }
+
+
+def load_dual_retrieval():
+    embedding_dir = service_dir("embedding")
+    with service_context(embedding_dir):
+        module = load_module_from_path("embedding_dual_retrieval", os.path.join(embedding_dir, "embedding-dual-retrieval.py"))
+    return module
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.random_seed)
+
+    os.environ.update(postgres_env(args))
+    os.environ.update(
+        {
+            "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+            "API_VERSION": "2024-02-01",
+            "STAGE": "benchmark",
+            "OBJECT_ACCESS_DYNAMODB_TABLE": "benchmark-object-access",
+            "RAG_CHUNK_DOCUMENT_QUEUE_URL": "benchmark-rag-chunk-document-queue",
+        }
+    )
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    with mock.patch("pycommon.api.credentials.get_credentials", lambda secret_name: args.pg_password):
+        if not args.skip_seed:
+            ensure_disposable_database(args)
+            create_embeddings_table()
+            if args.corpus:
+                rows = corpus_rows(args.corpus)
+            else:
+                rows = synthetic_rows(args, SyntheticCorpus(args.embedding_dim, args.clusters, rng))
+            seed(args, rows)
+        dual_retrieval = load_dual_retrieval()
+
+    stats, all_sources = table_stats(args)
+    log(f"Corpus: {stats}")
+
+    search = dual_retrieval.get_top_similar_docs if args.target == "docs" else dual_retrieval.get_top_similar_qas
+    workload = build_workload(args, all_sources, rng)
+    truth = exact_top_ids(args, workload)
+
+    strategy_counts = record_strategies(dual_retrieval)
+    results = []
+    for strategy in args.strategy:
+        dual_retrieval.retrieval_strategy = strategy
+        # ef_search only applies when the HNSW index is walked; auto and exact
+        # keep the search's own choice
+        for ef_search in args.ef_search if strategy == "hnsw" else [0]:
+            dual_retrieval.retrieval_hnsw_ef_search = ef_search
+            for concurrency in args.concurrency:
+                result = {"strategy": strategy, "ef_search": ef_search or None, "concurrency": concurrency,
+                          **run_workload(search, workload, truth, args.k, concurrency, strategy_counts)}
+                results.append(result)
+                log(
+                    f"strategy={strategy:<5} ef_search={ef_search or '-':<5} concurrency={concurrency:<4} "
+                    f"chosen={result['chosen_strategies']} p50={result['p50_ms']:.1f}ms "
+                    f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms qps={result['qps']:.1f} "
+                    f"recall@{args.k}={result[f'recall_at_{args.k}']:.3f}"
+                )
+
+    report = {
+        "corpus": stats,
+        "settings": {
+            "target": args.target,
+            "queries": args.queries,
+            "src_ids_per_query": args.src_ids_per_query,
+            "k": args.k,
+        },
+        "results": results,
+        "throughput": {
+            f"qps_{r['strategy']}_ef{r['ef_search'] or 'auto'}_c{r['concurrency']}": r["qps"] for r in results
+        },
+    }
+    write_report(report, args.output)
+
+    if args.baseline:
+        regressions = check_regressions(report["throughput"], args.baseline, args.max_regression_pct)
+        if regressions:
+            log("QPS regressions against baseline:", *regressions)
+            sys.exit(1)
+        log("No QPS regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()